@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import math
+import mmap
+import struct
+from pathlib import Path
+
+from ayugespidertools.extras.ext import EncryptMixin
+
+__all__ = [
+    "BloomFilter",
+    "ScalableBloomFilter",
+    "get_bloom_hash",
+]
+
+# 文件头：标识，容量，位数，哈希函数个数，误判率，已添加的元素个数
+_HEADER = struct.Struct("<8sQQQdQ")
+_MAGIC = b"AYUBLOOM"
+# 位数组的起始位置，与文件头之间留有余量
+_BITS_OFFSET = 64
+_COUNT_OFFSET = _HEADER.size - 8
+_MASK64 = (1 << 64) - 1
+
+
+def get_bloom_hash(key: str) -> tuple[int, int]:
+    """使用 mm3_hash128_encode 计算 key 的哈希值，并拆分为双重哈希所需的两个 64 位整数
+
+    Args:
+        key: 需要计算哈希的元素
+
+    Returns:
+        1). 高 64 位
+        2). 低 64 位，置为奇数以免为 0 时所有哈希都取到同一位置
+
+    Examples:
+        >>> get_bloom_hash("123456")
+        (16435832985690558678, 5882968373513761279)
+    """
+    h = int(EncryptMixin.mm3_hash128_encode(key), 16)
+    return h >> 64, (h & _MASK64) | 1
+
+
+class BloomFilter:
+    """存储在 mmap 文件中的布隆过滤器，重新打开同一文件时会恢复其内容"""
+
+    def __init__(self, path: str | Path, capacity: int, error_rate: float) -> None:
+        """打开已有的布隆过滤器文件，不存在时按容量及误判率创建
+
+        Args:
+            path: 文件路径
+            capacity: 容量，即添加此数量的元素后误判率才会达到 error_rate
+            error_rate: 误判率
+        """
+        self.path = Path(path)
+        if self.path.exists():
+            self._file = self.path.open("r+b")
+            self.mm = mmap.mmap(self._file.fileno(), 0)
+            magic, capacity, num_bits, num_hashes, error_rate, _ = _HEADER.unpack_from(
+                self.mm
+            )
+            assert magic == _MAGIC, f"{self.path} 不是布隆过滤器文件！"
+        else:
+            num_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+            num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self.path.open("w+b")
+            # truncate 生成的是稀疏文件，未写入的部分不会占用磁盘空间
+            self._file.truncate(_BITS_OFFSET + (num_bits + 7) // 8)
+            self.mm = mmap.mmap(self._file.fileno(), 0)
+            _HEADER.pack_into(
+                self.mm, 0, _MAGIC, capacity, num_bits, num_hashes, error_rate, 0
+            )
+
+        self.capacity = capacity
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.error_rate = error_rate
+        self.count = struct.unpack_from("<Q", self.mm, _COUNT_OFFSET)[0]
+
+    def _positions(self, h1: int, h2: int):
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def contains(self, h1: int, h2: int) -> bool:
+        """判断元素是否可能已存在
+
+        Args:
+            h1: get_bloom_hash 返回的高 64 位
+            h2: get_bloom_hash 返回的低 64 位
+
+        Returns:
+            1). 是否可能已存在，为 False 时一定不存在
+        """
+        mm = self.mm
+        return all(
+            mm[_BITS_OFFSET + (pos >> 3)] & (1 << (pos & 7))
+            for pos in self._positions(h1, h2)
+        )
+
+    def add(self, h1: int, h2: int) -> None:
+        """添加元素，调用方需要保证添加前此元素不存在，否则 count 会重复计数"""
+        mm = self.mm
+        for pos in self._positions(h1, h2):
+            mm[_BITS_OFFSET + (pos >> 3)] |= 1 << (pos & 7)
+        self.count += 1
+        struct.pack_into("<Q", mm, _COUNT_OFFSET, self.count)
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    @property
+    def fp_rate(self) -> float:
+        """根据已添加的元素个数估算当前的误判率"""
+        return (
+            1 - math.exp(-self.num_hashes * self.count / self.num_bits)
+        ) ** self.num_hashes
+
+    def flush(self) -> None:
+        self.mm.flush()
+
+    def close(self) -> None:
+        self.mm.flush()
+        self.mm.close()
+        self._file.close()
+
+
+class ScalableBloomFilter:
+    """可扩容的布隆过滤器
+
+    由多个 BloomFilter 组成，当前过滤器达到容量后，会新建一个容量为其 growth 倍，误判率为其
+    ratio 倍的过滤器，整体的误判率不会超过 error_rate。每个过滤器存储为目录下的一个文件。
+
+    Examples:
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as tmp:
+        ...     bf = ScalableBloomFilter(tmp, capacity=100)
+        ...     added = [bf.add(str(i)) for i in range(300)]
+        ...     seen = bf.add("1")
+        ...     bf.close()
+        ...     reopened = ScalableBloomFilter(tmp, capacity=100)
+        ...     result = (any(added), seen, len(reopened), len(reopened.filters))
+        ...     reopened.close()
+        >>> result
+        (False, True, 300, 2)
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        capacity: int = 1000000,
+        error_rate: float = 0.001,
+        growth: int = 2,
+        ratio: float = 0.5,
+    ) -> None:
+        """打开目录下已有的过滤器文件
+
+        Args:
+            directory: 过滤器文件所在的目录
+            capacity: 第一个过滤器的容量
+            error_rate: 整体的误判率上限
+            growth: 新建过滤器的容量倍数
+            ratio: 新建过滤器的误判率倍数，需要小于 1
+        """
+        self.directory = Path(directory)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.ratio = ratio
+        self.filters: list[BloomFilter] = []
+        i = 0
+        while (path := self._get_path(i)).exists():
+            self.filters.append(BloomFilter(path, 0, 0))
+            i += 1
+        if not self.filters:
+            self._add_filter()
+
+    def _get_path(self, index: int) -> Path:
+        return self.directory / f"{index}.bloom"
+
+    def _add_filter(self) -> None:
+        i = len(self.filters)
+        self.filters.append(
+            BloomFilter(
+                self._get_path(i),
+                capacity=self.capacity * self.growth**i,
+                error_rate=self.error_rate * (1 - self.ratio) * self.ratio**i,
+            )
+        )
+
+    def __len__(self) -> int:
+        return sum(f.count for f in self.filters)
+
+    def __contains__(self, key: str) -> bool:
+        h1, h2 = get_bloom_hash(key)
+        return any(f.contains(h1, h2) for f in self.filters)
+
+    def add(self, key: str) -> bool:
+        """添加元素
+
+        Args:
+            key: 需要添加的元素
+
+        Returns:
+            1). 添加前此元素是否可能已存在，已存在时不会重复添加
+        """
+        h1, h2 = get_bloom_hash(key)
+        if any(f.contains(h1, h2) for f in self.filters):
+            return True
+
+        if self.filters[-1].is_full:
+            self._add_filter()
+        self.filters[-1].add(h1, h2)
+        return False
+
+    @property
+    def fp_rate(self) -> float:
+        """根据各过滤器中的元素个数估算当前整体的误判率"""
+        return 1 - math.prod(1 - f.fp_rate for f in self.filters)
+
+    def flush(self) -> None:
+        for f in self.filters:
+            f.flush()
+
+    def close(self) -> None:
+        for f in self.filters:
+            f.close()
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Hashable
+from typing import Any
+
+__all__ = [
+    "BatchBuffer",
+]
+
+
+class BatchBuffer:
+    """按分组缓存需要批量处理的数据，在数量或时间达到阈值时由调用方取出处理
+
+    Examples:
+        >>> buffer = BatchBuffer(size=2, interval=60)
+        >>> buffer.add("t", 1)
+        False
+        >>> buffer.add("t", 2)
+        True
+        >>> buffer.pop("t")
+        [1, 2]
+        >>> len(buffer)
+        0
+    """
+
+    def __init__(self, size: int, interval: float = 0, max_bytes: int = 0) -> None:
+        """初始化缓存
+
+        Args:
+            size: 每个分组的最大缓存数量，达到此数量时需要 flush
+            interval: 分组中最早数据的最大缓存时间（秒），为 0 时不按时间 flush
+            max_bytes: 每个分组的最大缓存字节数，为 0 时不按字节数 flush
+        """
+        self.size = size
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self._groups: dict[Hashable, list[Any]] = {}
+        self._created: dict[Hashable, float] = {}
+        self._bytes: dict[Hashable, int] = {}
+
+    def add(self, key: Hashable, row: Any, nbytes: int = 0) -> bool:
+        """添加数据到对应分组
+
+        Args:
+            key: 分组标识
+            row: 需要缓存的数据
+            nbytes: 此数据的字节数，用于 max_bytes 的判断
+
+        Returns:
+            1). 当前分组是否已满足 flush 的数量或字节数条件
+        """
+        if key not in self._groups:
+            self._groups[key] = []
+            self._created[key] = time.monotonic()
+            self._bytes[key] = 0
+        self._groups[key].append(row)
+        self._bytes[key] += nbytes
+        if self.max_bytes and self._bytes[key] >= self.max_bytes:
+            return True
+        return len(self._groups[key]) >= self.size
+
+    def pop(self, key: Hashable) -> list[Any]:
+        """取出并清空对应分组的数据"""
+        self._created.pop(key, None)
+        self._bytes.pop(key, None)
+        return self._groups.pop(key, [])
+
+    def expired_keys(self) -> list[Hashable]:
+        """获取缓存时间超过 interval 的分组"""
+        if not self.interval:
+            return []
+        deadline = time.monotonic() - self.interval
+        return [k for k, created in self._created.items() if created <= deadline]
+
+    def keys(self) -> list[Hashable]:
+        return list(self._groups)
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self._groups.values())
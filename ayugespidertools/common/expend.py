@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import datetime
+from collections.abc import Iterable
+from functools import lru_cache
 from typing import TYPE_CHECKING, Any
 
 import pymysql
@@ -8,6 +10,12 @@ from retrying import retry
 
 from ayugespidertools.common.multiplexing import ReuseOperation
 from ayugespidertools.common.params import Param
+from ayugespidertools.common.tableschema import (
+    apply_mysql_schema,
+    apply_oracle_schema,
+    apply_postgres_schema,
+    apply_table_schemas,
+)
 from ayugespidertools.config import logger
 
 try:
@@ -29,9 +37,93 @@ if TYPE_CHECKING:
     from pymysql.connections import Connection as PymysqlConnection
 
     from ayugespidertools.common.typevars import MysqlConf, OracleConf, PostgreSQLConf
+    from ayugespidertools.spiders import AyuSpider
 
 
-class MysqlPipeEnhanceMixin:
+@lru_cache(maxsize=Param.sql_cache_maxsize)
+def _mysql_insert_sql(table: str, keys: tuple[str, ...], odku_enable: bool) -> str:
+    columns = f"""`{"`, `".join(keys)}`"""
+    values = ", ".join(["%s"] * len(keys))
+    if odku_enable:
+        update = ",".join([f" `{key}` = %s" for key in keys])
+        return f"INSERT INTO `{table}` ({columns}) values ({values}) ON DUPLICATE KEY UPDATE {update}"
+    return f"INSERT INTO `{table}` ({columns}) values ({values})"
+
+
+@lru_cache(maxsize=Param.sql_cache_maxsize)
+def _mysql_batch_insert_sql(
+    table: str, keys: tuple[str, ...], odku_enable: bool
+) -> str:
+    columns = f"""`{"`, `".join(keys)}`"""
+    values = ", ".join(["%s"] * len(keys))
+    sql = f"INSERT INTO `{table}` ({columns}) values ({values})"
+    if odku_enable:
+        update = ",".join([f" `{key}` = VALUES(`{key}`)" for key in keys])
+        sql = f"{sql} ON DUPLICATE KEY UPDATE {update}"
+    return sql
+
+
+@lru_cache(maxsize=Param.sql_cache_maxsize)
+def _postgres_insert_sql(table: str, keys: tuple[str, ...]) -> str:
+    columns = f"""{", ".join(keys)}"""
+    values = ", ".join(["%s"] * len(keys))
+    return f"INSERT INTO {table} ({columns}) values ({values});"
+
+
+@lru_cache(maxsize=Param.sql_cache_maxsize)
+def _postgres_copy_sql(table: str, keys: tuple[str, ...]) -> str:
+    return f"COPY {table} ({', '.join(keys)}) FROM STDIN"
+
+
+@lru_cache(maxsize=Param.sql_cache_maxsize)
+def _oracle_insert_sql(table: str, keys: tuple[str, ...]) -> str:
+    values = f""":{", :".join(keys)}"""
+    columns = ", ".join(map(lambda key: f'"{key}"', keys))
+    return f'INSERT INTO "{table}" ({columns}) values ({values})'
+
+
+def _get_sql_cache_counts() -> tuple[int, int, int]:
+    """获取所有 sql 插入语句缓存的命中数，未命中数及当前缓存数量"""
+    hits = misses = currsize = 0
+    for func in (
+        _mysql_insert_sql,
+        _mysql_batch_insert_sql,
+        _postgres_insert_sql,
+        _postgres_copy_sql,
+        _oracle_insert_sql,
+    ):
+        cache_info = func.cache_info()
+        hits += cache_info.hits
+        misses += cache_info.misses
+        currsize += cache_info.currsize
+    return hits, misses, currsize
+
+
+class SqlCacheStatsMixin:
+    """记录 sql 插入语句缓存的命中情况"""
+
+    # open_spider 时的缓存命中数及未命中数
+    _sql_cache_start: tuple[int, int] = (0, 0)
+
+    def _open_sql_cache_stats(self) -> None:
+        """记录 open_spider 时的缓存命中情况，此缓存由同一进程中的所有 spider 共享"""
+        self._sql_cache_start = _get_sql_cache_counts()[:2]
+
+    def _record_sql_cache_stats(self, spider: AyuSpider) -> None:
+        """将 open_spider 之后 sql 插入语句缓存的命中情况记录到 scrapy stats 中
+
+        Args:
+            spider: scrapy spider
+        """
+        hits, misses, currsize = _get_sql_cache_counts()
+        start_hits, start_misses = self._sql_cache_start
+        stats = spider.crawler.stats
+        stats.set_value("sql_cache/hits", hits - start_hits)
+        stats.set_value("sql_cache/misses", misses - start_misses)
+        stats.set_value("sql_cache/currsize", currsize)
+
+
+class MysqlPipeEnhanceMixin(SqlCacheStatsMixin):
     """扩展 mysql pipelines 的功能"""
 
     @retry(
@@ -73,6 +165,26 @@ class MysqlPipeEnhanceMixin:
             return conn
         return pymysql.connect(**pymysql_conn_args)
 
+    def _create_tables(self, spider: AyuSpider) -> None:
+        """根据 spider 的 table_schemas 在开始时一次性创建或迁移数据表
+
+        Args:
+            spider: scrapy spider
+        """
+        if not (schemas := getattr(spider, "table_schemas", None)):
+            return
+
+        mysql_conf = spider.mysql_conf
+        conn = self._connect(mysql_conf)
+        try:
+            apply_table_schemas(
+                conn,
+                schemas,
+                lambda cursor, schema: apply_mysql_schema(cursor, mysql_conf, schema),
+            )
+        finally:
+            conn.close()
+
     def _get_sql_by_item(
         self, table: str, item: dict[str, Any], odku_enable: bool = True
     ) -> tuple[str, tuple]:
@@ -87,17 +199,27 @@ class MysqlPipeEnhanceMixin:
             1). sql 插入语句
             2). sql 语句执行和格式化需要的 value
         """
-        keys = f"""`{"`, `".join(item.keys())}`"""
-        values = ", ".join(["%s"] * len(item))
+        sql = _mysql_insert_sql(table, tuple(item), odku_enable)
+        args = tuple(item.values())
         if odku_enable:
-            update = ",".join([f" `{key}` = %s" for key in item])
-            sql = f"INSERT INTO `{table}` ({keys}) values ({values}) ON DUPLICATE KEY UPDATE {update}"
-            args = tuple(item.values()) * 2
-        else:
-            sql = f"INSERT INTO `{table}` ({keys}) values ({values})"
-            args = tuple(item.values())
+            args *= 2
         return sql, args
 
+    def _get_batch_sql_by_keys(
+        self, table: str, keys: Iterable[str], odku_enable: bool = True
+    ) -> str:
+        """根据字段名生成 mysql 批量插入语句，用于 cursor.executemany
+
+        Args:
+            table: 数据库表名
+            keys: 字段名
+            odku_enable: 是否开启 ON DUPLICATE KEY UPDATE
+
+        Returns:
+            1). sql 插入语句，其 ODKU 部分不含占位符，以便 executemany 合并为多行插入
+        """
+        return _mysql_batch_insert_sql(table, tuple(keys), odku_enable)
+
     def _get_log_by_spider(self, spider, crawl_time):
         """获取 spider 的运行日志情况
 
@@ -175,7 +297,7 @@ class MysqlPipeEnhanceMixin:
         return log_info
 
 
-class PostgreSQLPipeEnhanceMixin:
+class PostgreSQLPipeEnhanceMixin(SqlCacheStatsMixin):
     """扩展 postgresql pipelines 的功能"""
 
     @retry(
@@ -222,6 +344,21 @@ class PostgreSQLPipeEnhanceMixin:
             dbname=postgres_conf.database,
         )
 
+    def _create_tables(self, spider: AyuSpider) -> None:
+        """根据 spider 的 table_schemas 在开始时一次性创建或迁移数据表
+
+        Args:
+            spider: scrapy spider
+        """
+        if not (schemas := getattr(spider, "table_schemas", None)):
+            return
+
+        conn = self._connect(spider.postgres_conf)
+        try:
+            apply_table_schemas(conn, schemas, apply_postgres_schema)
+        finally:
+            conn.close()
+
     def _get_sql_by_item(self, table: str, item: dict[str, Any]) -> str:
         """根据处理后的 item 生成 postgresql 插入语句
 
@@ -232,12 +369,22 @@ class PostgreSQLPipeEnhanceMixin:
         Returns:
             1). sql 插入语句
         """
-        keys = f"""{", ".join(item.keys())}"""
-        values = ", ".join(["%s"] * len(item))
-        return f"INSERT INTO {table} ({keys}) values ({values});"
+        return _postgres_insert_sql(table, tuple(item))
+
+    def _get_copy_sql_by_keys(self, table: str, keys: Iterable[str]) -> str:
+        """根据字段名生成 postgresql 的 COPY ... FROM STDIN 语句
+
+        Args:
+            table: 数据库表名
+            keys: 字段名
+
+        Returns:
+            1). COPY 语句
+        """
+        return _postgres_copy_sql(table, tuple(keys))
 
 
-class OraclePipeEnhanceMixin:
+class OraclePipeEnhanceMixin(SqlCacheStatsMixin):
     """扩展 oracle pipelines 的功能"""
 
     @retry(
@@ -266,6 +413,21 @@ class OraclePipeEnhanceMixin:
             encoding=oracle_conf.encoding,
         )
 
+    def _create_tables(self, spider: AyuSpider) -> None:
+        """根据 spider 的 table_schemas 在开始时一次性创建数据表或添加缺失的字段
+
+        Args:
+            spider: scrapy spider
+        """
+        if not (schemas := getattr(spider, "table_schemas", None)):
+            return
+
+        conn = self._connect(spider.oracle_conf)
+        try:
+            apply_table_schemas(conn, schemas, apply_oracle_schema)
+        finally:
+            conn.close()
+
     def _get_sql_by_item(self, table: str, item: dict[str, Any]) -> str:
         """根据处理后的 item 生成 oracle 插入语句
 
@@ -276,6 +438,4 @@ class OraclePipeEnhanceMixin:
         Returns:
             1). sql 插入语句
         """
-        keys = f""":{", :".join(item.keys())}"""
-        table_keys = ", ".join(map(lambda key: f'"{key}"', item.keys()))
-        return f'INSERT INTO "{table}" ({table_keys}) values ({keys})'
+        return _oracle_insert_sql(table, tuple(item))
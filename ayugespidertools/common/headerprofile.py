@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import functools
+import json
+import random
+import re
+from collections.abc import Sequence
+from pathlib import Path
+
+from ayugespidertools.config import NormalConfig
+
+__all__ = [
+    "AliasTable",
+    "HeaderProfiles",
+    "build_header_profile",
+    "load_header_profiles",
+]
+
+HeaderProfile = tuple[tuple[str, str], ...]
+
+_ACCEPT = {
+    "chrome": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,"
+    "image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
+    "edge": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,"
+    "image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
+    "firefox": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,"
+    "image/webp,*/*;q=0.8",
+    "safari": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+_ACCEPT_LANGUAGE = {
+    "chrome": "zh-CN,zh;q=0.9,en;q=0.8",
+    "edge": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6",
+    "firefox": "zh-CN,zh;q=0.8,zh-TW;q=0.7,zh-HK;q=0.5,en-US;q=0.3,en;q=0.2",
+    "safari": "zh-CN,zh-Hans;q=0.9",
+}
+# 发送 sec-ch-ua 的浏览器，及其品牌名称和版本号的匹配规则
+_CLIENT_HINTS = {
+    "chrome": ("Google Chrome", re.compile(r"Chrome/(\d+)")),
+    "edge": ("Microsoft Edge", re.compile(r"Edg/(\d+)")),
+}
+_PLATFORMS = (
+    ("Android", "Android"),
+    ("iPhone", "iOS"),
+    ("iPad", "iOS"),
+    ("Windows", "Windows"),
+    ("Macintosh", "macOS"),
+    ("CrOS", "Chrome OS"),
+    ("Linux", "Linux"),
+)
+
+
+class AliasTable:
+    """Walker 别名表，预处理后每次按权重采样只需 O(1)
+
+    Examples:
+        >>> table = AliasTable([1, 0, 3])
+        >>> sorted({table.sample() for _ in range(1000)})
+        [0, 2]
+    """
+
+    def __init__(self, weights: Sequence[float]) -> None:
+        """构建别名表
+
+        Args:
+            weights: 各个元素的权重，不能全为 0
+        """
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.n = n
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            s, g = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = g
+            scaled[g] += scaled[s] - 1
+            (small if scaled[g] < 1 else large).append(g)
+
+    def sample(self) -> int:
+        """按权重随机取出一个元素的索引"""
+        r = random.random() * self.n
+        i = int(r)
+        return i if r - i < self.prob[i] else self.alias[i]
+
+
+def _get_platform(ua: str) -> str | None:
+    return next((name for key, name in _PLATFORMS if key in ua), None)
+
+
+def build_header_profile(family: str, ua: str) -> HeaderProfile:
+    """根据浏览器类型及 ua 生成一套相互一致的请求头
+
+    Args:
+        family: 浏览器类型，比如 chrome，edge，firefox，safari
+        ua: User-Agent
+
+    Returns:
+        1). 请求头的 (name, value) 元组
+
+    Examples:
+        >>> ua = (
+        ...     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        ...     "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+        ... )
+        >>> dict(build_header_profile("chrome", ua))["sec-ch-ua-platform"]
+        '"Windows"'
+        >>> "sec-ch-ua" in dict(build_header_profile("firefox", "Firefox/123.0"))
+        False
+    """
+    headers = [
+        ("User-Agent", ua),
+        ("Accept", _ACCEPT.get(family, "*/*")),
+        ("Accept-Language", _ACCEPT_LANGUAGE.get(family, "zh-CN,zh;q=0.9")),
+    ]
+    platform = _get_platform(ua)
+    if (
+        family in _CLIENT_HINTS
+        and platform != "iOS"
+        and (version := _CLIENT_HINTS[family][1].search(ua))
+    ):
+        major = version.group(1)
+        brand = _CLIENT_HINTS[family][0]
+        headers += [
+            (
+                "sec-ch-ua",
+                f'"Chromium";v="{major}", "Not(A:Brand";v="24", "{brand}";v="{major}"',
+            ),
+            ("sec-ch-ua-mobile", "?1" if "Mobile" in ua else "?0"),
+        ]
+        if platform:
+            headers.append(("sec-ch-ua-platform", f'"{platform}"'))
+    return tuple(headers)
+
+
+class HeaderProfiles:
+    """预先生成的请求头配置集合，按浏览器类型的权重采样"""
+
+    def __init__(self, fake_ua_dict: dict[str, list[str]], weights: dict[str, float]):
+        """生成所有 ua 对应的请求头配置
+
+        Args:
+            fake_ua_dict: 各浏览器类型的 ua 列表
+            weights: 各浏览器类型的权重，同一类型中的 ua 权重相同
+        """
+        self.profiles: list[HeaderProfile] = []
+        profile_weights: list[float] = []
+        for family, weight in weights.items():
+            if weight <= 0 or not (
+                uas := list(dict.fromkeys(fake_ua_dict.get(family, [])))
+            ):
+                continue
+            for ua in uas:
+                self.profiles.append(build_header_profile(family, ua))
+                profile_weights.append(weight / len(uas))
+        assert self.profiles, f"没有可用的请求头配置，请检查浏览器类型的权重: {weights}"
+        self.table = AliasTable(profile_weights)
+
+    def __len__(self) -> int:
+        return len(self.profiles)
+
+    def sample(self) -> HeaderProfile:
+        """按权重随机取出一套请求头配置"""
+        return self.profiles[self.table.sample()]
+
+
+@functools.lru_cache(maxsize=None)
+def load_header_profiles(weights: tuple[tuple[str, float], ...]) -> HeaderProfiles:
+    """读取 browsers.json 并生成请求头配置，每个进程中相同的权重只会生成一次
+
+    Args:
+        weights: 各浏览器类型的权重，为可哈希的 ((类型, 权重), ...) 形式
+
+    Returns:
+        1). 请求头配置集合
+    """
+    ua_file = Path(NormalConfig.DATA_DIR, "browsers.json")
+    fake_ua_dict = json.loads(ua_file.read_text(encoding="utf-8"))
+    return HeaderProfiles(fake_ua_dict, dict(weights))
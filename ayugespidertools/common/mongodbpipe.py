@@ -1,22 +1,34 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, Union
+from typing import TYPE_CHECKING, Any, Union
+
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
 
 from ayugespidertools.common.multiplexing import ReuseOperation
+from ayugespidertools.config import logger
 
 __all__ = [
     "Synchronize",
     "TwistedAsynchronous",
     "AsyncioAsynchronous",
     "mongodb_pipe",
+    "mongodb_bulk_write",
+    "record_mongodb_bulk_stats",
 ]
 
 if TYPE_CHECKING:
+    from collections.abc import Awaitable
+
     from motor.core import AgnosticDatabase
     from pymongo.database import Database
+    from scrapy.statscollectors import StatsCollector
+
+    from ayugespidertools.common.buffer import BatchBuffer
 
     MongoDatabaseT = Union[Database, AgnosticDatabase]
+    MongoOperationT = Union[InsertOne, UpdateOne]
 
 
 class AbstractClass(ABC):
@@ -72,6 +84,51 @@ class AbstractClass(ABC):
                 item_dict["_mongo_update_rule"], {"$set": insert_data}, upsert=True
             )
 
+    def _get_operation(self, item_dict: dict, insert_data: dict) -> MongoOperationT:
+        """获取 item 对应的 bulk_write 写入操作，与 _default_storage 的逻辑一致"""
+        if not item_dict.get("_mongo_update_rule"):
+            return InsertOne(insert_data)
+        return UpdateOne(
+            item_dict["_mongo_update_rule"], {"$set": insert_data}, upsert=True
+        )
+
+    def buffer_item_template(self, item_dict: dict, buffer: BatchBuffer) -> str | None:
+        """将 item 对应的写入操作按集合缓存，用于之后的 bulk_write 批量写入
+
+        Args:
+            item_dict: item 的 dict 类型
+            buffer: 以集合名称分组的写入操作缓存
+
+        Returns:
+            1). 缓存数量满足写入条件时返回其集合名称，否则为 None
+        """
+        insert_data, table_name = self._get_insert_data(item_dict)
+        if buffer.add(table_name, self._get_operation(item_dict, insert_data)):
+            return table_name
+        return None
+
+    def bulk_write(
+        self,
+        db: MongoDatabaseT,
+        collection_name: str,
+        operations: list[MongoOperationT],
+    ) -> dict[str, Any]:
+        """以无序模式批量执行写入操作，单条写入失败不会影响其它数据的写入
+
+        Args:
+            db: mongodb 数据库连接
+            collection_name: 集合名称
+            operations: 写入操作列表
+
+        Returns:
+            1). bulk_write 的原始结果，包含 nInserted，nUpserted 及 writeErrors 等信息
+        """
+        try:
+            result = db[collection_name].bulk_write(operations, ordered=False)
+            return result.bulk_api_result
+        except BulkWriteError as e:
+            return e.details
+
     @abstractmethod
     def _data_storage_logic(
         self,
@@ -146,6 +203,18 @@ class AsyncioAsynchronous(AbstractClass):
                 item_dict["_mongo_update_rule"], {"$set": insert_data}, upsert=True
             )
 
+    async def bulk_write(  # type: ignore[override]
+        self,
+        db: AgnosticDatabase,
+        collection_name: str,
+        operations: list[MongoOperationT],
+    ) -> dict[str, Any]:
+        try:
+            result = await db[collection_name].bulk_write(operations, ordered=False)
+            return result.bulk_api_result
+        except BulkWriteError as e:
+            return e.details
+
     async def process_item_template(self, item_dict: dict, db: MongoDatabaseT):
         insert_data, table_name = self._get_insert_data(item_dict)
         await self._data_storage_logic(
@@ -163,3 +232,35 @@ def mongodb_pipe(
 ) -> None:
     """mongodb pipeline 存储的通用调用方法"""
     abstract_class.process_item_template(item_dict, db)
+
+
+def mongodb_bulk_write(
+    abstract_class: AbstractClass,
+    db: MongoDatabaseT,
+    collection_name: str,
+    operations: list[MongoOperationT],
+) -> dict[str, Any] | Awaitable[dict[str, Any]]:
+    """mongodb pipeline 批量写入的通用调用方法，AsyncioAsynchronous 场景下需要 await"""
+    return abstract_class.bulk_write(db, collection_name, operations)
+
+
+def record_mongodb_bulk_stats(
+    stats: StatsCollector, collection_name: str, details: dict[str, Any]
+) -> None:
+    """记录 bulk_write 的写入结果
+
+    Args:
+        stats: scrapy stats
+        collection_name: 集合名称
+        details: bulk_write 的原始结果
+    """
+    stats.inc_value("mongo/bulk/batches")
+    stats.inc_value("mongo/bulk/inserted", details.get("nInserted", 0))
+    stats.inc_value("mongo/bulk/upserted", details.get("nUpserted", 0))
+    stats.inc_value("mongo/bulk/modified", details.get("nModified", 0))
+    if write_errors := details.get("writeErrors"):
+        stats.inc_value("mongo/bulk/errors", len(write_errors))
+        logger.error(
+            f"mongodb 集合 {collection_name} 批量写入时有 {len(write_errors)} 条失败，"
+            f"首条错误: {write_errors[0].get('errmsg')}"
+        )
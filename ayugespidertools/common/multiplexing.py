@@ -33,6 +33,7 @@ if TYPE_CHECKING:
     from pathlib import Path
 
     from scrapy.settings import BaseSettings
+    from scrapy.statscollectors import StatsCollector
 
 
 class ReuseOperation:
@@ -201,19 +202,53 @@ class ReuseOperation:
         return inner_settings
 
     @staticmethod
-    def item_to_dict(item: AyuItem | dict) -> dict:
+    def _record_view(stats: StatsCollector | None, hit: bool) -> None:
+        if stats is not None:
+            stats.inc_value("item_view/hit" if hit else "item_view/miss")
+
+    @classmethod
+    def item_to_dict(
+        cls, item: AyuItem | dict, stats: StatsCollector | None = None
+    ) -> dict:
         """将 item 转换为 dict 类型；
         将 spider 中的 yield 的 item 转换为 dict 类型，方便后续处理
 
+        AyuItem 的转换结果会缓存在 item 中供之后的 pipeline 复用，所以返回的 dict 不能修改
+
         Args:
             item: spider 中的 yield 的 item
+            stats: 用于记录缓存命中情况的 scrapy stats
 
         Returns:
             1). dict 类型的 item
         """
-        return (
-            item.asdict() if isinstance(item, AyuItem) else ItemAdapter(item).asdict()
+        if not isinstance(item, AyuItem):
+            return ItemAdapter(item).asdict()
+        item_dict, hit = item.get_view("dict", AyuItem.asdict)
+        cls._record_view(stats, hit)
+        return item_dict
+
+    @classmethod
+    def get_alter_item(
+        cls, item: AyuItem | dict, stats: StatsCollector | None = None
+    ) -> AlterItem:
+        """获取 item 经 reshape_item 整合后的结果，AyuItem 的结果会缓存在 item 中复用
+
+        Args:
+            item: spider 中的 yield 的 item
+            stats: 用于记录缓存命中情况的 scrapy stats
+
+        Returns:
+            1). 整合后的 item，不能修改
+        """
+        if not isinstance(item, AyuItem):
+            return cls.reshape_item(cls.item_to_dict(item))
+        # 生成 alter_item 时内部的 dict 转换不计入 stats，每次调用只记录一次命中情况
+        alter_item, hit = item.get_view(
+            "alter_item", lambda x: cls.reshape_item(cls.item_to_dict(x))
         )
+        cls._record_view(stats, hit)
+        return alter_item
 
     @classmethod
     def reshape_item(cls, item_dict: dict[str, Any]) -> AlterItem:
@@ -1,27 +1,39 @@
 from __future__ import annotations
 
 import re
+import threading
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, TypeVar
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, TypeVar, Union
 
 from ayugespidertools.config import logger
 
 __all__ = [
     "Synchronize",
     "TwistedAsynchronous",
+    "AsyncioAsynchronous",
     "deal_mysql_err",
+    "prepare_mysql_columns",
 ]
 
 if TYPE_CHECKING:
+    from collections.abc import Awaitable
+
+    import aiomysql
     from pymysql.connections import Connection
     from pymysql.cursors import Cursor, DictCursor
     from twisted.enterprise.adbapi import Transaction
 
     from ayugespidertools.common.typevars import MysqlConf
 
+    # 数据表名 -> {小写字段名: 字段类型}，为 None 时表示无法获取其字段信息
+    ColumnsCacheT = dict[str, Union[dict[str, str], None]]
     TwistedTransactionT = TypeVar("TwistedTransactionT", bound=Transaction)
     PymysqlDictCursorT = TypeVar("PymysqlDictCursorT", bound=DictCursor)
 
+# 数据表不在字段缓存中的标识，与无法获取字段信息时缓存的 None 区分
+_NOT_CACHED = object()
+
 
 class AbstractClass(ABC):
     """用于处理 mysql 异常的模板方法类"""
@@ -45,12 +57,9 @@ class AbstractClass(ABC):
             collate: collate
             table_notes: 创建表的注释
         """
-        sql = (
-            f"CREATE TABLE IF NOT EXISTS `{table_name}` (`id` int(32) NOT NULL"
-            f" AUTO_INCREMENT COMMENT 'id', PRIMARY KEY (`id`)) ENGINE={engine}"
-            f" DEFAULT CHARSET={charset} COLLATE={collate} COMMENT={table_notes!r};"
+        sql = self._get_create_table_sql(
+            table_name, engine, charset, collate, table_notes
         )
-
         try:
             cursor.execute(sql)
             logger.info(f"创建数据表 {table_notes}: {table_name} 成功！")
@@ -75,10 +84,7 @@ class AbstractClass(ABC):
         Returns:
             column_type: 字段存储类型
         """
-        sql = (
-            f"select COLUMN_TYPE from information_schema.columns where table_schema = {database!r}"
-            f" and table_name = {table!r} and COLUMN_NAME= {column!r};"
-        )
+        sql = self._get_column_type_sql(database, table, column)
         column_type = None
         try:
             cursor.execute(sql)
@@ -94,6 +100,127 @@ class AbstractClass(ABC):
             logger.error(f"未获取到当前字段的存储类型，err: {e}")
         return column_type
 
+    def _get_table_columns(
+        self,
+        cursor: Cursor,
+        database: str,
+        table: str,
+    ) -> dict[str, str] | None:
+        """获取数据表的所有字段及其存储类型
+
+        Args:
+            cursor: mysql connect cursor
+            database: 数据库名
+            table: 数据表名
+
+        Returns:
+            1). 小写字段名与字段存储类型的映射，数据表不存在时为空 dict，获取失败时为 None
+        """
+        sql = (
+            "select COLUMN_NAME as column_name, COLUMN_TYPE as column_type"
+            f" from information_schema.columns where table_schema = {database!r}"
+            f" and table_name = {table!r};"
+        )
+        try:
+            cursor.execute(sql)
+            lines = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"未获取到数据表 {table} 的字段信息，err: {e}")
+            return None
+
+        columns = {}
+        for line in lines:
+            if isinstance(line, dict):
+                name, column_type = line["column_name"], line["column_type"]
+            else:
+                name, column_type = line
+            columns[name.lower()] = column_type
+        return columns
+
+    def _get_add_columns_sql(
+        self, table: str, columns: list[str], note_dic: dict[str, str]
+    ) -> str:
+        """生成一次添加多个字段的 sql 语句
+
+        Args:
+            table: 数据表名
+            columns: 需要添加的字段
+            note_dic: 当前表字段的注释
+
+        Returns:
+            1). sql: 用于添加字段的 sql 语句
+        """
+        add_columns = ", ".join(
+            f"ADD COLUMN `{colum}` VARCHAR(255) NULL DEFAULT ''"
+            f" COMMENT {note_dic.get(colum, '')!r}"
+            for colum in columns
+        )
+        return f"ALTER TABLE `{table}` {add_columns};"
+
+    def prepare_columns(
+        self,
+        conn: Connection[Cursor],
+        cursor: Cursor | TwistedTransactionT,
+        mysql_conf: MysqlConf,
+        table: str,
+        table_notes: str,
+        note_dic: dict[str, str],
+        columns_cache: ColumnsCacheT,
+        columns_locks: dict[str, threading.Lock] | None = None,
+    ) -> None:
+        """插入数据前根据字段缓存创建缺失的数据表，并一次性添加所有缺失的字段
+
+        Args:
+            conn: mysql conn
+            cursor: mysql connect cursor
+            mysql_conf: spider mysql_conf
+            table: 数据表
+            table_notes: 数据表注释
+            note_dic: 当前表字段注释，其 key 即为需要插入的字段
+            columns_cache: 数据表字段缓存，添加字段后会更新对应数据表的缓存
+            columns_locks: 各数据表的锁，多线程共用 columns_cache 时需要提供，避免重复执行 DDL
+        """
+        lock = (
+            nullcontext()
+            if columns_locks is None
+            else columns_locks.setdefault(table, threading.Lock())
+        )
+        with lock:
+            # 其它线程可能同时删除此数据表的缓存，只读取一次
+            columns = columns_cache.get(table, _NOT_CACHED)
+            if columns is _NOT_CACHED:
+                columns = self._get_table_columns(cursor, mysql_conf.database, table)
+                if columns == {}:
+                    self._create_table(
+                        cursor=cursor,
+                        table_name=table,
+                        engine=mysql_conf.engine,
+                        charset=mysql_conf.charset,
+                        collate=mysql_conf.collate,
+                        table_notes=table_notes,
+                    )
+                    columns = self._get_table_columns(
+                        cursor, mysql_conf.database, table
+                    )
+                columns_cache[table] = columns
+
+            # 获取不到字段信息时，交由 deal_mysql_err 根据报错处理
+            if columns is None:
+                return
+
+            if missing := [k for k in note_dic if k.lower() not in columns]:
+                sql = self._get_add_columns_sql(table, missing, note_dic)
+                self._exec_sql(
+                    conn=conn,
+                    cursor=cursor,
+                    sql=sql,
+                    possible_err=f"添加字段 {missing} 时失败",
+                )
+                columns_cache[table] = {
+                    **columns,
+                    **{k.lower(): "varchar(255)" for k in missing},
+                }
+
     def template_method(
         self,
         err_msg: str,
@@ -171,9 +298,7 @@ class AbstractClass(ABC):
         colum_pattern = re.compile(r"Unknown column '(.*?)' in 'field list'")
         text = re.findall(colum_pattern, err_msg)
         colum = text[0]
-        notes = note_dic[colum]
-
-        sql = f"ALTER TABLE `{table}` ADD COLUMN `{colum}` VARCHAR(255) NULL DEFAULT '' COMMENT {notes!r};"
+        sql = self._get_add_columns_sql(table, [colum], note_dic)
         return sql, f"添加字段 {colum} 已存在"
 
     def deal_1406_error(
@@ -197,21 +322,11 @@ class AbstractClass(ABC):
             1). sql: 修改字段类型的 sql
             2). 执行此 sql 可能会报错的信息
         """
-        if "Data too long for" in err_msg:
-            colum_pattern = re.compile(r"Data too long for column '(.*?)' at")
-            text = re.findall(colum_pattern, err_msg)
-            colum = text[0]
-            notes = note_dic[colum]
-            column_type = self._get_column_type(
-                cursor=cursor, database=database, table=table, column=colum
-            )
-            change_colum_type = "LONGTEXT" if column_type == "text" else "TEXT"
-            sql = (
-                f"ALTER TABLE `{table}` CHANGE COLUMN `{colum}` `{colum}`"
-                f" {change_colum_type} NULL DEFAULT NULL COMMENT {notes!r};"
-            )
-            return sql, f"更新 {colum} 字段类型为 {change_colum_type} 时失败"
-        raise Exception(f"未解决 Data too long 的问题，err: {err_msg}")
+        colum = self._get_1406_column(err_msg)
+        column_type = self._get_column_type(
+            cursor=cursor, database=database, table=table, column=colum
+        )
+        return self._get_change_column_sql(table, colum, column_type, note_dic)
 
     def deal_1265_error(
         self,
@@ -234,22 +349,73 @@ class AbstractClass(ABC):
             1). sql: 修改字段类型的 sql
             2). 执行此 sql 可能会报错的信息
         """
+        colum = self._get_1265_column(err_msg)
+        column_type = self._get_column_type(
+            cursor=cursor, database=database, table=table, column=colum
+        )
+        return self._get_change_column_sql(table, colum, column_type, note_dic)
+
+    def _get_1406_column(self, err_msg: str) -> str:
+        """从 1406 报错中获取超出长度的字段名"""
+        if "Data too long for" in err_msg:
+            colum_pattern = re.compile(r"Data too long for column '(.*?)' at")
+            return re.findall(colum_pattern, err_msg)[0]
+        raise Exception(f"未解决 Data too long 的问题，err: {err_msg}")
+
+    def _get_1265_column(self, err_msg: str) -> str:
+        """从 1265 报错中获取被截断的字段名"""
         if "Data truncated for column" in err_msg:
             colum_pattern = re.compile(r"Data truncated for column '(.*?)' at")
-            text = re.findall(colum_pattern, err_msg)
-            colum = text[0]
-            notes = note_dic[colum]
-            column_type = self._get_column_type(
-                cursor=cursor, database=database, table=table, column=colum
-            )
-            change_colum_type = "LONGTEXT" if column_type == "text" else "TEXT"
-            sql = (
-                f"ALTER TABLE `{table}` CHANGE COLUMN `{colum}` `{colum}`"
-                f" {change_colum_type} NULL DEFAULT NULL COMMENT {notes!r};"
-            )
-            return sql, f"更新 {colum} 字段类型为 {change_colum_type} 时失败"
+            return re.findall(colum_pattern, err_msg)[0]
         raise Exception(f"未解决 Data truncated 问题，err: {err_msg}")
 
+    def _get_change_column_sql(
+        self,
+        table: str,
+        colum: str,
+        column_type: str | None,
+        note_dic: dict[str, str],
+    ) -> tuple[str, str]:
+        """生成将字段修改为更大存储类型的 sql 语句
+
+        Args:
+            table: 数据表名
+            colum: 字段名
+            column_type: 字段当前的存储类型
+            note_dic: 当前表字段的注释
+
+        Returns:
+            1). sql: 修改字段类型的 sql
+            2). 执行此 sql 可能会报错的信息
+        """
+        notes = note_dic[colum]
+        change_colum_type = "LONGTEXT" if column_type == "text" else "TEXT"
+        sql = (
+            f"ALTER TABLE `{table}` CHANGE COLUMN `{colum}` `{colum}`"
+            f" {change_colum_type} NULL DEFAULT NULL COMMENT {notes!r};"
+        )
+        return sql, f"更新 {colum} 字段类型为 {change_colum_type} 时失败"
+
+    def _get_create_table_sql(
+        self,
+        table_name: str,
+        engine: str,
+        charset: str,
+        collate: str,
+        table_notes: str = "",
+    ) -> str:
+        return (
+            f"CREATE TABLE IF NOT EXISTS `{table_name}` (`id` int(32) NOT NULL"
+            f" AUTO_INCREMENT COMMENT 'id', PRIMARY KEY (`id`)) ENGINE={engine}"
+            f" DEFAULT CHARSET={charset} COLLATE={collate} COMMENT={table_notes!r};"
+        )
+
+    def _get_column_type_sql(self, database: str, table: str, column: str) -> str:
+        return (
+            f"select COLUMN_TYPE from information_schema.columns where table_schema = {database!r}"
+            f" and table_name = {table!r} and COLUMN_NAME= {column!r};"
+        )
+
     @abstractmethod
     def _exec_sql(self, *args, **kwargs) -> None:
         """子类要实现执行 sql 的不同方法，使得可以正常适配不同的 pipelines 场景"""
@@ -297,22 +463,153 @@ class TwistedAsynchronous(AbstractClass):
             )
 
 
+class AsyncioAsynchronous(AbstractClass):
+    """pipeline asyncio 异步执行 sql 的场景，需要 await 其 template_method"""
+
+    async def _create_table(
+        self,
+        cursor: aiomysql.Cursor,
+        table_name: str,
+        engine: str,
+        charset: str,
+        collate: str,
+        table_notes: str = "",
+    ) -> None:
+        sql = self._get_create_table_sql(
+            table_name, engine, charset, collate, table_notes
+        )
+        try:
+            await cursor.execute(sql)
+            logger.info(f"创建数据表 {table_notes}: {table_name} 成功！")
+        except Exception as e:
+            logger.error(f"创建表 {table_name} 失败，err：{e}")
+
+    async def _get_column_type(
+        self,
+        cursor: aiomysql.Cursor,
+        database: str,
+        table: str,
+        column: str,
+    ) -> str | None:
+        sql = self._get_column_type_sql(database, table, column)
+        column_type = None
+        try:
+            await cursor.execute(sql)
+            lines = await cursor.fetchall()
+            if len(lines) != 1:
+                column_type = ""
+            elif isinstance(lines[0], dict):
+                column_type = lines[0]["COLUMN_TYPE"]
+            else:
+                column_type = lines[0][0]
+
+        except Exception as e:
+            logger.error(f"未获取到当前字段的存储类型，err: {e}")
+        return column_type
+
+    async def template_method(
+        self,
+        err_msg: str,
+        conn: aiomysql.Connection,
+        cursor: aiomysql.Cursor,
+        mysql_conf: MysqlConf,
+        table: str,
+        table_notes: str,
+        note_dic: dict[str, str],
+    ) -> None:
+        if "1054" in err_msg:
+            sql, possible_err = self.deal_1054_error(
+                err_msg=err_msg, table=table, note_dic=note_dic
+            )
+            await self._exec_sql(cursor=cursor, sql=sql, possible_err=possible_err)
+
+        elif "1146" in err_msg:
+            await self._create_table(
+                cursor=cursor,
+                table_name=table,
+                engine=mysql_conf.engine,
+                charset=mysql_conf.charset,
+                collate=mysql_conf.collate,
+                table_notes=table_notes,
+            )
+
+        elif "1406" in err_msg or "1265" in err_msg:
+            if "1406" in err_msg:
+                colum = self._get_1406_column(err_msg)
+            else:
+                colum = self._get_1265_column(err_msg)
+            column_type = await self._get_column_type(
+                cursor=cursor, database=mysql_conf.database, table=table, column=colum
+            )
+            sql, possible_err = self._get_change_column_sql(
+                table, colum, column_type, note_dic
+            )
+            await self._exec_sql(cursor=cursor, sql=sql, possible_err=possible_err)
+
+        else:
+            raise Exception(f"MYSQL OTHER ERROR: {err_msg}")
+
+    async def _exec_sql(
+        self,
+        cursor: aiomysql.Cursor,
+        sql: str,
+        possible_err: str | None = None,
+        *args,
+        **kwargs,
+    ) -> None:
+        try:
+            await cursor.execute(sql)
+        except Exception as e:
+            logger.warning(
+                f"asyncio mysql exec sql err: {str(e)}\n"
+                f"possible_err: {possible_err}"
+            )
+
+
 def deal_mysql_err(
     abstract_class: AbstractClass,
     err_msg: str,
+    cursor: Cursor | aiomysql.Cursor | TwistedTransactionT,
+    mysql_conf: MysqlConf,
+    table: str,
+    table_notes: str,
+    note_dic: dict[str, str],
+    conn: Connection[Cursor] | aiomysql.Connection | None = None,
+    columns_cache: ColumnsCacheT | None = None,
+) -> Awaitable[Any] | None:
+    # 处理报错时可能会修改表结构，需要重新获取其字段信息
+    if columns_cache is not None:
+        columns_cache.pop(table, None)
+    # AsyncioAsynchronous 场景下返回的是 coroutine，需要调用方 await
+    return abstract_class.template_method(
+        err_msg,
+        conn,
+        cursor,
+        mysql_conf,
+        table,
+        table_notes,
+        note_dic,
+    )
+
+
+def prepare_mysql_columns(
+    abstract_class: AbstractClass,
     cursor: Cursor | TwistedTransactionT,
     mysql_conf: MysqlConf,
     table: str,
     table_notes: str,
     note_dic: dict[str, str],
+    columns_cache: ColumnsCacheT,
     conn: Connection[Cursor] | None = None,
+    columns_locks: dict[str, threading.Lock] | None = None,
 ) -> None:
-    abstract_class.template_method(
-        err_msg,
+    abstract_class.prepare_columns(
         conn,
         cursor,
         mysql_conf,
         table,
         table_notes,
         note_dic,
+        columns_cache,
+        columns_locks,
     )
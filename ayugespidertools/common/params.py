@@ -13,6 +13,15 @@ class Param:
     retry_time_max = 1000
 
     aiohttp_retry_times_default = 3
+    # aiohttp 重试的指数退避等待时间（秒）的初始值及上限
+    aiohttp_retry_backoff_base_default = 0.5
+    aiohttp_retry_backoff_max_default = 30
+    aiohttp_retry_exceptions_default = ("aiohttp.ClientError", "asyncio.TimeoutError")
+    # AiohttpRequest 流式下载时每次读取及写入的字节数
+    aiohttp_stream_chunk_size = 65536
+
+    # pipelines 中根据数据表及字段生成的 sql 插入语句的最大缓存数量
+    sql_cache_maxsize = 1024
 
     # 部署运行的平台为 win 或 linux
     IS_WINDOWS = platform.system().lower() == "windows"
@@ -29,7 +38,7 @@ class Param:
         "proxy": "独享代理地址：'http://***.com/api/***&num=100&format=json'",
         "username": "独享代理用户名",
         "password": "对应用户的密码",
-        "index": "需要返回的独享代理的索引",
+        "index": "已不再使用，所有独享代理都会加入代理池",
     }
 
     # aiohttp 配置示例
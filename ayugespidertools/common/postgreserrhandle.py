@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import re
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, TypeVar
+from typing import TYPE_CHECKING, Any, TypeVar
 
 from ayugespidertools.config import logger
 
@@ -10,9 +10,13 @@ __all__ = [
     "Synchronize",
     "deal_postgres_err",
     "TwistedAsynchronous",
+    "AsyncioAsynchronous",
 ]
 
 if TYPE_CHECKING:
+    from collections.abc import Awaitable
+
+    from psycopg import AsyncConnection, AsyncCursor
     from psycopg.connection import Connection
     from psycopg.cursor import Cursor
     from twisted.enterprise.adbapi import Transaction
@@ -42,11 +46,30 @@ class AbstractClass(ABC):
             table_notes: 数据表注释
             note_dic: 当前表字段注释
         """
+        sql, possible_err = self.get_repair_sql(err_msg, table, table_notes, note_dic)
+        self._exec_sql(conn=conn, cursor=cursor, sql=sql, possible_err=possible_err)
+
+    def get_repair_sql(
+        self,
+        err_msg: str,
+        table: str,
+        table_notes: str,
+        note_dic: dict[str, str],
+    ) -> tuple[str, str]:
+        """根据报错内容生成修复库表结构的 sql，无法修复时抛出异常
+
+        Args:
+            err_msg: pipeline 存储时报错内容
+            table: 数据表
+            table_notes: 数据表注释
+            note_dic: 当前表字段注释
+
+        Returns:
+            1). sql: 用于修复的 sql 语句
+            2). 执行此 sql 可能会报错的信息
+        """
         if f' of relation "{table}" does not exist' in err_msg:
-            sql, possible_err = self.deal_1054_error(
-                err_msg=err_msg, table=table, note_dic=note_dic
-            )
-            self._exec_sql(conn=conn, cursor=cursor, sql=sql, possible_err=possible_err)
+            return self.deal_1054_error(err_msg=err_msg, table=table, note_dic=note_dic)
 
         elif f'relation "{table}" does not exist' in err_msg:
             sql = f"""
@@ -54,7 +77,7 @@ class AbstractClass(ABC):
             COMMENT ON TABLE {table} IS {table_notes!r};
             COMMENT ON COLUMN {table}.id IS 'id';
             """
-            self._exec_sql(conn=conn, cursor=cursor, sql=sql, possible_err="创建表失败")
+            return sql, "创建表失败"
 
         elif "value too long for type" in err_msg:
             raise Exception(f"postgres 有字段超出长度限制：{err_msg}")
@@ -138,16 +161,54 @@ class TwistedAsynchronous(AbstractClass):
             cursor.execute("ROLLBACK")
 
 
+class AsyncioAsynchronous(AbstractClass):
+    """pipeline asyncio 异步执行 sql 的场景，需要 await 其 template_method"""
+
+    async def template_method(
+        self,
+        err_msg: str,
+        conn: AsyncConnection,
+        cursor: AsyncCursor,
+        table: str,
+        table_notes: str,
+        note_dic: dict[str, str],
+    ) -> None:
+        sql, possible_err = self.get_repair_sql(err_msg, table, table_notes, note_dic)
+        await self._exec_sql(
+            conn=conn, cursor=cursor, sql=sql, possible_err=possible_err
+        )
+
+    async def _exec_sql(
+        self,
+        conn: AsyncConnection,
+        cursor: AsyncCursor,
+        sql: str,
+        possible_err: str | None = None,
+        *args,
+        **kwargs,
+    ) -> None:
+        try:
+            await cursor.execute(sql)
+            await conn.commit()
+        except Exception as e:
+            logger.warning(
+                f"asyncio postgres exec sql err: {str(e)}\n"
+                f"possible_err: {possible_err}"
+            )
+            await conn.rollback()
+
+
 def deal_postgres_err(
     abstract_class: AbstractClass,
     err_msg: str,
-    cursor: Cursor | TwistedTransactionT,
+    cursor: Cursor | AsyncCursor | TwistedTransactionT,
     table: str,
     table_notes: str,
     note_dic: dict[str, str],
-    conn: Connection | None = None,
-) -> None:
-    abstract_class.template_method(
+    conn: Connection | AsyncConnection | None = None,
+) -> Awaitable[Any] | None:
+    # AsyncioAsynchronous 场景下返回的是 coroutine，需要调用方 await
+    return abstract_class.template_method(
         err_msg,
         conn,
         cursor,
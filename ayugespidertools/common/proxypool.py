@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import random
+from collections import deque
+from collections.abc import Iterable
+
+__all__ = [
+    "ProxyState",
+    "ProxyPool",
+    "get_basic_auth",
+]
+
+
+def get_basic_auth(username: str, password: str) -> str:
+    """获取代理认证的 Proxy-Authorization 请求头的值
+
+    Args:
+        username: 代理用户名
+        password: 代理密码
+
+    Returns:
+        1). Basic 认证的请求头值
+
+    Examples:
+        >>> get_basic_auth("user", "pwd")
+        'Basic dXNlcjpwd2Q='
+    """
+    return "Basic " + base64.b64encode(f"{username}:{password}".encode()).decode()
+
+
+class ProxyState:
+    """代理池中单个代理的状态"""
+
+    __slots__ = ("proxy", "urls", "active", "requests", "health", "latency")
+
+    def __init__(self, proxy: str) -> None:
+        """初始化代理状态
+
+        Args:
+            proxy: 代理地址，比如 127.0.0.1:8080
+        """
+        self.proxy = proxy
+        # 不同协议的请求对应的 meta["proxy"]，只需生成一次
+        self.urls = {"http": f"http://{proxy}", "https": f"https://{proxy}"}
+        # 正在使用此代理的请求数
+        self.active = 0
+        self.requests = 0
+        # 成功率的指数移动平均值，范围为 0 ~ 1
+        self.health = 1.0
+        # 响应时间（秒）的指数移动平均值，未有请求完成时为 None
+        self.latency: float | None = None
+
+    @property
+    def score(self) -> float:
+        """代理的评分，成功率越高，响应越快则评分越高；还未测出响应时间的代理优先使用"""
+        return self.health / ((self.latency or 0) + 0.1)
+
+    def __repr__(self) -> str:
+        return (
+            f"ProxyState(proxy={self.proxy!r}, active={self.active}, "
+            f"health={self.health:.2f}, latency={self.latency})"
+        )
+
+
+class ProxyPool:
+    """按评分轮换使用的代理池，每个代理可限制其同时使用的请求数
+
+    每次取代理时选择未达到并发上限且评分最高的代理；请求结束后根据其结果及响应时间更新
+    代理评分，成功率低于 min_health 的代理会被淘汰，直到下次 update 时重新加入。
+
+    Examples:
+        >>> pool = ProxyPool(max_concurrency=1)
+        >>> pool.update(["127.0.0.1:1", "127.0.0.1:2"])
+        (2, 0)
+        >>> first, second = pool.get(), pool.get()
+        >>> sorted([first.proxy, second.proxy])
+        ['127.0.0.1:1', '127.0.0.1:2']
+        >>> pool.get() is None
+        True
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 0,
+        min_health: float = 0.3,
+        alpha: float = 0.3,
+    ) -> None:
+        """初始化代理池
+
+        Args:
+            max_concurrency: 每个代理同时使用的最大请求数，为 0 时不限制
+            min_health: 代理成功率低于此值时将其淘汰
+            alpha: 更新成功率及响应时间时指数移动平均的权重
+        """
+        self.max_concurrency = max_concurrency
+        self.min_health = min_health
+        self.alpha = alpha
+        self.proxies: dict[str, ProxyState] = {}
+        self._waiters: deque[asyncio.Future] = deque()
+
+    def __len__(self) -> int:
+        return len(self.proxies)
+
+    def update(self, proxies: Iterable[str]) -> tuple[int, int]:
+        """更新代理列表，已有代理保留其状态，不在列表中的代理会被移除
+
+        Args:
+            proxies: 最新的代理列表
+
+        Returns:
+            1). 新增的代理数量
+            2). 移除的代理数量
+        """
+        proxies = list(dict.fromkeys(proxies))
+        removed = self.proxies.keys() - set(proxies)
+        added = 0
+        for proxy in removed:
+            del self.proxies[proxy]
+        for proxy in proxies:
+            if proxy not in self.proxies:
+                self.proxies[proxy] = ProxyState(proxy)
+                added += 1
+        self._wake(all_waiters=True)
+        return added, len(removed)
+
+    def get(self) -> ProxyState | None:
+        """取出一个未达到并发上限且评分最高的代理
+
+        Returns:
+            1). 代理状态，所有代理都达到并发上限或代理池为空时为 None
+        """
+        available = [
+            state
+            for state in self.proxies.values()
+            if not self.max_concurrency or state.active < self.max_concurrency
+        ]
+        if not available:
+            return None
+        state = max(available, key=lambda s: (s.score, -s.active, random.random()))
+        state.active += 1
+        state.requests += 1
+        return state
+
+    async def acquire(self) -> ProxyState | None:
+        """取出一个代理，所有代理都达到并发上限时等待其它请求释放
+
+        Returns:
+            1). 代理状态，代理池为空时为 None
+        """
+        while (state := self.get()) is None:
+            if not self.proxies:
+                return None
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+        return state
+
+    def release(
+        self, state: ProxyState, latency: float | None = None, ok: bool | None = True
+    ) -> bool:
+        """释放代理并根据请求结果更新其评分
+
+        Args:
+            state: acquire 或 get 取出的代理状态
+            latency: 此次请求的响应时间（秒）
+            ok: 此次请求是否成功，被封禁或请求异常时为 False，为 None 时不更新评分
+
+        Returns:
+            1). 此代理是否因成功率过低被淘汰
+        """
+        state.active -= 1
+        if ok:
+            state.health += self.alpha * (1 - state.health)
+        elif ok is not None:
+            state.health *= 1 - self.alpha
+        if latency is not None:
+            state.latency = (
+                latency
+                if state.latency is None
+                else state.latency + self.alpha * (latency - state.latency)
+            )
+
+        evicted = (
+            state.health < self.min_health and self.proxies.get(state.proxy) is state
+        )
+        if evicted:
+            del self.proxies[state.proxy]
+        # 代理池为空时需要唤醒所有等待的请求，由其自行处理
+        self._wake(all_waiters=not self.proxies)
+        return evicted
+
+    def _wake(self, all_waiters: bool = False) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                if not all_waiters:
+                    return
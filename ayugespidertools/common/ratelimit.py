@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Hashable
+from typing import TYPE_CHECKING, Union
+
+__all__ = [
+    "TokenBucket",
+    "RateLimiter",
+    "record_ratelimit_wait",
+]
+
+if TYPE_CHECKING:
+    from scrapy.statscollectors import StatsCollector
+
+    RateT = Union[float, tuple[float, int]]
+
+
+class TokenBucket:
+    """令牌桶，以 rate 个/秒的速度生成令牌，最多累积 burst 个
+
+    取令牌时不会阻塞，令牌不足时允许预支（令牌数为负），返回需要等待的时间，由调用方自行
+    异步等待，这样同一个桶的多个请求会按顺序依次错开。
+
+    Examples:
+        >>> bucket = TokenBucket(rate=2, burst=2)
+        >>> bucket.reserve(), bucket.reserve()
+        (0.0, 0.0)
+        >>> 0.4 < bucket.reserve() <= 0.5
+        True
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        """初始化令牌桶
+
+        Args:
+            rate: 每秒生成的令牌数，即每秒允许的请求数
+            burst: 最多可累积的令牌数，即允许的突发请求数
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """取出一个令牌
+
+        Returns:
+            1). 取到此令牌前需要等待的时间（秒），为 0 时表示可以立即执行
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    """按 key（比如域名，代理或自定义的值）分别限速的令牌桶集合
+
+    Examples:
+        >>> limiter = RateLimiter(rate=1, overrides={"example.com": (100, 10)})
+        >>> limiter.get_rate("www.example.com")
+        (100, 10)
+        >>> limiter.get_rate("other.com")
+        (1, 1)
+        >>> RateLimiter(rate=0).reserve("other.com")
+        0.0
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        overrides: dict[str, RateT] | None = None,
+    ) -> None:
+        """初始化限速器
+
+        Args:
+            rate: 默认的每秒请求数，小于等于 0 时不限速
+            burst: 默认的突发请求数
+            overrides: 单独设置的 key 的限速，值为每秒请求数或 (每秒请求数, 突发请求数)；
+                key 为域名时同样适用于其子域名
+        """
+        self.rate = rate
+        self.burst = burst
+        self.overrides = overrides or {}
+        self._buckets: dict[Hashable, TokenBucket | None] = {}
+
+    def get_rate(self, key: Hashable) -> tuple[float, int]:
+        """获取 key 对应的 (每秒请求数, 突发请求数)，依次匹配 key 本身及其上级域名"""
+        if isinstance(key, str):
+            parts = key.split(".")
+            for i in range(len(parts)):
+                if (rate := self.overrides.get(".".join(parts[i:]))) is not None:
+                    if isinstance(rate, (list, tuple)):
+                        return rate[0], rate[1]
+                    return rate, self.burst
+        return self.rate, self.burst
+
+    def reserve(self, key: Hashable) -> float:
+        """从 key 对应的令牌桶中取出一个令牌
+
+        Args:
+            key: 限速的分组标识
+
+        Returns:
+            1). 需要等待的时间（秒）
+        """
+        if key not in self._buckets:
+            rate, burst = self.get_rate(key)
+            self._buckets[key] = TokenBucket(rate, burst) if rate > 0 else None
+        if (bucket := self._buckets[key]) is None:
+            return 0.0
+        return bucket.reserve()
+
+
+def record_ratelimit_wait(stats: StatsCollector, wait: float) -> None:
+    """记录限速等待的次数及时间
+
+    Args:
+        stats: scrapy stats
+        wait: 等待的时间（秒）
+    """
+    wait_ms = round(wait * 1000, 2)
+    stats.inc_value("ratelimit/delayed")
+    stats.inc_value("ratelimit/wait/total_ms", wait_ms)
+    stats.set_value(
+        "ratelimit/wait/avg_ms",
+        round(
+            stats.get_value("ratelimit/wait/total_ms")
+            / stats.get_value("ratelimit/delayed"),
+            2,
+        ),
+    )
+    stats.set_value("ratelimit/wait/last_ms", wait_ms)
+    stats.max_value("ratelimit/wait/max_ms", wait_ms)
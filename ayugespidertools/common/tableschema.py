@@ -0,0 +1,522 @@
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING, Any
+
+from ayugespidertools.common.typevars import Column
+from ayugespidertools.config import logger
+
+__all__ = [
+    "get_columns",
+    "get_indexes",
+    "get_mysql_schema_sql",
+    "get_postgres_schema_sql",
+    "get_oracle_schema_sql",
+    "apply_mysql_schema",
+    "apply_postgres_schema",
+    "apply_oracle_schema",
+    "apply_table_schemas",
+]
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from ayugespidertools.common.typevars import MysqlConf, TableSchema
+
+# 各数据库中 Column.type 对应的字段类型，带 {} 的需要填充字段长度
+_MYSQL_TYPES = {
+    "varchar": "VARCHAR({})",
+    "char": "CHAR({})",
+    "text": "TEXT",
+    "mediumtext": "MEDIUMTEXT",
+    "longtext": "LONGTEXT",
+    "int": "INT",
+    "bigint": "BIGINT",
+    "float": "DOUBLE",
+    "bool": "TINYINT(1)",
+    "date": "DATE",
+    "datetime": "DATETIME",
+    "json": "JSON",
+}
+# 与 postgresql 中 format_type 返回的名称一致，以便比较字段类型是否需要修改
+_POSTGRES_TYPES = {
+    "varchar": "character varying({})",
+    "char": "character({})",
+    "text": "text",
+    "mediumtext": "text",
+    "longtext": "text",
+    "int": "integer",
+    "bigint": "bigint",
+    "float": "double precision",
+    "bool": "boolean",
+    "date": "date",
+    "datetime": "timestamp without time zone",
+    "json": "jsonb",
+}
+_ORACLE_TYPES = {
+    "varchar": "VARCHAR2({} CHAR)",
+    "char": "CHAR({} CHAR)",
+    "text": "CLOB",
+    "mediumtext": "CLOB",
+    "longtext": "CLOB",
+    "int": "NUMBER(10)",
+    "bigint": "NUMBER(19)",
+    "float": "BINARY_DOUBLE",
+    "bool": "NUMBER(1)",
+    "date": "DATE",
+    "datetime": "TIMESTAMP",
+    "json": "CLOB",
+}
+_DEFAULT_LENGTH = {"varchar": 255, "char": 1}
+# mysql 5.7 中整数类型会带有显示宽度，比如 int(11)，比较时需要去掉
+_MYSQL_INT_WIDTH = re.compile(r"^((?:tiny|small|medium|big)?int)\(\d+\)")
+# 迁移时只会加宽字段类型，以下为可以比较宽度的类型，同一类别中数值越大可存储的范围越大
+_CHAR_WIDTH = re.compile(r"^(?:var)?char(?:acter)?(?: varying)?\((\d+)\)$")
+_INT_WIDTHS = {
+    "tinyint": 1,
+    "smallint": 2,
+    "mediumint": 3,
+    "int": 4,
+    "integer": 4,
+    "bigint": 8,
+}
+_FLOAT_WIDTHS = {"float": 4, "real": 4, "double": 8, "double precision": 8}
+_MYSQL_TEXT_WIDTHS = {
+    "tinytext": 255,
+    "text": 65535,
+    "mediumtext": 16777215,
+    "longtext": 4294967295,
+}
+_POSTGRES_TEXT_WIDTHS = {"text": 1 << 30, "character varying": 1 << 30}
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _render_type(column: Column, types: dict[str, str]) -> str:
+    if (template := types.get(column.type.lower())) is None:
+        # 不在映射中的类型原样使用，以支持各数据库特有的类型
+        if column.length:
+            return f"{column.type}({column.length})"
+        return column.type
+    length = column.length or _DEFAULT_LENGTH.get(column.type.lower())
+    return template.format(length)
+
+
+def get_columns(schema: TableSchema) -> dict[str, Column]:
+    """获取数据表结构中的字段，并将 str 形式的字段描述转换为 Column
+
+    Args:
+        schema: 数据表结构
+
+    Returns:
+        1). 字段名与 Column 的映射
+
+    Examples:
+        >>> from ayugespidertools.common.typevars import TableSchema
+        >>> get_columns(TableSchema("ta", {"content": "text"}))
+        {'content': Column(type='text', length=None, notes='', index=False, unique=False)}
+    """
+    return {
+        name: Column(column) if isinstance(column, str) else column
+        for name, column in schema.columns.items()
+    }
+
+
+def get_indexes(schema: TableSchema) -> list[tuple[str, tuple[str, ...], bool]]:
+    """获取数据表结构中的所有索引，包括字段上声明的单列索引
+
+    Args:
+        schema: 数据表结构
+
+    Returns:
+        1). (索引名, 字段名, 是否为唯一索引) 的列表，索引名由表名及字段名生成
+
+    Examples:
+        >>> from ayugespidertools.common.typevars import TableSchema
+        >>> schema = TableSchema(
+        ...     "ta", {"url": Column(unique=True)}, indexes=(("a", "b"),)
+        ... )
+        >>> get_indexes(schema)
+        [('uk_ta_url', ('url',), True), ('idx_ta_a_b', ('a', 'b'), False)]
+    """
+    indexes = []
+    for name, column in get_columns(schema).items():
+        if column.unique:
+            indexes.append(((name,), True))
+        elif column.index:
+            indexes.append(((name,), False))
+    indexes += [(tuple(x), True) for x in schema.unique]
+    indexes += [(tuple(x), False) for x in schema.indexes]
+    return [
+        (f"{'uk' if unique else 'idx'}_{schema.name}_{'_'.join(keys)}", keys, unique)
+        for keys, unique in indexes
+    ]
+
+
+def _get_type_width(
+    column_type: str, text_widths: dict[str, int]
+) -> tuple[str, int] | None:
+    """获取字段类型的类别及宽度，无法比较宽度的类型返回 None"""
+    column_type = column_type.lower()
+    if m := _CHAR_WIDTH.match(column_type):
+        return "str", int(m.group(1))
+    for kind, widths in (
+        ("str", text_widths),
+        ("int", _INT_WIDTHS),
+        ("float", _FLOAT_WIDTHS),
+    ):
+        if column_type in widths:
+            return kind, widths[column_type]
+    return None
+
+
+def _is_wider(column_type: str, exists_type: str, text_widths: dict[str, int]) -> bool:
+    """判断声明的字段类型是否比已有的字段类型更宽，即修改后不会截断或丢失已有的数据
+
+    Examples:
+        >>> _is_wider("varchar(512)", "varchar(255)", _MYSQL_TEXT_WIDTHS)
+        True
+        >>> _is_wider("longtext", "varchar(255)", _MYSQL_TEXT_WIDTHS)
+        True
+        >>> _is_wider("varchar(255)", "text", _MYSQL_TEXT_WIDTHS)
+        False
+        >>> _is_wider("int", "varchar(255)", _MYSQL_TEXT_WIDTHS)
+        False
+    """
+    declared = _get_type_width(column_type, text_widths)
+    exists = _get_type_width(exists_type, text_widths)
+    if declared is None or exists is None or declared[0] != exists[0]:
+        return False
+    return declared[1] > exists[1]
+
+
+def _warn_not_wider(table: str, name: str, column_type: str, exists_type: str) -> None:
+    logger.warning(
+        f"数据表 {table} 中字段 {name} 声明的类型 {column_type} 不比已有的类型 "
+        f"{exists_type} 更宽，迁移时只会加宽字段类型，不做修改"
+    )
+
+
+def _normalize_mysql_type(column_type: str) -> str:
+    return _MYSQL_INT_WIDTH.sub(r"\1", column_type.lower().replace(" ", ""))
+
+
+def get_mysql_schema_sql(
+    schema: TableSchema,
+    columns: dict[str, str],
+    indexes: set[str],
+    engine: str = "InnoDB",
+    charset: str = "utf8mb4",
+    collate: str = "utf8mb4_general_ci",
+) -> list[str]:
+    """生成创建或迁移 mysql 数据表的 sql，迁移时所有修改都在同一条 ALTER TABLE 中完成
+
+    已有字段的类型只会加宽（比如 varchar(255) 修改为 varchar(512) 或 text），声明的类型更窄
+    或无法比较时只记录警告日志。
+
+    Args:
+        schema: 数据表结构
+        columns: 数据表中已有的小写字段名与字段类型的映射，为空时表示数据表不存在
+        indexes: 数据表中已有的索引名
+        engine: 创建表的 engine
+        charset: charset
+        collate: collate
+
+    Returns:
+        1). 需要执行的 sql，数据表结构一致时为空列表
+
+    Examples:
+        >>> from ayugespidertools.common.typevars import TableSchema
+        >>> schema = TableSchema("ta", {"title": Column("varchar", 512, "标题")})
+        >>> get_mysql_schema_sql(schema, {"id": "int", "title": "varchar(512)"}, set())
+        []
+        >>> get_mysql_schema_sql(schema, {"id": "int", "title": "varchar(255)"}, set())
+        ["ALTER TABLE `ta` MODIFY COLUMN `title` VARCHAR(512) NULL DEFAULT NULL COMMENT '标题';"]
+    """
+    definitions = {
+        name: (
+            f"`{name}` {_render_type(column, _MYSQL_TYPES)} NULL DEFAULT NULL"
+            f" COMMENT {_quote(column.notes)}",
+            _render_type(column, _MYSQL_TYPES),
+        )
+        for name, column in get_columns(schema).items()
+    }
+    index_definitions = {
+        name: f"{'UNIQUE ' if unique else ''}INDEX `{name}` (`{'`, `'.join(keys)}`)"
+        for name, keys, unique in get_indexes(schema)
+    }
+
+    if not columns:
+        body = []
+        if "id" not in definitions:
+            body.append("`id` int(32) NOT NULL AUTO_INCREMENT COMMENT 'id'")
+        body += [definition for definition, _ in definitions.values()]
+        if "id" not in definitions:
+            body.append("PRIMARY KEY (`id`)")
+        body += index_definitions.values()
+        return [
+            f"CREATE TABLE IF NOT EXISTS `{schema.name}` ({', '.join(body)})"
+            f" ENGINE={engine} DEFAULT CHARSET={charset} COLLATE={collate}"
+            f" COMMENT={_quote(schema.notes)};"
+        ]
+
+    alters = []
+    for name, (definition, column_type) in definitions.items():
+        if (exists_type := columns.get(name.lower())) is None:
+            alters.append(f"ADD COLUMN {definition}")
+        elif (exists := _normalize_mysql_type(exists_type)) != (
+            declared := _normalize_mysql_type(column_type)
+        ):
+            if _is_wider(declared, exists, _MYSQL_TEXT_WIDTHS):
+                alters.append(f"MODIFY COLUMN {definition}")
+            else:
+                _warn_not_wider(schema.name, name, column_type, exists_type)
+    alters += [
+        f"ADD {definition}"
+        for name, definition in index_definitions.items()
+        if name not in indexes
+    ]
+    if not alters:
+        return []
+    return [f"ALTER TABLE `{schema.name}` {', '.join(alters)};"]
+
+
+def get_postgres_schema_sql(schema: TableSchema, columns: dict[str, str]) -> list[str]:
+    """生成创建或迁移 postgresql 数据表的 sql，字段的添加及修改在同一条 ALTER TABLE 中完成
+
+    与 mysql 相同，已有字段的类型只会加宽。
+
+    Args:
+        schema: 数据表结构
+        columns: 数据表中已有的小写字段名与 format_type 字段类型的映射，为空时表示数据表不存在
+
+    Returns:
+        1). 需要执行的 sql，数据表结构一致时为空列表
+
+    Examples:
+        >>> from ayugespidertools.common.typevars import TableSchema
+        >>> schema = TableSchema("ta", {"content": "text"})
+        >>> get_postgres_schema_sql(schema, {"id": "integer", "content": "text"})
+        []
+        >>> get_postgres_schema_sql(
+        ...     schema, {"id": "integer", "content": "character varying(255)"}
+        ... )
+        ['ALTER TABLE ta ALTER COLUMN content TYPE text USING content::text;']
+    """
+    schema_columns = get_columns(schema)
+    sqls = []
+    if not columns:
+        body = [] if "id" in schema_columns else ["id SERIAL NOT NULL PRIMARY KEY"]
+        body += [
+            f"{name} {_render_type(column, _POSTGRES_TYPES)}"
+            for name, column in schema_columns.items()
+        ]
+        sqls.append(f"CREATE TABLE IF NOT EXISTS {schema.name} ({', '.join(body)});")
+        sqls.append(f"COMMENT ON TABLE {schema.name} IS {_quote(schema.notes)};")
+        added = schema_columns
+    else:
+        alters = []
+        added = {}
+        for name, column in schema_columns.items():
+            column_type = _render_type(column, _POSTGRES_TYPES)
+            if (exists_type := columns.get(name.lower())) is None:
+                alters.append(f"ADD COLUMN IF NOT EXISTS {name} {column_type}")
+                added[name] = column
+            elif exists_type.lower() == column_type.lower():
+                continue
+            elif _is_wider(column_type, exists_type, _POSTGRES_TEXT_WIDTHS):
+                alters.append(
+                    f"ALTER COLUMN {name} TYPE {column_type} USING {name}::{column_type}"
+                )
+            else:
+                _warn_not_wider(schema.name, name, column_type, exists_type)
+        if alters:
+            sqls.append(f"ALTER TABLE {schema.name} {', '.join(alters)};")
+
+    sqls += [
+        f"COMMENT ON COLUMN {schema.name}.{name} IS {_quote(column.notes)};"
+        for name, column in added.items()
+        if column.notes
+    ]
+    sqls += [
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name}"
+        f" ON {schema.name} ({', '.join(keys)});"
+        for name, keys, unique in get_indexes(schema)
+    ]
+    return sqls
+
+
+def get_oracle_schema_sql(
+    schema: TableSchema, columns: dict[str, str], indexes: set[str]
+) -> list[str]:
+    """生成创建 oracle 数据表或添加缺失字段的 sql
+
+    oracle 中 VARCHAR2 不能直接修改为 CLOB，所以已存在字段的类型不会修改。
+
+    Args:
+        schema: 数据表结构
+        columns: 数据表中已有的字段名与字段类型的映射，为空时表示数据表不存在
+        indexes: 数据表中已有的索引名
+
+    Returns:
+        1). 需要执行的 sql，每条 sql 都需要单独执行
+
+    Examples:
+        >>> from ayugespidertools.common.typevars import TableSchema
+        >>> schema = TableSchema("ta", {"title": Column(length=64), "content": "text"})
+        >>> get_oracle_schema_sql(schema, {"id": "NUMBER", "title": "VARCHAR2"}, set())
+        ['ALTER TABLE "ta" ADD ("content" CLOB)']
+    """
+    table = schema.name
+    schema_columns = get_columns(schema)
+    sqls = []
+    if not columns:
+        body = (
+            []
+            if "id" in schema_columns
+            else ['"id" NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY']
+        )
+        body += [
+            f'"{name}" {_render_type(column, _ORACLE_TYPES)}'
+            for name, column in schema_columns.items()
+        ]
+        sqls.append(f'CREATE TABLE "{table}" ({", ".join(body)})')
+        if schema.notes:
+            sqls.append(f'COMMENT ON TABLE "{table}" IS {_quote(schema.notes)}')
+        added = schema_columns
+    else:
+        added = {k: v for k, v in schema_columns.items() if k not in columns}
+        if added:
+            add_columns = ", ".join(
+                f'"{name}" {_render_type(column, _ORACLE_TYPES)}'
+                for name, column in added.items()
+            )
+            sqls.append(f'ALTER TABLE "{table}" ADD ({add_columns})')
+
+    sqls += [
+        f'COMMENT ON COLUMN "{table}"."{name}" IS {_quote(column.notes)}'
+        for name, column in added.items()
+        if column.notes
+    ]
+    for name, keys, unique in get_indexes(schema):
+        if name not in indexes:
+            index_columns = ", ".join(f'"{key}"' for key in keys)
+            sqls.append(
+                f'CREATE {"UNIQUE " if unique else ""}INDEX "{name}"'
+                f' ON "{table}" ({index_columns})'
+            )
+    return sqls
+
+
+def _fetch_rows(cursor: Any, sql: str, args: tuple) -> list[tuple]:
+    cursor.execute(sql, args)
+    # 兼容 DictCursor 等返回 dict 的 cursor
+    return [
+        tuple(line.values()) if isinstance(line, dict) else tuple(line)
+        for line in cursor.fetchall()
+    ]
+
+
+def _exec_sqls(cursor: Any, sqls: list[str], table: str) -> None:
+    for sql in sqls:
+        logger.info(f"更新数据表 {table} 的结构: {sql}")
+        cursor.execute(sql)
+
+
+def apply_mysql_schema(cursor: Any, mysql_conf: MysqlConf, schema: TableSchema) -> None:
+    """根据数据表结构创建或迁移 mysql 数据表
+
+    Args:
+        cursor: mysql connect cursor
+        mysql_conf: spider mysql_conf
+        schema: 数据表结构
+    """
+    args = (mysql_conf.database, schema.name)
+    columns = _fetch_rows(
+        cursor,
+        "select COLUMN_NAME, COLUMN_TYPE from information_schema.columns"
+        " where table_schema = %s and table_name = %s",
+        args,
+    )
+    indexes = _fetch_rows(
+        cursor,
+        "select distinct INDEX_NAME from information_schema.statistics"
+        " where table_schema = %s and table_name = %s",
+        args,
+    )
+    sqls = get_mysql_schema_sql(
+        schema,
+        columns={name.lower(): column_type for name, column_type in columns},
+        indexes={line[0] for line in indexes},
+        engine=mysql_conf.engine,
+        charset=mysql_conf.charset,
+        collate=mysql_conf.collate,
+    )
+    _exec_sqls(cursor, sqls, schema.name)
+
+
+def apply_postgres_schema(cursor: Any, schema: TableSchema) -> None:
+    """根据数据表结构创建或迁移 postgresql 数据表，需要调用方 commit
+
+    Args:
+        cursor: postgresql connect cursor
+        schema: 数据表结构
+    """
+    columns = _fetch_rows(
+        cursor,
+        "select attname, format_type(atttypid, atttypmod) from pg_attribute"
+        " where attrelid = to_regclass(%s) and attnum > 0 and not attisdropped",
+        (schema.name,),
+    )
+    sqls = get_postgres_schema_sql(schema, columns=dict(columns))
+    _exec_sqls(cursor, sqls, schema.name)
+
+
+def apply_oracle_schema(cursor: Any, schema: TableSchema) -> None:
+    """根据数据表结构创建 oracle 数据表或添加缺失的字段
+
+    Args:
+        cursor: oracle connect cursor
+        schema: 数据表结构
+    """
+    columns = _fetch_rows(
+        cursor,
+        "select column_name, data_type from user_tab_columns where table_name = :1",
+        (schema.name,),
+    )
+    indexes = _fetch_rows(
+        cursor,
+        "select index_name from user_indexes where table_name = :1",
+        (schema.name,),
+    )
+    sqls = get_oracle_schema_sql(
+        schema, columns=dict(columns), indexes={line[0] for line in indexes}
+    )
+    _exec_sqls(cursor, sqls, schema.name)
+
+
+def apply_table_schemas(
+    conn: Any,
+    schemas: Iterable[TableSchema],
+    apply: Callable[[Any, TableSchema], None],
+) -> None:
+    """依次创建或迁移数据表，某个数据表失败时只记录日志，插入时仍会按报错自动修复库表结构
+
+    Args:
+        conn: 数据库链接
+        schemas: 数据表结构
+        apply: 创建或迁移单个数据表的方法，比如 apply_mysql_schema
+    """
+    cursor = conn.cursor()
+    try:
+        for schema in schemas:
+            try:
+                apply(cursor, schema)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"更新数据表 {schema.name} 的结构失败，err: {e}")
+    finally:
+        cursor.close()
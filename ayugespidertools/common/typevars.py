@@ -133,6 +133,24 @@ class AiohttpConf(NamedTuple):
     sleep: int | None = None
     retry_times: int | None = None
     timeout: int | None = None
+    retry_http_codes: set[int] | None = None
+    retry_exceptions: tuple[type[Exception], ...] | None = None
+    retry_backoff_base: float | None = None
+    retry_backoff_max: float | None = None
+
+
+class AiohttpStreamResult(NamedTuple):
+    """AiohttpRequest 流式下载响应内容的结果
+
+    Attributes:
+        path: 响应内容存储的文件路径
+        size: 响应内容的字节数
+        hash: 响应内容的 hash 值，未开启时为 None
+    """
+
+    path: str
+    size: int
+    hash: str | None = None
 
 
 class AlterItemTable(NamedTuple):
@@ -154,6 +172,43 @@ class AlterItem(NamedTuple):
     is_namedtuple: bool = False
 
 
+class Column(NamedTuple):
+    """用于描述 TableSchema 中的字段
+
+    Attributes:
+        type: 字段类型，可以是 varchar, char, text, mediumtext, longtext, int, bigint,
+            float, bool, date, datetime, json，会转换为各数据库对应的类型；其它值原样使用
+        length: 字段长度，varchar 默认为 255
+        notes: 字段注释
+        index: 是否为此字段创建索引
+        unique: 是否为此字段创建唯一索引
+    """
+
+    type: str = "varchar"
+    length: int | None = None
+    notes: str = ""
+    index: bool = False
+    unique: bool = False
+
+
+class TableSchema(NamedTuple):
+    """用于描述数据表结构，在 open_spider 时一次性创建数据表或添加，修改字段
+
+    Attributes:
+        name: 数据表名，与 AyuItem 中的 _table 对应
+        columns: 字段名与字段描述的映射，字段描述为 str 时表示其字段类型
+        notes: 数据表注释
+        indexes: 联合索引，每个元素为组成索引的字段名
+        unique: 联合唯一索引，每个元素为组成索引的字段名
+    """
+
+    name: str
+    columns: dict[str, Column | str]
+    notes: str = ""
+    indexes: tuple[tuple[str, ...], ...] = ()
+    unique: tuple[tuple[str, ...], ...] = ()
+
+
 class MQConf(NamedTuple):
     host: str
     port: int
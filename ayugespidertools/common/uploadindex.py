@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import sqlite3
+from typing import TYPE_CHECKING
+
+__all__ = [
+    "UploadIndex",
+]
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class UploadIndex:
+    """持久化的上传索引，记录文件链接的 hash 与已上传对象的 key 及大小，用于跳过重复的下载及上传
+
+    Examples:
+        >>> index = UploadIndex(":memory:")
+        >>> index.get("abc") is None
+        True
+        >>> index.set("abc", "img/abc.jpg", 1024)
+        >>> index.get("abc")
+        ('img/abc.jpg', 1024)
+        >>> index.close()
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """打开（不存在时创建）索引文件
+
+        Args:
+            path: 索引文件路径
+        """
+        self.conn = sqlite3.connect(str(path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS upload_index ("
+            "url_hash TEXT PRIMARY KEY, object_key TEXT NOT NULL, size INTEGER)"
+        )
+        self.conn.commit()
+
+    def get(self, url_hash: str) -> tuple[str, int] | None:
+        """获取链接 hash 对应的对象 key 及大小，不存在时返回 None"""
+        return self.conn.execute(
+            "SELECT object_key, size FROM upload_index WHERE url_hash = ?",
+            (url_hash,),
+        ).fetchone()
+
+    def set(self, url_hash: str, object_key: str, size: int) -> None:
+        """记录链接 hash 对应的对象 key 及大小"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO upload_index VALUES (?, ?, ?)",
+            (url_hash, object_key, size),
+        )
+        self.conn.commit()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM upload_index").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
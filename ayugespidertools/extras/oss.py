@@ -72,8 +72,36 @@ class AliOssBase:
         """
         assert isinstance(put_bytes, bytes), "put_bytes 需要是 bytes 格式"
 
-        oss_file_path = f"{self.doc}/{file}" if self.doc else file
-        self.bucket.put_object(oss_file_path, put_bytes)
+        self.bucket.put_object(self.get_object_key(file), put_bytes)
+
+    def get_object_key(self, file: str) -> str:
+        """获取文件在 bucket 中的对象 key
+
+        Args:
+            file: 当前文件
+
+        Returns:
+            1). 包含 doc 目录的对象 key
+        """
+        return f"{self.doc}/{file}" if self.doc else file
+
+    @retry(stop_max_attempt_number=Param.retry_num)
+    def find_object(self, file_prefix: str) -> tuple[str, int] | None:
+        """查找 bucket 中以此文件名前缀开头的对象，可用于确认不带后缀的文件是否已上传
+
+        Args:
+            file_prefix: 文件名前缀
+
+        Returns:
+            1). 找到时返回对象 key 及其大小，否则为 None
+        """
+        result = self.bucket.list_objects(
+            prefix=self.get_object_key(file_prefix), max_keys=1
+        )
+        if not result.object_list:
+            return None
+        obj = result.object_list[0]
+        return obj.key, obj.size
 
     def get_full_link(self, file: str) -> str:
         """获取文件的完整链接
@@ -85,5 +113,4 @@ class AliOssBase:
             1). 当前文件的完整链接
         """
         ep = self.endpoint.replace("https://", "", 1).replace("http://", "", 1)
-        oss_file_path = f"{self.doc}/{file}" if self.doc else file
-        return f"https://{self.bk}.{ep}/{oss_file_path}"
+        return f"https://{self.bk}.{ep}/{self.get_object_key(file)}"
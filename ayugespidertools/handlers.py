@@ -0,0 +1,5 @@
+from ayugespidertools.scraper.handlers.aiohttplib import AiohttpDownloadHandler
+
+__all__ = [
+    "AiohttpDownloadHandler",
+]
@@ -1,18 +1,25 @@
 from __future__ import annotations
 
 from abc import ABCMeta
-from collections.abc import Iterator, MutableMapping
+from collections.abc import Callable, Iterator, MutableMapping
 from dataclasses import dataclass
-from typing import Any, NamedTuple, NoReturn
+from typing import Any, NamedTuple
 
 import scrapy
 from scrapy.item import Item
 
-from ayugespidertools.common.typevars import EmptyKeyError, FieldAlreadyExistsError
+from ayugespidertools.common.typevars import (
+    Column,
+    EmptyKeyError,
+    FieldAlreadyExistsError,
+    TableSchema,
+)
 
 __all__ = [
     "DataItem",
     "AyuItem",
+    "Column",
+    "TableSchema",
 ]
 
 
@@ -34,6 +41,13 @@ class DataItem(NamedTuple):
     notes: Any = ""
 
 
+def _rebuild_item(cls: type[AyuItem], data: dict[str, Any]) -> AyuItem:
+    item = cls.__new__(cls)
+    object.__setattr__(item, "_AyuItem__data", data)
+    object.__setattr__(item, "_AyuItem__views", None)
+    return item
+
+
 class ItemMeta(ABCMeta):
     def __new__(
         cls, class_name: str, bases: tuple[type, ...], attrs: dict[str, Any]
@@ -48,16 +62,13 @@ class ItemMeta(ABCMeta):
             """
             if not key:
                 raise EmptyKeyError()
-            if key in self._AyuItem__fields:
+            if key in self._AyuItem__data:
                 raise FieldAlreadyExistsError(key)
-            setattr(self, key, value)
-            self._AyuItem__fields.add(key)
+            self[key] = value
 
         def asdict(self) -> dict[str, Any]:
             """将 AyuItem 转换为 dict"""
-            self._AyuItem__fields.discard("_AyuItem__fields")
-            _item_dict = {key: getattr(self, key) for key in self._AyuItem__fields}
-            return _item_dict
+            return self._AyuItem__data.copy()
 
         def asitem(self, assignment: bool = True) -> ScrapyItem:
             """将 AyuItem 转换为 ScrapyItem
@@ -87,6 +98,9 @@ class AyuItem(MutableMapping, metaclass=ItemMeta):
     """Used to create AyuItem, add fields dynamically,
     and provides methods to convert to dict and ScrapyItem.
 
+    All fields are stored in a single internal dict, instances have no
+    __dict__ of their own.
+
     Examples:
         >>> item = AyuItem(
         ...     _table="ta",
@@ -115,6 +129,8 @@ class AyuItem(MutableMapping, metaclass=ItemMeta):
         {'_table': 'tab'}
     """
 
+    __slots__ = ("__data", "__views")
+
     def __init__(
         self,
         _table: DataItem | str,
@@ -127,62 +143,97 @@ class AyuItem(MutableMapping, metaclass=ItemMeta):
             _table: 数据库表名。
             _mongo_update_rule: MongoDB 存储场景下可能需要的查重条件，默认为 None。
         """
-        self.__fields = set()
+        data = {}
         if _table:
-            self.__fields.add("_table")
-            setattr(self, "_table", _table)
+            data["_table"] = _table
         if _mongo_update_rule:
-            self.__fields.add("_mongo_update_rule")
-            setattr(self, "_mongo_update_rule", _mongo_update_rule)
-        for key, value in kwargs.items():
-            setattr(self, key, value)
-            self.__fields.add(key)
+            data["_mongo_update_rule"] = _mongo_update_rule
+        data.update(kwargs)
+        object.__setattr__(self, "_AyuItem__data", data)
+        # get_view 生成的视图缓存，字段变化时清空
+        object.__setattr__(self, "_AyuItem__views", None)
 
     def __getitem__(self, key: str) -> Any:
-        return getattr(self, key)
+        try:
+            return self.__data[key]
+        except KeyError:
+            raise AttributeError(key) from None
 
     def __setitem__(self, key: str, value: Any) -> None:
-        if key not in self.__fields:
-            setattr(self, key, value)
-            self.__fields.add(key)
-        else:
-            setattr(self, key, value)
+        self.__data[key] = value
+        if self.__views:
+            self.__views.clear()
 
     def __delitem__(self, key: str) -> None:
-        if key not in self.__fields:
+        if key not in self.__data:
             raise KeyError(f"{key} not found")
-        delattr(self, key)
-        self.__fields.discard(key)
+        del self.__data[key]
+        if self.__views:
+            self.__views.clear()
 
-    def __getattr__(self, name: str) -> NoReturn:
-        if name in self.__fields:
-            raise AttributeError(f"Use item[{name!r}] to get field value")
-        raise AttributeError(name)
+    def __contains__(self, key: object) -> bool:
+        return key in self.__data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.__data.get(key, default)
+
+    def __getattr__(self, name: str) -> Any:
+        # 只有在 slot 及类属性中找不到时才会调用，用于支持 item.field 的取值方式
+        try:
+            return self.__data[name]
+        except KeyError:
+            raise AttributeError(name) from None
 
     def __setattr__(self, name: str, value: Any) -> None:
-        super().__setattr__(name, value)
-        self.__fields.add(name)
+        self[name] = value
 
     def __delattr__(self, name: str) -> None:
-        super().__delattr__(name)
-        self.__fields.discard(name)
+        if name not in self.__data:
+            raise AttributeError(name)
+        del self[name]
 
     def __iter__(self) -> Iterator[str]:
-        return iter(self.__fields)
+        return iter(self.__data)
 
     def __len__(self) -> int:
-        return len(self.__fields)
+        return len(self.__data)
 
     def __str__(self) -> str:
         # 与下方 __repr__ 一样，不返回 AyuItem(field=data) 的格式
-        return f"{self.asdict()}"
+        return f"{self.__data}"
 
     def __repr__(self) -> str:
-        return f"{self.asdict()}"
+        return f"{self.__data}"
+
+    def __reduce__(self):
+        # 没有 __dict__ 且重写了 __setattr__，pickle 及 copy 时直接使用字段重建实例
+        return _rebuild_item, (self.__class__, self.__data.copy())
 
     def fields(self) -> set:
-        self.__fields.discard("_AyuItem__fields")
-        return self.__fields
+        return set(self.__data)
+
+    def get_view(
+        self, name: str, factory: Callable[[AyuItem], Any]
+    ) -> tuple[Any, bool]:
+        """获取由 factory 生成的 item 视图，生成后会缓存在 item 中，直到添加，修改或删除字段
+
+        视图会在多个 pipeline 之间共享，使用方不能修改其内容；字段值本身的原地修改（比如
+        向列表类型的字段追加元素）不会使缓存失效。
+
+        Args:
+            name: 视图名称
+            factory: 根据 item 生成视图的方法
+
+        Returns:
+            1). item 视图
+            2). 是否命中缓存
+        """
+        if self.__views is None:
+            object.__setattr__(self, "_AyuItem__views", {})
+        elif name in self.__views:
+            return self.__views[name], True
+        view = self.__views[name] = factory(self)
+        return view, False
 
     def add_field(self, key: str, value: Any) -> None: ...
 
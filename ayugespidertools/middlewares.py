@@ -9,6 +9,9 @@ from ayugespidertools.scraper.middlewares.proxy.dynamic import (
 from ayugespidertools.scraper.middlewares.proxy.exclusive import (
     ExclusiveProxyDownloaderMiddleware,
 )
+from ayugespidertools.scraper.middlewares.ratelimit.tokenbucket import (
+    RateLimitDownloaderMiddleware,
+)
 
 __all__ = [
     "RandomRequestUaMiddleware",
@@ -16,4 +19,5 @@ __all__ = [
     "AbuDynamicProxyDownloaderMiddleware",
     "DynamicProxyDownloaderMiddleware",
     "ExclusiveProxyDownloaderMiddleware",
+    "RateLimitDownloaderMiddleware",
 ]
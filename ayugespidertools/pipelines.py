@@ -1,3 +1,4 @@
+from ayugespidertools.scraper.pipelines.dedup import AyuBloomDedupPipeline
 from ayugespidertools.scraper.pipelines.download.file import FilesDownloadPipeline
 from ayugespidertools.scraper.pipelines.es.asynced import AyuAsyncESPipeline
 from ayugespidertools.scraper.pipelines.es.fantasy import AyuFtyESPipeline
@@ -5,7 +6,10 @@ from ayugespidertools.scraper.pipelines.mongo.asynced import AyuAsyncMongoPipeli
 from ayugespidertools.scraper.pipelines.mongo.fantasy import AyuFtyMongoPipeline
 from ayugespidertools.scraper.pipelines.mongo.twisted import AyuTwistedMongoPipeline
 from ayugespidertools.scraper.pipelines.msgproducer.kafkapub import AyuKafkaPipeline
-from ayugespidertools.scraper.pipelines.msgproducer.mqpub import AyuMQPipeline
+from ayugespidertools.scraper.pipelines.msgproducer.mqpub import (
+    AyuMQPipeline,
+    AyuTwistedMQPipeline,
+)
 from ayugespidertools.scraper.pipelines.mysql.asynced import AyuAsyncMysqlPipeline
 from ayugespidertools.scraper.pipelines.mysql.fantasy import AyuFtyMysqlPipeline
 from ayugespidertools.scraper.pipelines.mysql.stats import AyuStatisticsMysqlPipeline
@@ -16,6 +20,10 @@ from ayugespidertools.scraper.pipelines.oracle.twisted import AyuTwistedOraclePi
 from ayugespidertools.scraper.pipelines.oss.ali import AyuAsyncOssPipeline
 from ayugespidertools.scraper.pipelines.oss.batch import AyuAsyncOssBatchPipeline
 from ayugespidertools.scraper.pipelines.postgres.asynced import AyuAsyncPostgresPipeline
+from ayugespidertools.scraper.pipelines.postgres.bulk import (
+    AyuAsyncPostgresBulkPipeline,
+    AyuPostgresBulkPipeline,
+)
 from ayugespidertools.scraper.pipelines.postgres.fantasy import AyuFtyPostgresPipeline
 from ayugespidertools.scraper.pipelines.postgres.twisted import (
     AyuTwistedPostgresPipeline,
@@ -33,13 +41,17 @@ __all__ = [
     "AyuFtyMongoPipeline",
     "AyuTwistedMongoPipeline",
     "AyuMQPipeline",
+    "AyuTwistedMQPipeline",
     "AyuKafkaPipeline",
     "FilesDownloadPipeline",
+    "AyuBloomDedupPipeline",
     "AyuFtyOraclePipeline",
     "AyuTwistedOraclePipeline",
     "AyuAsyncOssPipeline",
     "AyuAsyncOssBatchPipeline",
     "AyuAsyncPostgresPipeline",
+    "AyuAsyncPostgresBulkPipeline",
+    "AyuPostgresBulkPipeline",
     "AyuFtyPostgresPipeline",
     "AyuTwistedPostgresPipeline",
 ]
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import TYPE_CHECKING
+
+import aiohttp
+from scrapy import signals
+from scrapy.exceptions import StopDownload
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.defer import deferred_from_coro
+from twisted.internet.defer import CancelledError
+from twisted.internet.error import TimeoutError
+from twisted.python.failure import Failure
+
+from ayugespidertools.common.multiplexing import ReuseOperation
+from ayugespidertools.config import logger
+from ayugespidertools.scraper.middlewares.netlib.aiohttplib import (
+    get_aiohttp_conf,
+    get_proxy_endpoint,
+    get_scrapy_headers,
+    get_tcp_connector_args,
+)
+
+__all__ = [
+    "AiohttpDownloadHandler",
+]
+
+if TYPE_CHECKING:
+    from scrapy import Request, Spider
+    from scrapy.crawler import Crawler
+    from scrapy.http import Response
+    from scrapy.settings import BaseSettings
+    from twisted.internet.defer import Deferred
+    from typing_extensions import Self
+
+    from ayugespidertools.common.typevars import AiohttpConf
+
+# 这些参数由 scrapy 的 request 及其中间件（重定向，cookies，解压等）负责，不使用 AiohttpRequest 中的值
+_SCRAPY_MANAGED_ARGS = {
+    "method",
+    "url",
+    "headers",
+    "cookies",
+    "proxy",
+    "allow_redirects",
+    "max_redirects",
+    "auto_decompress",
+}
+
+
+def _get_stop_download(results: list, request: Request) -> StopDownload | None:
+    """获取 headers_received 或 bytes_received 信号处理中抛出的 StopDownload"""
+    for handler, result in results:
+        if isinstance(result, Failure) and isinstance(result.value, StopDownload):
+            logger.debug(
+                f"Download stopped for {request} from signal handler "
+                f"{handler.__qualname__}"
+            )
+            return result.value
+    return None
+
+
+class AiohttpDownloadHandler:
+    """使用 aiohttp 下载请求的 scrapy DOWNLOAD_HANDLERS，需要使用 asyncio reactor
+
+    与 AiohttpDownloaderMiddleware 不同，请求仍然经过 scrapy 的下载器及其中间件，重定向，
+    重试，cookies，解压，DOWNLOAD_MAXSIZE 及 AutoThrottle 等功能都由 scrapy 负责。
+    """
+
+    lazy = False
+
+    def __init__(self, settings: BaseSettings, crawler: Crawler) -> None:
+        self.crawler = crawler
+        self.aiohttp_cfg: AiohttpConf = get_aiohttp_conf(settings)
+        self.connector_args = get_tcp_connector_args(self.aiohttp_cfg)
+        # 每个代理地址使用单独的 TCPConnector，轮换代理时各自的连接依然可以复用
+        self.sessions: dict[str | None, aiohttp.ClientSession] = {}
+        self.default_maxsize = settings.getint("DOWNLOAD_MAXSIZE")
+        self.default_warnsize = settings.getint("DOWNLOAD_WARNSIZE")
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        return cls(crawler.settings, crawler)
+
+    def _get_session(self, proxy: str | None) -> aiohttp.ClientSession:
+        endpoint = get_proxy_endpoint(proxy)
+        if (session := self.sessions.get(endpoint)) is None:
+            session = self.sessions[endpoint] = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(**self.connector_args),
+                cookie_jar=aiohttp.DummyCookieJar(),
+                auto_decompress=False,
+            )
+        return session
+
+    def _get_request_args(self, request: Request, timeout: float) -> dict:
+        """将 scrapy request 转换为 aiohttp 的请求参数，AiohttpRequest 中的其它参数也会生效"""
+        aiohttp_args = request.meta.get("aiohttp", {}).get("args", {})
+        args = {
+            k: v
+            for k, v in ReuseOperation.filter_none_value(aiohttp_args).items()
+            if k not in _SCRAPY_MANAGED_ARGS
+        }
+        headers = request.headers.copy()
+        proxy = request.meta.get("proxy")
+        if proxy and (proxy_auth := headers.pop(b"Proxy-Authorization", None)):
+            args["proxy_headers"] = {"Proxy-Authorization": proxy_auth[-1].decode()}
+        if request.body and "data" not in args and "json" not in args:
+            args["data"] = request.body
+        args.setdefault("timeout", aiohttp.ClientTimeout(total=timeout))
+        args.update(
+            method=request.method,
+            url=request.url,
+            headers=[
+                (k.decode("latin1"), v.decode("latin1"))
+                for k, values in headers.items()
+                for v in values
+            ],
+            # 只发送 scrapy 中间件设置的请求头
+            skip_auto_headers=("User-Agent", "Accept-Encoding"),
+            proxy=proxy,
+            allow_redirects=False,
+        )
+        return args
+
+    def download_request(self, request: Request, spider: Spider) -> Deferred[Response]:
+        return deferred_from_coro(self._download_request(request, spider))
+
+    async def _download_request(self, request: Request, spider: Spider) -> Response:
+        timeout = request.meta.get("download_timeout") or self.aiohttp_cfg.timeout
+        args = self._get_request_args(request, timeout)
+        session = self._get_session(args["proxy"])
+        start_time = time.time()
+        try:
+            async with session.request(**args) as r:
+                request.meta["download_latency"] = time.time() - start_time
+                return await self._read_response(r, request, spider)
+        except asyncio.TimeoutError as e:
+            raise TimeoutError(
+                f"Getting {request.url} took longer than {timeout} seconds."
+            ) from e
+
+    async def _read_response(
+        self, r: aiohttp.ClientResponse, request: Request, spider: Spider
+    ) -> Response:
+        headers = get_scrapy_headers(r.raw_headers, decompressed=False)
+        expected_size = -1 if r.content_length is None else r.content_length
+        maxsize = request.meta.get(
+            "download_maxsize",
+            getattr(spider, "download_maxsize", self.default_maxsize),
+        )
+        warnsize = request.meta.get(
+            "download_warnsize",
+            getattr(spider, "download_warnsize", self.default_warnsize),
+        )
+
+        stop = _get_stop_download(
+            self.crawler.signals.send_catch_log(
+                signal=signals.headers_received,
+                headers=headers,
+                body_length=expected_size,
+                request=request,
+                spider=spider,
+            ),
+            request,
+        )
+        if stop is None and maxsize and expected_size > maxsize:
+            msg = (
+                f"Cancelling download of {request.url}: expected response size "
+                f"({expected_size}) larger than download max size ({maxsize})."
+            )
+            logger.warning(msg)
+            raise CancelledError(msg)
+        if stop is None and warnsize and expected_size > warnsize:
+            logger.warning(
+                f"Expected response size ({expected_size}) larger than download "
+                f"warn size ({warnsize}) in request {request}."
+            )
+
+        chunks: list[bytes] = []
+        received = 0
+        reached_warnsize = False
+        while stop is None and (data := await r.content.readany()):
+            chunks.append(data)
+            received += len(data)
+            stop = _get_stop_download(
+                self.crawler.signals.send_catch_log(
+                    signal=signals.bytes_received,
+                    data=data,
+                    request=request,
+                    spider=spider,
+                ),
+                request,
+            )
+            if maxsize and received > maxsize:
+                msg = (
+                    f"Received ({received}) bytes larger than download max size "
+                    f"({maxsize}) in request {request}."
+                )
+                logger.warning(msg)
+                raise CancelledError(msg)
+            if warnsize and received > warnsize and not reached_warnsize:
+                reached_warnsize = True
+                logger.warning(
+                    f"Received more bytes than download warn size ({warnsize}) "
+                    f"in request {request}."
+                )
+
+        body = b"".join(chunks)
+        respcls = responsetypes.from_args(headers=headers, url=request.url, body=body)
+        response = respcls(
+            url=request.url,
+            status=r.status,
+            headers=headers,
+            body=body,
+            flags=["download_stopped"] if stop is not None else None,
+            protocol=f"HTTP/{r.version.major}.{r.version.minor}",
+        )
+        if stop is not None:
+            r.close()
+            if stop.fail:
+                stop.response = response
+                raise stop
+        return response
+
+    async def _close(self) -> None:
+        for session in self.sessions.values():
+            await session.close()
+        self.sessions.clear()
+
+    def close(self) -> Deferred[None]:
+        return deferred_from_coro(self._close())
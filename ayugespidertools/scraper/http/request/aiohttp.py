@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import copy
+import os
 from collections.abc import Awaitable, Callable, Iterable, Mapping
 from types import SimpleNamespace
 from typing import TYPE_CHECKING, Any, AnyStr, TypedDict, Union
@@ -12,6 +13,7 @@ __all__ = [
 ]
 
 if TYPE_CHECKING:
+    from os import PathLike
     from ssl import SSLContext
 
     from aiohttp.client import ClientTimeout
@@ -45,6 +47,7 @@ class AiohttpRequest(Request):
         callback: CallbackT | None = None,
         method: str = "GET",
         headers: Mapping[AnyStr, Any] | Iterable[tuple[AnyStr, Any]] | None = None,
+        body: bytes | str | None = None,
         cookies: CookiesT | None = None,
         meta: dict[str, Any] | None = None,
         encoding: str = "utf-8",
@@ -81,7 +84,18 @@ class AiohttpRequest(Request):
         max_line_size: int | None = None,
         max_field_size: int | None = None,
         timeout: ClientTimeout | None = None,
+        stream_to: str | PathLike | bool | None = None,
+        stream_max_size: int | None = None,
+        stream_hash: str | None = "sha256",
     ) -> None:
+        """stream_* 以外的参数与 scrapy Request 及 aiohttp 的请求参数一致
+
+        Args:
+            stream_to: 开启流式下载，响应内容会分块写入此文件中而不是保存在内存中，为 True
+                时写入临时文件；结果在 response.meta["aiohttp_stream"] 中
+            stream_max_size: 流式下载的最大字节数，超过时放弃此请求
+            stream_hash: 流式下载时同时计算的 hash 算法名称，为 None 时不计算
+        """
 
         aiohttp_req_args = {
             "method": method,
@@ -119,12 +133,19 @@ class AiohttpRequest(Request):
         meta = copy.deepcopy(meta) or {}
         aiohttp_meta = meta.setdefault("aiohttp", {})
         aiohttp_meta["args"] = aiohttp_req_args
+        if stream_to:
+            aiohttp_meta["stream"] = {
+                "path": stream_to if stream_to is True else os.fspath(stream_to),
+                "max_size": stream_max_size,
+                "hash": stream_hash,
+            }
 
         super().__init__(
             url=url,
             callback=callback,
             method=method,
             headers=headers,
+            body=body,
             cookies=cookies,
             meta=meta,
             encoding=encoding,
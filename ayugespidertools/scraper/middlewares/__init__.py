@@ -13,6 +13,9 @@ from ayugespidertools.scraper.middlewares.proxy.dynamic import (
 from ayugespidertools.scraper.middlewares.proxy.exclusive import (
     ExclusiveProxyDownloaderMiddleware,
 )
+from ayugespidertools.scraper.middlewares.ratelimit.tokenbucket import (
+    RateLimitDownloaderMiddleware,
+)
 
 __all__ = [
     "RandomRequestUaMiddleware",
@@ -20,4 +23,5 @@ __all__ = [
     "DynamicProxyDownloaderMiddleware",
     "AbuDynamicProxyDownloaderMiddleware",
     "ExclusiveProxyDownloaderMiddleware",
+    "RateLimitDownloaderMiddleware",
 ]
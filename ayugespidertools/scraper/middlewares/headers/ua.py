@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-import json
-import random
-from pathlib import Path
 from typing import TYPE_CHECKING
 
 from scrapy import signals
+from scrapy.http import Headers
+from scrapy.utils.httpobj import urlparse_cached
 
-from ayugespidertools.config import NormalConfig
+from ayugespidertools.common.headerprofile import load_header_profiles
+from ayugespidertools.scraper.middlewares.netlib.aiohttplib import get_proxy_endpoint
 
 __all__ = [
     "RandomRequestUaMiddleware",
@@ -16,45 +16,82 @@ __all__ = [
 if TYPE_CHECKING:
     from scrapy import Request
     from scrapy.crawler import Crawler
+    from scrapy.settings import Settings
     from typing_extensions import Self
 
+    from ayugespidertools.common.headerprofile import HeaderProfile, HeaderProfiles
     from ayugespidertools.spiders import AyuSpider
 
+# 各浏览器类型的默认权重
+DEFAULT_HEADER_PROFILE_WEIGHTS = {
+    "safari": 50,
+    "edge": 9,
+    "firefox": 50,
+    "chrome": 3,
+}
+
 
 class RandomRequestUaMiddleware:
-    """随机请求头中间件"""
+    """随机请求头中间件
 
-    def __init__(self):
-        self.explorer_types = None
-        self.explorer_weights = None
-        _ua_file = Path(NormalConfig.DATA_DIR, "browsers.json")
-        self.fake_ua_dict = json.loads(_ua_file.read_text(encoding="utf-8"))
+    请求头配置（User-Agent，Accept，Accept-Language 及 sec-ch-ua 等相互一致的请求头）在
+    每个进程中只生成一次；同一个下载 slot（或代理）会连续使用同一套请求头
+    HEADER_PROFILE_STICKY_REQUESTS 次后再重新随机选择。DefaultHeadersMiddleware 设置的
+    DEFAULT_REQUEST_HEADERS 默认值会被请求头配置中的值替换。
+    """
 
-    def get_random_ua_by_weight(self) -> str:
-        explorer_types = random.choices(
-            self.explorer_types, weights=self.explorer_weights
+    def __init__(self, settings: Settings) -> None:
+        weights = (
+            settings.getdict("HEADER_PROFILE_WEIGHTS") or DEFAULT_HEADER_PROFILE_WEIGHTS
+        )
+        self.profiles: HeaderProfiles = load_header_profiles(
+            tuple(sorted(weights.items()))
         )
-        return random.choice(self.fake_ua_dict[explorer_types[0]])
+        self.sticky_requests = settings.getint("HEADER_PROFILE_STICKY_REQUESTS", 20)
+        self.key_type = settings.get("HEADER_PROFILE_KEY", "slot")
+        # 各个 slot 当前使用的请求头配置及其剩余的使用次数，用完后删除
+        self.sticky: dict[str, list] = {}
+        self.default_headers = Headers(settings.getdict("DEFAULT_REQUEST_HEADERS"))
 
     @classmethod
     def from_crawler(cls, crawler: Crawler) -> Self:
-        s = cls()
+        s = cls(crawler.settings)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
         return s
 
     def spider_opened(self, spider: AyuSpider) -> None:
-        # 带权重的 ua 列表
-        ua_arr = [
-            {"explorer": "safari", "weight": 50},
-            {"explorer": "edge", "weight": 9},
-            {"explorer": "firefox", "weight": 50},
-            {"explorer": "chrome", "weight": 3},
-        ]
-        self.explorer_types = [x["explorer"] for x in ua_arr]
-        self.explorer_weights = [x["weight"] for x in ua_arr]
         spider.slog.info(
             f"随机请求头中间件 RandomRequestUaMiddleware 已开启，生效脚本为: {spider.name}"
         )
 
+    def get_sticky_key(self, request: Request) -> str:
+        """获取请求头配置的分组标识，为下载 slot 或代理地址"""
+        if self.key_type == "proxy" and (
+            proxy := get_proxy_endpoint(request.meta.get("proxy"))
+        ):
+            return proxy
+        return request.meta.get("download_slot") or urlparse_cached(request).hostname
+
+    def get_profile(self, request: Request) -> HeaderProfile:
+        if self.sticky_requests <= 1:
+            return self.profiles.sample()
+
+        key = self.get_sticky_key(request)
+        if (current := self.sticky.get(key)) is None:
+            current = self.sticky[key] = [self.profiles.sample(), self.sticky_requests]
+        current[1] -= 1
+        if current[1] <= 0:
+            del self.sticky[key]
+        return current[0]
+
     def process_request(self, request: Request, spider: AyuSpider) -> None:
-        request.headers.setdefault(b"User-Agent", self.get_random_ua_by_weight())
+        # 已设置 User-Agent 的请求不修改其请求头
+        if b"User-Agent" in request.headers:
+            return
+        for name, value in self.get_profile(request):
+            # 未设置或仍为 DEFAULT_REQUEST_HEADERS 中的默认值时使用请求头配置中的值
+            if request.headers.getlist(name) in (
+                [],
+                self.default_headers.getlist(name),
+            ):
+                request.headers[name] = value
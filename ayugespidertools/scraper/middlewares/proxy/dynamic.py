@@ -1,12 +1,12 @@
 from __future__ import annotations
 
-import base64
 from typing import TYPE_CHECKING
 
 from scrapy import signals
 
 from ayugespidertools.common.multiplexing import ReuseOperation
 from ayugespidertools.common.params import Param
+from ayugespidertools.common.proxypool import get_basic_auth
 
 if TYPE_CHECKING:
     from scrapy import Request
@@ -18,35 +18,35 @@ if TYPE_CHECKING:
 
 
 class DynamicProxyDownloaderMiddleware:
-    """动态隧道代理中间件"""
+    """动态隧道代理中间件
 
-    def __init__(self):
-        self.proxy_url = None
-        self.username = None
-        self.password = None
+    代理链接及 Proxy-Authorization 在开启时生成，连接默认复用；若隧道代理需要新建连接才能
+    切换 IP，可以设置 PROXY_CONNECTION_CLOSE 为 True。
+    """
+
+    def __init__(self, connection_close: bool = False) -> None:
+        self.connection_close = connection_close
+        # 不同协议的请求对应的 meta["proxy"]
+        self.proxy_urls: dict[str, str] = {}
+        self.proxy_auth = None
 
     @classmethod
     def from_crawler(cls, crawler: Crawler) -> Self:
-        s = cls()
+        s = cls(crawler.settings.getbool("PROXY_CONNECTION_CLOSE", False))
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
         return s
 
     def process_request(self, request: Request, spider: AyuSpider) -> None:
-        if request.url.startswith("https://"):
-            request.meta["proxy"] = (
-                f"https://{self.username}:{self.password}@{self.proxy_url}/"
-            )
-        elif request.url.startswith("http://"):
-            request.meta["proxy"] = (
-                f"http://{self.username}:{self.password}@{self.proxy_url}/"
-            )
+        if proxy := self.proxy_urls.get(request.url.partition("://")[0]):
+            request.meta["proxy"] = proxy
+            request.headers["Proxy-Authorization"] = self.proxy_auth
         else:
             spider.slog.info(
                 f"request url: {request.url} error when use proxy middlewares!"
             )
 
-        # 避免因连接复用导致隧道不能切换 IP
-        request.headers["Connection"] = "close"
+        if self.connection_close:
+            request.headers["Connection"] = "close"
         # 采用 gzip 压缩加速访问
         request.headers["Accept-Encoding"] = "gzip"
 
@@ -55,9 +55,14 @@ class DynamicProxyDownloaderMiddleware:
             f"动态隧道代理中间件: DynamicProxyDownloaderMiddleware 已开启，生效脚本为: {spider.name}"
         )
 
-        self.proxy_url = spider.dynamicproxy_conf.proxy
-        self.username = spider.dynamicproxy_conf.username
-        self.password = spider.dynamicproxy_conf.password
+        proxy_url = spider.dynamicproxy_conf.proxy
+        self.proxy_urls = {
+            "http": f"http://{proxy_url}",
+            "https": f"https://{proxy_url}",
+        }
+        self.proxy_auth = get_basic_auth(
+            spider.dynamicproxy_conf.username, spider.dynamicproxy_conf.password
+        )
 
 
 class AbuDynamicProxyDownloaderMiddleware:
@@ -74,9 +79,14 @@ class AbuDynamicProxyDownloaderMiddleware:
             is_match
         ), f"没有配置动态隧道代理，配置示例为：{Param.dynamic_proxy_conf_example}"
 
-        self.proxy_url = dynamic_proxy_conf["proxy"]
-        self.username = dynamic_proxy_conf["username"]
-        self.password = dynamic_proxy_conf["password"]
+        proxy_url = dynamic_proxy_conf["proxy"]
+        self.proxy_urls = {
+            "http": f"http://{proxy_url}",
+            "https": f"https://{proxy_url}",
+        }
+        self.proxy_auth = get_basic_auth(
+            dynamic_proxy_conf["username"], dynamic_proxy_conf["password"]
+        )
 
     @classmethod
     def from_crawler(cls, crawler: Crawler) -> Self:
@@ -90,15 +100,8 @@ class AbuDynamicProxyDownloaderMiddleware:
         )
 
     def process_request(self, request: Request, spider: AyuSpider) -> None:
-        if request.url.startswith("https://"):
-            request.meta["proxy"] = f"https://{self.proxy_url}"
-        elif request.url.startswith("http://"):
-            request.meta["proxy"] = f"http://{self.proxy_url}"
+        if proxy := self.proxy_urls.get(request.url.partition("://")[0]):
+            request.meta["proxy"] = proxy
+            request.headers["Proxy-Authorization"] = self.proxy_auth
         else:
             spider.slog.info(f"request url error: {request.url}")
-
-        proxy_user_pass = f"{self.username}:{self.password}"
-        encoded_user_pass = "Basic " + base64.urlsafe_b64encode(
-            bytes(proxy_user_pass, "ascii")
-        ).decode("utf8")
-        request.headers["Proxy-Authorization"] = encoded_user_pass
@@ -1,11 +1,17 @@
 from __future__ import annotations
 
-import base64
+import asyncio
 import json
-import urllib.request
+import time
 from typing import TYPE_CHECKING
 
+import aiohttp
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest
+from scrapy.utils.defer import deferred_from_coro
+
+from ayugespidertools.common.proxypool import ProxyPool, get_basic_auth
+from ayugespidertools.config import logger
 
 __all__ = [
     "ExclusiveProxyDownloaderMiddleware",
@@ -14,64 +20,158 @@ __all__ = [
 if TYPE_CHECKING:
     from scrapy import Request
     from scrapy.crawler import Crawler
+    from scrapy.http import Response
+    from scrapy.statscollectors import StatsCollector
+    from twisted.internet.defer import Deferred
     from typing_extensions import Self
 
     from ayugespidertools.spiders import AyuSpider
 
+# 请求所使用的代理及其开始时间，用于在请求结束后更新代理评分
+PROXY_STATE_META_KEY = "_proxy_pool_state"
+PROXY_START_META_KEY = "_proxy_pool_start"
+
 
 class ExclusiveProxyDownloaderMiddleware:
-    """独享代理中间件"""
+    """独享代理中间件
+
+    独享代理接口返回的所有代理会组成代理池，请求按代理评分分散到各个代理上，代理列表每隔
+    PROXY_POOL_REFRESH_INTERVAL 秒在后台异步刷新。
+    """
+
+    pool: ProxyPool
+    stats: StatsCollector
+    refresh_interval: float
+    ban_codes: set[int]
 
     def __init__(self):
         self.proxy_url = None
-        self.username = None
-        self.password = None
-        self.proxy_index = None
-        # 从 proxy_list 中取出索引为 proxy_index 的值
-        self.proxy = None
+        self.proxy_auth = None
+        self.next_refresh = 0.0
+        self._refresh_task: asyncio.Task | None = None
 
     @classmethod
     def from_crawler(cls, crawler: Crawler) -> Self:
+        settings = crawler.settings
         s = cls()
+        s.pool = ProxyPool(
+            max_concurrency=settings.getint("PROXY_POOL_MAX_CONCURRENCY", 8),
+            min_health=settings.getfloat("PROXY_POOL_MIN_HEALTH", 0.3),
+        )
+        s.stats = crawler.stats
+        s.refresh_interval = settings.getfloat("PROXY_POOL_REFRESH_INTERVAL", 300)
+        s.ban_codes = set(
+            map(int, settings.getlist("PROXY_POOL_BAN_CODES", [403, 407, 429]))
+        )
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(
+            s.response_downloaded, signal=signals.response_downloaded
+        )
         return s
 
-    def get_proxy_ip(self, proxy_url: str, index: int) -> str:
-        """获取独享代理接口的索引为 proxy_index 的代理信息"""
+    async def get_proxy_list(self) -> list[str]:
+        """获取独享代理接口返回的代理列表"""
+        async with aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=30)
+        ) as session:
+            async with session.get(self.proxy_url) as r:
+                content = await r.text(errors="ignore")
+        return json.loads(content).get("data").get("proxy_list")
+
+    async def refresh(self) -> None:
+        """刷新代理池，被淘汰的代理也会重新加入；获取失败时继续使用原有的代理"""
+        self.next_refresh = time.monotonic() + self.refresh_interval
         try:
-            r = urllib.request.urlopen(url=proxy_url)
-            content = r.read().decode(errors="ignore")
-            proxy_list = json.loads(content).get("data").get("proxy_list")
-            proxy_list.sort()
-            if index < len(proxy_list):
-                return proxy_list[index]
-            else:
-                raise IndexError("独享代理取值索引超出范围，请确认独享代理服务情况。")
-
-        except Exception:
-            raise Exception("获取独享代理时失败，请查看独享配置及网络是否正常。")
+            proxy_list = await self.get_proxy_list()
+        except Exception as e:
+            self.stats.inc_value("proxy_pool/refresh_failed")
+            logger.warning(f"刷新独享代理列表失败，继续使用原有的代理: {e!r}")
+            return
+
+        added, removed = self.pool.update(proxy_list)
+        self.stats.inc_value("proxy_pool/refresh")
+        self.stats.set_value("proxy_pool/size", len(self.pool))
+        logger.debug(f"独享代理池已刷新，新增 {added} 个，移除 {removed} 个代理")
 
-    def process_request(self, request: Request, spider: AyuSpider) -> None:
-        if request.url.startswith("https://"):
-            request.meta["proxy"] = f"https://{self.proxy}"
-        elif request.url.startswith("http://"):
-            request.meta["proxy"] = f"http://{self.proxy}"
-        else:
+    def _schedule_refresh(self) -> asyncio.Future:
+        """在后台刷新代理池，正在刷新时返回当前的刷新任务，避免同时发起多次刷新"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self.refresh())
+        return self._refresh_task
+
+    async def process_request(self, request: Request, spider: AyuSpider) -> None:
+        # 下载异常被 RetryMiddleware 等返回新请求时不会经过本中间件的 process_exception，
+        # 新请求的 meta 中仍带有上次的代理，需要先归还
+        if PROXY_STATE_META_KEY in request.meta:
+            self.stats.inc_value("proxy_pool/error")
+            self._release(request, ok=False)
+
+        scheme = request.url.partition("://")[0]
+        if scheme not in {"http", "https"}:
             spider.slog.info(f"request url error: {request.url}")
+            return
+
+        if time.monotonic() >= self.next_refresh:
+            self._schedule_refresh()
+        if not self.pool:
+            # 所有代理都被淘汰时立即刷新，不等待刷新间隔
+            await asyncio.shield(self._schedule_refresh())
+        if (state := await self.pool.acquire()) is None:
+            raise IgnoreRequest("独享代理池中没有可用的代理，请确认独享代理服务情况。")
+
+        request.meta["proxy"] = state.urls[scheme]
+        request.meta[PROXY_STATE_META_KEY] = state
+        request.meta[PROXY_START_META_KEY] = time.monotonic()
+        request.headers["Proxy-Authorization"] = self.proxy_auth
+        # 重试时可能换用其它代理，需要同时更新 _auth_proxy，否则 HttpProxyMiddleware 会认为
+        # 代理已变更而删除 Proxy-Authorization
+        request.meta["_auth_proxy"] = request.meta["proxy"]
+
+    def _release(self, request: Request, ok: bool | None) -> None:
+        if (state := request.meta.pop(PROXY_STATE_META_KEY, None)) is None:
+            return
+        latency = time.monotonic() - request.meta.pop(PROXY_START_META_KEY)
+        if self.pool.release(state, latency=latency if ok else None, ok=ok):
+            self.stats.inc_value("proxy_pool/evicted")
+            self.stats.set_value("proxy_pool/size", len(self.pool))
+            logger.debug(f"代理 {state.proxy} 成功率过低，已从独享代理池中淘汰")
 
-        proxy_user_pass = f"{self.username}:{self.password}"
-        encoded_user_pass = "Basic " + base64.urlsafe_b64encode(
-            bytes(proxy_user_pass, "ascii")
-        ).decode("utf8")
-        request.headers["Proxy-Authorization"] = encoded_user_pass
+    def response_downloaded(
+        self, response: Response, request: Request, spider: AyuSpider
+    ) -> None:
+        # 此信号在所有中间件的 process_response 之前发送，重试及重定向也不会跳过
+        if PROXY_STATE_META_KEY not in request.meta:
+            return
+        if banned := response.status in self.ban_codes:
+            self.stats.inc_value("proxy_pool/banned")
+        self._release(request, ok=not banned)
 
-    def spider_opened(self, spider: AyuSpider) -> None:
+    def process_response(
+        self, request: Request, response: Response, spider: AyuSpider
+    ) -> Response:
+        # 响应由缓存等中间件直接返回，没有经过下载时只归还代理，不更新评分
+        self._release(request, ok=None)
+        return response
+
+    def process_exception(
+        self, request: Request, exception: Exception, spider: AyuSpider
+    ) -> None:
+        if PROXY_STATE_META_KEY in request.meta:
+            self.stats.inc_value("proxy_pool/error")
+            self._release(request, ok=False)
+
+    async def _spider_opened(self, spider: AyuSpider) -> None:
         spider.slog.info(
             f"独享代理中间件: ExclusiveProxyDownloaderMiddleware 已开启，生效脚本为: {spider.name}"
         )
 
         self.proxy_url = spider.exclusiveproxy_conf.proxy
-        self.username = spider.exclusiveproxy_conf.username
-        self.password = spider.exclusiveproxy_conf.password
-        self.proxy_index = spider.exclusiveproxy_conf.index
-        self.proxy = self.get_proxy_ip(proxy_url=self.proxy_url, index=self.proxy_index)
+        self.proxy_auth = get_basic_auth(
+            spider.exclusiveproxy_conf.username, spider.exclusiveproxy_conf.password
+        )
+        await self.refresh()
+        if not self.pool:
+            raise Exception("获取独享代理时失败，请查看独享配置及网络是否正常。")
+
+    def spider_opened(self, spider: AyuSpider) -> Deferred:
+        return deferred_from_coro(self._spider_opened(spider))
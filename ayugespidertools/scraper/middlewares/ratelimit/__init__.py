@@ -0,0 +1,7 @@
+from ayugespidertools.scraper.middlewares.ratelimit.tokenbucket import (
+    RateLimitDownloaderMiddleware,
+)
+
+__all__ = [
+    "RateLimitDownloaderMiddleware",
+]
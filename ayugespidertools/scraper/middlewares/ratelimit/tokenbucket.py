@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+from scrapy.utils.httpobj import urlparse_cached
+
+from ayugespidertools.common.ratelimit import RateLimiter, record_ratelimit_wait
+from ayugespidertools.scraper.middlewares.netlib.aiohttplib import get_proxy_endpoint
+
+__all__ = [
+    "RateLimitDownloaderMiddleware",
+]
+
+if TYPE_CHECKING:
+    from scrapy import Request
+    from scrapy.crawler import Crawler
+    from scrapy.statscollectors import StatsCollector
+    from typing_extensions import Self
+
+    from ayugespidertools.spiders import AyuSpider
+
+
+def get_ratelimit_key(request: Request, key_type: str = "domain") -> str:
+    """获取请求的限速分组标识，优先使用 meta 中的 ratelimit_key
+
+    Args:
+        request: scrapy request
+        key_type: 分组方式，domain 为按域名，proxy 为按代理（没有代理时按域名）
+
+    Returns:
+        1). 限速分组标识
+    """
+    if key := request.meta.get("ratelimit_key"):
+        return key
+    if key_type == "proxy" and (proxy := get_proxy_endpoint(request.meta.get("proxy"))):
+        return proxy
+    return urlparse_cached(request).hostname or ""
+
+
+class RateLimitDownloaderMiddleware:
+    """按域名，代理或自定义 key 分别以令牌桶限速的下载中间件
+
+    等待令牌时只会挂起当前请求，不会影响其它域名的请求；普通的 scrapy Request 和
+    AiohttpRequest 都会经过此中间件，需要放在 AiohttpDownloaderMiddleware 之前。
+    """
+
+    limiter: RateLimiter
+    key_type: str
+    stats: StatsCollector
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        settings = crawler.settings
+        s = cls()
+        s.limiter = RateLimiter(
+            rate=settings.getfloat("RATELIMIT_RATE", 0),
+            burst=settings.getint("RATELIMIT_BURST", 1),
+            overrides=settings.getdict("RATELIMIT_OVERRIDES"),
+        )
+        s.key_type = settings.get("RATELIMIT_KEY", "domain")
+        s.stats = crawler.stats
+        return s
+
+    async def process_request(self, request: Request, spider: AyuSpider) -> None:
+        key = get_ratelimit_key(request, self.key_type)
+        if (wait := self.limiter.reserve(key)) > 0:
+            record_ratelimit_wait(self.stats, wait)
+            await asyncio.sleep(wait)
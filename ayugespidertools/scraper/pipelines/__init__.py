@@ -8,7 +8,10 @@ from ayugespidertools.scraper.pipelines.es.fantasy import AyuFtyESPipeline
 from ayugespidertools.scraper.pipelines.mongo.asynced import AyuAsyncMongoPipeline
 from ayugespidertools.scraper.pipelines.mongo.fantasy import AyuFtyMongoPipeline
 from ayugespidertools.scraper.pipelines.mongo.twisted import AyuTwistedMongoPipeline
-from ayugespidertools.scraper.pipelines.msgproducer.mqpub import AyuMQPipeline
+from ayugespidertools.scraper.pipelines.msgproducer.mqpub import (
+    AyuMQPipeline,
+    AyuTwistedMQPipeline,
+)
 from ayugespidertools.scraper.pipelines.mysql import AyuMysqlPipeline
 from ayugespidertools.scraper.pipelines.mysql.asynced import AyuAsyncMysqlPipeline
 from ayugespidertools.scraper.pipelines.mysql.fantasy import AyuFtyMysqlPipeline
@@ -19,6 +22,10 @@ from ayugespidertools.scraper.pipelines.oracle.fantasy import AyuFtyOraclePipeli
 from ayugespidertools.scraper.pipelines.oracle.twisted import AyuTwistedOraclePipeline
 from ayugespidertools.scraper.pipelines.oss.ali import AyuAsyncOssPipeline
 from ayugespidertools.scraper.pipelines.postgres.asynced import AyuAsyncPostgresPipeline
+from ayugespidertools.scraper.pipelines.postgres.bulk import (
+    AyuAsyncPostgresBulkPipeline,
+    AyuPostgresBulkPipeline,
+)
 from ayugespidertools.scraper.pipelines.postgres.fantasy import AyuFtyPostgresPipeline
 from ayugespidertools.scraper.pipelines.postgres.twisted import (
     AyuTwistedPostgresPipeline,
@@ -32,6 +39,7 @@ __all__ = [
     "AyuFtyMongoPipeline",
     "AyuTwistedMongoPipeline",
     "AyuMQPipeline",
+    "AyuTwistedMQPipeline",
     "AyuMysqlPipeline",
     "AyuAsyncMysqlPipeline",
     "AyuFtyMysqlPipeline",
@@ -42,6 +50,8 @@ __all__ = [
     "AyuTwistedOraclePipeline",
     "AyuAsyncOssPipeline",
     "AyuAsyncPostgresPipeline",
+    "AyuAsyncPostgresBulkPipeline",
+    "AyuPostgresBulkPipeline",
     "AyuFtyPostgresPipeline",
     "AyuTwistedPostgresPipeline",
 ]
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from scrapy import signals
+from scrapy.exceptions import DropItem, NotConfigured
+from scrapy.utils.project import data_path
+
+from ayugespidertools.common.bloomfilter import ScalableBloomFilter
+from ayugespidertools.common.multiplexing import ReuseOperation
+
+__all__ = [
+    "AyuBloomDedupPipeline",
+]
+
+if TYPE_CHECKING:
+    from scrapy.crawler import Crawler
+    from scrapy.statscollectors import StatsCollector
+    from typing_extensions import Self
+
+    from ayugespidertools.spiders import AyuSpider
+
+
+class AyuBloomDedupPipeline:
+    """根据 DEDUP_KEYS 中各数据表的去重字段丢弃重复的 item
+
+    每个数据表使用一个可扩容的布隆过滤器，存储在 DEDUP_BLOOM_DIR 下的 mmap 文件中，重启后
+    会继续使用之前的去重记录。需要放在存储类 pipelines 之前。
+
+    item 在经过所有 pipelines（即 item_scraped 信号）后才会记录到布隆过滤器中，被丢弃或
+    存储出错的 item 不会记录；处理中的 item 的去重字段记录在 pending_keys 中，同时处理的
+    重复 item 也会被丢弃。
+    """
+
+    stats: StatsCollector
+    filters: dict[str, ScalableBloomFilter]
+    # 处理中的 item 的 id 与其 (数据表名, 去重 key) 的映射
+    pending: dict[int, tuple[str, str]]
+    pending_keys: set[tuple[str, str]]
+
+    def __init__(
+        self,
+        dedup_keys: dict[str, list[str]],
+        directory: str,
+        capacity: int,
+        error_rate: float,
+    ) -> None:
+        self.dedup_keys = dedup_keys
+        self.directory = directory
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        settings = crawler.settings
+        if not (dedup_keys := settings.getdict("DEDUP_KEYS")):
+            raise NotConfigured("未配置 DEDUP_KEYS，不开启 item 去重功能")
+
+        s = cls(
+            dedup_keys={
+                table: [keys] if isinstance(keys, str) else list(keys)
+                for table, keys in dedup_keys.items()
+            },
+            directory=settings.get("DEDUP_BLOOM_DIR") or data_path("dedup"),
+            capacity=settings.getint("DEDUP_BLOOM_CAPACITY", 1000000),
+            error_rate=settings.getfloat("DEDUP_BLOOM_ERROR_RATE", 0.001),
+        )
+        crawler.signals.connect(s.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(s.item_failed, signal=signals.item_dropped)
+        crawler.signals.connect(s.item_failed, signal=signals.item_error)
+        return s
+
+    def open_spider(self, spider: AyuSpider) -> None:
+        self.stats = spider.crawler.stats
+        directory = Path(self.directory, spider.name)
+        self.filters = {
+            table: ScalableBloomFilter(
+                directory / table,
+                capacity=self.capacity,
+                error_rate=self.error_rate,
+            )
+            for table in self.dedup_keys
+        }
+        self.pending = {}
+        self.pending_keys = set()
+
+    def process_item(self, item: Any, spider: AyuSpider) -> Any:
+        alter_item = ReuseOperation.get_alter_item(item, self.stats)
+        table = alter_item.table.name
+        if (bloom := self.filters.get(table)) is None:
+            return item
+
+        new_item = alter_item.new_item
+        keys = self.dedup_keys[table]
+        # 缺少去重字段的 item 无法判断是否重复，直接放行
+        if any(k not in new_item for k in keys):
+            self.stats.inc_value(f"dedup/missing_keys/{table}")
+            return item
+
+        pending = (table, "\x1f".join(str(new_item[k]) for k in keys))
+        if pending[1] in bloom or pending in self.pending_keys:
+            self.stats.inc_value("dedup/dropped")
+            self.stats.inc_value(f"dedup/dropped/{table}")
+            raise DropItem(f"数据表 {table} 中已存在重复的 item")
+
+        self.pending[id(item)] = pending
+        self.pending_keys.add(pending)
+        return item
+
+    def _pop_pending(self, item: Any) -> tuple[str, str] | None:
+        if (pending := self.pending.pop(id(item), None)) is not None:
+            self.pending_keys.discard(pending)
+        return pending
+
+    def item_scraped(self, item: Any) -> None:
+        # 经过所有 pipelines 后才记录，避免存储失败的 item 之后被当作重复数据丢弃
+        if (pending := self._pop_pending(item)) is not None:
+            table, key = pending
+            self.filters[table].add(key)
+
+    def item_failed(self, item: Any) -> None:
+        self._pop_pending(item)
+
+    def close_spider(self, spider: AyuSpider) -> None:
+        for table, bloom in self.filters.items():
+            self.stats.set_value(f"dedup/count/{table}", len(bloom))
+            self.stats.set_value(f"dedup/fp_rate/{table}", bloom.fp_rate)
+            bloom.close()
@@ -1,24 +1,69 @@
 from __future__ import annotations
 
+import asyncio
+import os
 from pathlib import Path
 from typing import TYPE_CHECKING, Any
 
+import aiohttp
+from scrapy import signals
+from scrapy.exceptions import StopDownload
+from scrapy.utils.defer import deferred_from_coro
+
 from ayugespidertools.common.multiplexing import ReuseOperation
+from ayugespidertools.common.utils import Tools
 from ayugespidertools.config import logger
 from ayugespidertools.items import DataItem
-from ayugespidertools.scraper.pipelines.oss.ali import files_download_by_scrapy
+from ayugespidertools.scraper.pipelines.oss.ali import (
+    files_download_by_scrapy,
+    get_file_guid,
+    get_filename,
+)
 
 __all__ = ["FilesDownloadPipeline"]
 
 if TYPE_CHECKING:
+    from scrapy import Request
     from scrapy.crawler import Crawler
+    from scrapy.http.response import Response
+    from scrapy.statscollectors import StatsCollector
+    from twisted.internet.defer import Deferred
     from typing_extensions import Self
 
     from ayugespidertools.common.typevars import AlterItem
     from ayugespidertools.spiders import AyuSpider
 
+# 超过此大小的文件会中断 scrapy 的下载，改为分块流式写入
+STREAM_THRESHOLD_META_KEY = "_files_stream_threshold"
+RECEIVED_BYTES_META_KEY = "_files_received_bytes"
+
+
+def _find_existing(shard_dir: Path, file_guid: str) -> Path | None:
+    """查找分片目录中是否已存在此文件（文件后缀在下载前未知，所以按文件名前缀查找）"""
+    if not shard_dir.is_dir():
+        return None
+    return next(
+        (f for f in shard_dir.glob(f"{file_guid}.*") if f.suffix != ".part"), None
+    )
+
+
+def _write_file(path: Path, body: bytes) -> None:
+    """先写入临时文件再重命名，避免中断时留下不完整的文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    part_path = path.with_name(f"{path.name}.part")
+    part_path.write_bytes(body)
+    os.replace(part_path, path)
+
 
 class FilesDownloadPipeline:
+    stats: StatsCollector
+    semaphore: asyncio.Semaphore
+    shard_depth: int
+    stream_threshold: int
+    chunk_size: int
+    download_timeout: float
+    session: aiohttp.ClientSession | None = None
+
     def __init__(self, file_path=None):
         self.file_path = file_path
 
@@ -27,10 +72,135 @@ class FilesDownloadPipeline:
         _file_path = crawler.settings.get("FILES_STORE", None)
         assert _file_path is not None, "未配置 FILES_STORE 存储路径参数！"
 
-        if not Path.exists(_file_path):
+        if not Path(_file_path).exists():
             logger.warning(f"FILES_STORE: {_file_path} 路径不存在，自动创建所需路径！")
             Path(_file_path).mkdir(parents=True)
-        return cls(file_path=_file_path)
+        s = cls(file_path=_file_path)
+        crawler.signals.connect(s.headers_received, signal=signals.headers_received)
+        crawler.signals.connect(s.bytes_received, signal=signals.bytes_received)
+        return s
+
+    def open_spider(self, spider: AyuSpider) -> None:
+        settings = spider.crawler.settings
+        self.stats = spider.crawler.stats
+        self.semaphore = asyncio.Semaphore(
+            settings.getint("FILES_CONCURRENT_DOWNLOADS", 16)
+        )
+        self.shard_depth = settings.getint("FILES_SHARD_DEPTH", 2)
+        self.stream_threshold = settings.getint("FILES_STREAM_THRESHOLD", 10485760)
+        self.chunk_size = settings.getint("FILES_STREAM_CHUNK_SIZE", 65536)
+        self.download_timeout = settings.getfloat("DOWNLOAD_TIMEOUT", 180)
+
+    def headers_received(
+        self, headers, body_length: int, request: Request, spider: AyuSpider
+    ) -> None:
+        # 没有 Content-Length 时 body_length 不是 int（twisted 的 UNKNOWN_LENGTH）
+        threshold = request.meta.get(STREAM_THRESHOLD_META_KEY)
+        if threshold and isinstance(body_length, int) and body_length > threshold:
+            raise StopDownload(fail=False)
+
+    def bytes_received(self, data: bytes, request: Request, spider: AyuSpider) -> None:
+        # 没有 Content-Length 的响应只能在接收过程中判断其大小
+        if threshold := request.meta.get(STREAM_THRESHOLD_META_KEY):
+            received = request.meta.get(RECEIVED_BYTES_META_KEY, 0) + len(data)
+            request.meta[RECEIVED_BYTES_META_KEY] = received
+            if received > threshold:
+                raise StopDownload(fail=False)
+
+    def _get_shard_dir(self, file_guid: str) -> Path:
+        """根据文件名的 hash 获取分片目录，比如 FILES_STORE/ab/cd"""
+        parts = [file_guid[i * 2 : i * 2 + 2] for i in range(self.shard_depth)]
+        return Path(self.file_path).joinpath(*parts)
+
+    def _get_relative_path(self, path: Path) -> str:
+        return path.relative_to(self.file_path).as_posix()
+
+    async def _stream_to_file(
+        self, response: Response, url: str, shard_dir: Path, spider: AyuSpider
+    ) -> Path | None:
+        """对大文件重新发起请求，以分块的方式流式写入文件，内存占用不随文件大小增长
+
+        Args:
+            response: 被中断下载的 scrapy response，用于复用其请求头及代理
+            url: 文件链接
+            shard_dir: 文件所在的分片目录
+            spider: scrapy spider
+
+        Returns:
+            1). 文件存储路径，重新请求的响应状态码不为 2xx 时为 None
+        """
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(sock_read=self.download_timeout)
+            )
+
+        headers = Tools.get_dict_form_scrapy_req_headers(response.request.headers)
+        proxy = response.request.meta.get("proxy")
+        # Proxy-Authorization 只发送给代理，不能作为普通请求头发送给目标站点
+        proxy_auth = headers.pop("Proxy-Authorization", None)
+        proxy_headers = (
+            {"Proxy-Authorization": proxy_auth} if proxy and proxy_auth else None
+        )
+        try:
+            async with self.session.get(
+                url, headers=headers, proxy=proxy, proxy_headers=proxy_headers
+            ) as resp:
+                resp.raise_for_status()
+                path = shard_dir / get_filename(url, resp.headers.get("Content-Type"))
+                await asyncio.to_thread(shard_dir.mkdir, parents=True, exist_ok=True)
+                part_path = path.with_name(f"{path.name}.part")
+                f = await asyncio.to_thread(open, part_path, "wb")
+                try:
+                    async for chunk in resp.content.iter_chunked(self.chunk_size):
+                        await asyncio.to_thread(f.write, chunk)
+                        self.stats.inc_value("files/bytes", len(chunk))
+                finally:
+                    await asyncio.to_thread(f.close)
+        except aiohttp.ClientResponseError as e:
+            self.stats.inc_value("files/failed")
+            spider.slog.warning(f"文件流式下载失败，状态码: {e.status}, url: {url}")
+            return None
+        await asyncio.to_thread(os.replace, part_path, path)
+        self.stats.inc_value("files/streamed")
+        return path
+
+    async def _download_file(self, url: str, spider: AyuSpider) -> str | None:
+        """下载文件并存储至 FILES_STORE 的分片目录中，已存在时跳过下载
+
+        Args:
+            url: 文件链接
+            spider: scrapy spider
+
+        Returns:
+            1). 文件相对于 FILES_STORE 的存储路径，响应状态码不为 2xx 时为 None
+        """
+        file_guid = get_file_guid(url)
+        shard_dir = self._get_shard_dir(file_guid)
+        async with self.semaphore:
+            if existing := await asyncio.to_thread(
+                _find_existing, shard_dir, file_guid
+            ):
+                self.stats.inc_value("files/skipped_existing")
+                return self._get_relative_path(existing)
+
+            meta = {STREAM_THRESHOLD_META_KEY: self.stream_threshold}
+            r, filename = await files_download_by_scrapy(spider, url, meta=meta)
+            if not 200 <= r.status < 300:
+                self.stats.inc_value("files/failed")
+                spider.slog.warning(f"文件下载失败，状态码: {r.status}, url: {url}")
+                return None
+
+            if "download_stopped" in r.flags:
+                if (
+                    path := await self._stream_to_file(r, url, shard_dir, spider)
+                ) is None:
+                    return None
+            else:
+                path = shard_dir / filename
+                await asyncio.to_thread(_write_file, path, r.body)
+                self.stats.inc_value("files/bytes", len(r.body))
+            self.stats.inc_value("files/downloaded")
+        return self._get_relative_path(path)
 
     async def _download_and_add_field(
         self, alter_item: AlterItem, item: Any, spider: AyuSpider
@@ -39,22 +209,34 @@ class FilesDownloadPipeline:
             return
 
         file_url_keys = {
-            key: url for key, url in new_item.items() if key.endswith("_file_url")
+            key: url
+            for key, url in new_item.items()
+            if key.endswith("_file_url") and all([isinstance(url, str), url])
         }
         _is_namedtuple = alter_item.is_namedtuple
-        for key, url in file_url_keys.items():
-            if all([isinstance(url, str), url]):
-                _, filename = await files_download_by_scrapy(spider, url)
-                # Store file in item
-                if not _is_namedtuple:
-                    item[f"{key}_local"] = filename
-                else:
-                    item[f"{key}_local"] = DataItem(
-                        key_value=filename, notes=f"{key} 文件存储路径"
-                    )
+        filenames = await asyncio.gather(
+            *(self._download_file(url, spider) for url in file_url_keys.values())
+        )
+        for key, filename in zip(file_url_keys, filenames):
+            if filename is None:
+                continue
+
+            # Store file in item
+            if not _is_namedtuple:
+                item[f"{key}_local"] = filename
+            else:
+                item[f"{key}_local"] = DataItem(
+                    key_value=filename, notes=f"{key} 文件存储路径"
+                )
 
     async def process_item(self, item: Any, spider: AyuSpider) -> Any:
-        item_dict = ReuseOperation.item_to_dict(item)
-        alter_item = ReuseOperation.reshape_item(item_dict)
+        alter_item = ReuseOperation.get_alter_item(item, spider.crawler.stats)
         await self._download_and_add_field(alter_item, item, spider)
         return item
+
+    async def _close_spider(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+
+    def close_spider(self, spider: AyuSpider) -> Deferred:
+        return deferred_from_coro(self._close_spider())
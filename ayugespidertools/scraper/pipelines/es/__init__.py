@@ -1,18 +1,34 @@
 from __future__ import annotations
 
+import json
+import math
 from typing import TYPE_CHECKING, Any, Union
 
+from twisted.internet import task
+
+from ayugespidertools.common.buffer import BatchBuffer
 from ayugespidertools.common.multiplexing import ReuseOperation
+from ayugespidertools.config import logger
 
 try:
+    from elasticsearch.helpers import bulk, parallel_bulk
     from elasticsearch_dsl import Document, connections
 except ImportError:
     # pip install ayugespidertools[database]
     pass
 
-__all__ = ["AyuESPipeline", "dynamic_es_document"]
+__all__ = [
+    "AyuESPipeline",
+    "dynamic_es_document",
+    "get_es_buffer",
+    "get_es_action_size",
+    "record_es_bulk_stats",
+]
 
 if TYPE_CHECKING:
+    from scrapy.settings import Settings
+    from scrapy.statscollectors import StatsCollector
+
     from ayugespidertools.common.typevars import ESConf
     from ayugespidertools.spiders import AyuSpider
 
@@ -27,9 +43,49 @@ def dynamic_es_document(class_name, fields, index_settings=None):
     return type(class_name, (Document,), class_attrs)
 
 
+def get_es_buffer(settings: Settings) -> BatchBuffer | None:
+    """根据 ES_BATCH_SIZE 等配置获取 bulk 缓存，未开启批量写入时返回 None"""
+    if (batch_size := settings.getint("ES_BATCH_SIZE")) <= 1:
+        return None
+    return BatchBuffer(
+        size=batch_size,
+        interval=settings.getfloat("ES_BATCH_INTERVAL", 5),
+        max_bytes=settings.getint("ES_BATCH_BYTES", 10 * 1024 * 1024),
+    )
+
+
+def get_es_action_size(action: dict) -> int:
+    """估算 bulk action 序列化后的字节数"""
+    return len(json.dumps(action, ensure_ascii=False, default=str).encode())
+
+
+def record_es_bulk_stats(
+    stats: StatsCollector, index: str, success: int, errors: list[Any]
+) -> None:
+    """记录每批次 bulk 的写入结果
+
+    Args:
+        stats: scrapy stats
+        index: 索引名称
+        success: 写入成功的数量
+        errors: 写入失败的信息
+    """
+    stats.inc_value("es/bulk/batches")
+    stats.inc_value("es/bulk/success", success)
+    if errors:
+        stats.inc_value("es/bulk/failed", len(errors))
+        logger.error(
+            f"elasticsearch 索引 {index} 批量写入时有 {len(errors)} 条失败，"
+            f"首条错误: {errors[0]}"
+        )
+
+
 class AyuESPipeline:
     es_conf: ESConf
     es_type: DocumentType
+    stats: StatsCollector
+    buffer: BatchBuffer | None = None
+    flush_task: task.LoopingCall | None = None
 
     def open_spider(self, spider: AyuSpider) -> None:
         assert hasattr(spider, "es_conf"), "未配置 elasticsearch 连接信息！"
@@ -49,9 +105,17 @@ class AyuESPipeline:
             ssl_assert_fingerprint=self.es_conf.ssl_assert_fingerprint,
         )
 
+        settings = spider.crawler.settings
+        self.stats = spider.crawler.stats
+        self.bulk_parallel = settings.getint("ES_BULK_PARALLEL", 1)
+        self.buffer = get_es_buffer(settings)
+        if self.buffer is not None and self.buffer.interval > 0:
+            self.flush_task = task.LoopingCall(self._flush_expired)
+            self.flush_task.start(self.buffer.interval, now=False)
+
     def process_item(self, item: Any, spider: AyuSpider) -> Any:
-        item_dict = ReuseOperation.item_to_dict(item)
-        alert_item = ReuseOperation.reshape_item(item_dict)
+        item_dict = ReuseOperation.item_to_dict(item, spider.crawler.stats)
+        alert_item = ReuseOperation.get_alter_item(item, spider.crawler.stats)
         if not (new_item := alert_item.new_item):
             return
 
@@ -63,5 +127,59 @@ class AyuESPipeline:
             if self.es_conf.init:
                 self.es_type.init()
         es_item = self.es_type(**new_item)
-        es_item.save()
+        if self.buffer is None:
+            es_item.save()
+            return item
+
+        action = es_item.to_dict(include_meta=True)
+        _index = action["_index"]
+        if self.buffer.add(_index, action, nbytes=get_es_action_size(action)):
+            self.bulk(_index, self.buffer.pop(_index))
         return item
+
+    def bulk(self, index: str, actions: list[dict]) -> None:
+        """批量写入，ES_BULK_PARALLEL 大于 1 时使用 parallel_bulk 多线程写入
+
+        Args:
+            index: 索引名称
+            actions: bulk actions
+        """
+        if not actions:
+            return
+
+        client = connections.get_connection()
+        try:
+            if self.bulk_parallel > 1:
+                success, errors = 0, []
+                for ok, info in parallel_bulk(
+                    client,
+                    actions,
+                    thread_count=self.bulk_parallel,
+                    chunk_size=math.ceil(len(actions) / self.bulk_parallel),
+                    raise_on_error=False,
+                ):
+                    if ok:
+                        success += 1
+                    else:
+                        errors.append(info)
+            else:
+                success, errors = bulk(client, actions, raise_on_error=False)
+        except Exception as e:
+            # 链接等异常不能抛出至触发写入的 item 中，也不能中断其它索引的写入
+            success, errors = 0, [repr(e)] * len(actions)
+        record_es_bulk_stats(self.stats, index, success, errors)
+
+    def _flush_expired(self) -> None:
+        for _index in self.buffer.expired_keys():
+            self.bulk(_index, self.buffer.pop(_index))
+
+    def flush(self) -> None:
+        """将缓存中的所有数据批量写入"""
+        for _index in self.buffer.keys():
+            self.bulk(_index, self.buffer.pop(_index))
+
+    def close_spider(self, spider: AyuSpider) -> None:
+        if self.flush_task is not None and self.flush_task.running:
+            self.flush_task.stop()
+        if self.buffer is not None:
+            self.flush()
@@ -4,9 +4,16 @@ import asyncio
 from typing import TYPE_CHECKING, Any, Union
 
 from scrapy.utils.defer import deferred_from_coro
+from twisted.internet import task
 
 from ayugespidertools.common.multiplexing import ReuseOperation
-from ayugespidertools.scraper.pipelines.es import dynamic_es_document
+from ayugespidertools.config import logger
+from ayugespidertools.scraper.pipelines.es import (
+    dynamic_es_document,
+    get_es_action_size,
+    get_es_buffer,
+    record_es_bulk_stats,
+)
 
 try:
     from elasticsearch import AsyncElasticsearch
@@ -19,8 +26,10 @@ __all__ = ["AyuAsyncESPipeline"]
 
 if TYPE_CHECKING:
     from elasticsearch_dsl import Document
+    from scrapy.statscollectors import StatsCollector
     from twisted.internet.defer import Deferred
 
+    from ayugespidertools.common.buffer import BatchBuffer
     from ayugespidertools.common.typevars import ESConf
     from ayugespidertools.spiders import AyuSpider
 
@@ -32,6 +41,10 @@ class AyuAsyncESPipeline:
     client: AsyncElasticsearch
     es_type: DocumentType
     running_tasks: set
+    stats: StatsCollector
+    buffer: BatchBuffer | None = None
+    bulk_semaphore: asyncio.Semaphore
+    flush_task: task.LoopingCall | None = None
 
     def open_spider(self, spider: AyuSpider) -> None:
         assert hasattr(spider, "es_conf"), "未配置 elasticsearch 连接信息！"
@@ -52,9 +65,20 @@ class AyuAsyncESPipeline:
             ssl_assert_fingerprint=self.es_conf.ssl_assert_fingerprint,
         )
 
+        settings = spider.crawler.settings
+        self.stats = spider.crawler.stats
+        # 同时进行的 bulk 请求数量，为 1 时按顺序依次写入
+        self.bulk_semaphore = asyncio.Semaphore(settings.getint("ES_BULK_PARALLEL", 1))
+        self.buffer = get_es_buffer(settings)
+        if self.buffer is not None and self.buffer.interval > 0:
+            self.flush_task = task.LoopingCall(
+                lambda: deferred_from_coro(self._flush_expired())
+            )
+            self.flush_task.start(self.buffer.interval, now=False)
+
     async def process_item(self, item: Any, spider: AyuSpider) -> Any:
-        item_dict = ReuseOperation.item_to_dict(item)
-        alert_item = ReuseOperation.reshape_item(item_dict)
+        item_dict = ReuseOperation.item_to_dict(item, spider.crawler.stats)
+        alert_item = ReuseOperation.get_alter_item(item, spider.crawler.stats)
         if not (new_item := alert_item.new_item):
             return
 
@@ -67,23 +91,62 @@ class AyuAsyncESPipeline:
             if self.es_conf.init:
                 self.es_type.init()
 
-        task = asyncio.create_task(self.insert_item(new_item, _index))
-        self.running_tasks.add(task)
-        await task
-        task.add_done_callback(lambda t: self.running_tasks.discard(t))
+        if self.buffer is None:
+            await self.insert_item(new_item, _index)
+            return item
+
+        action = {"_index": _index, "_source": new_item}
+        if self.buffer.add(_index, action, nbytes=get_es_action_size(action)):
+            await self.submit_bulk(_index, self.buffer.pop(_index))
         return item
 
     async def insert_item(self, new_item: dict, index: str) -> None:
-        async def gendata():
-            yield {
-                "_index": index,
-                "doc": new_item,
-            }
+        await async_bulk(self.client, [{"_index": index, "_source": new_item}])
+
+    async def submit_bulk(self, index: str, actions: list[dict]) -> None:
+        """提交 bulk 写入任务，并发数量达到 ES_BULK_PARALLEL 时等待已有任务完成
+
+        Args:
+            index: 索引名称
+            actions: bulk actions
+        """
+        if not actions:
+            return
 
-        await async_bulk(self.client, gendata())
+        await self.bulk_semaphore.acquire()
+        bulk_task = asyncio.create_task(self.bulk(index, actions))
+        self.running_tasks.add(bulk_task)
+        bulk_task.add_done_callback(self._on_bulk_done)
+
+    def _on_bulk_done(self, bulk_task: asyncio.Task) -> None:
+        self.running_tasks.discard(bulk_task)
+        self.bulk_semaphore.release()
+
+    async def bulk(self, index: str, actions: list[dict]) -> None:
+        try:
+            success, errors = await async_bulk(
+                self.client, actions, raise_on_error=False
+            )
+        except Exception as e:
+            success, errors = 0, [repr(e)] * len(actions)
+        record_es_bulk_stats(self.stats, index, success, errors)
+
+    async def _flush_expired(self) -> None:
+        try:
+            for _index in self.buffer.expired_keys():
+                await self.submit_bulk(_index, self.buffer.pop(_index))
+        except Exception as e:
+            logger.error(f"elasticsearch 定时批量写入失败: {e}")
 
     async def _close_spider(self):
+        if self.buffer is not None:
+            for _index in self.buffer.keys():
+                await self.submit_bulk(_index, self.buffer.pop(_index))
+        if self.running_tasks:
+            await asyncio.gather(*self.running_tasks, return_exceptions=True)
         await self.client.close()
 
     def close_spider(self, spider: AyuSpider) -> Deferred:
+        if self.flush_task is not None and self.flush_task.running:
+            self.flush_task.stop()
         return deferred_from_coro(self._close_spider())
@@ -5,14 +5,24 @@ import urllib.parse
 from typing import TYPE_CHECKING, Any
 
 import motor.motor_asyncio
+from scrapy.utils.defer import deferred_from_coro
+from twisted.internet import task
 
-from ayugespidertools.common.mongodbpipe import AsyncioAsynchronous
+from ayugespidertools.common.buffer import BatchBuffer
+from ayugespidertools.common.mongodbpipe import (
+    AsyncioAsynchronous,
+    mongodb_bulk_write,
+    record_mongodb_bulk_stats,
+)
 from ayugespidertools.common.multiplexing import ReuseOperation
+from ayugespidertools.config import logger
 
 __all__ = ["AyuAsyncMongoPipeline"]
 
 if TYPE_CHECKING:
     from motor.core import AgnosticClient, AgnosticDatabase
+    from scrapy.statscollectors import StatsCollector
+    from twisted.internet.defer import Deferred
 
     from ayugespidertools.spiders import AyuSpider
 
@@ -20,6 +30,9 @@ if TYPE_CHECKING:
 class AyuAsyncMongoPipeline:
     client: AgnosticClient
     db: AgnosticDatabase
+    stats: StatsCollector
+    buffer: BatchBuffer | None = None
+    flush_task: task.LoopingCall | None = None
 
     def open_spider(self, spider: AyuSpider) -> None:
         assert hasattr(spider, "mongodb_conf"), "未配置 MongoDB 连接信息！"
@@ -36,16 +49,73 @@ class AyuAsyncMongoPipeline:
 
         self.client = motor.motor_asyncio.AsyncIOMotorClient(_mongo_uri)
         self.db = self.client.get_database()
+        self.stats = spider.crawler.stats
+
+        settings = spider.crawler.settings
+        if (batch_size := settings.getint("MONGODB_BATCH_SIZE")) > 1:
+            self.buffer = BatchBuffer(
+                size=batch_size,
+                interval=settings.getfloat("MONGODB_BATCH_INTERVAL", 5),
+            )
+            if self.buffer.interval > 0:
+                self.flush_task = task.LoopingCall(
+                    lambda: deferred_from_coro(self._flush_expired())
+                )
+                self.flush_task.start(self.buffer.interval, now=False)
 
     async def process_item(self, item: Any, spider: AyuSpider) -> Any:
-        item_dict = ReuseOperation.item_to_dict(item)
-        await asyncio.shield(
-            AsyncioAsynchronous().process_item_template(
-                item_dict=item_dict,
-                db=self.db,
+        item_dict = ReuseOperation.item_to_dict(item, spider.crawler.stats)
+        if self.buffer is None:
+            await asyncio.shield(
+                AsyncioAsynchronous().process_item_template(
+                    item_dict=item_dict,
+                    db=self.db,
+                )
             )
-        )
+        elif collection_name := AsyncioAsynchronous().buffer_item_template(
+            item_dict, self.buffer
+        ):
+            await asyncio.shield(self._try_bulk_write(collection_name))
         return item
 
-    def close_spider(self, spider: AyuSpider) -> None:
-        self.client.close()
+    async def bulk_write(self, collection_name: str) -> None:
+        """批量写入集合对应的所有缓存操作
+
+        Args:
+            collection_name: 集合名称
+        """
+        if not (operations := self.buffer.pop(collection_name)):
+            return
+        details = await mongodb_bulk_write(
+            AsyncioAsynchronous(),
+            db=self.db,
+            collection_name=collection_name,
+            operations=operations,
+        )
+        record_mongodb_bulk_stats(self.stats, collection_name, details)
+
+    async def _try_bulk_write(self, collection_name: str) -> None:
+        """批量写入集合，异常只记录日志，不会抛出至触发写入的 item 或定时任务中"""
+        try:
+            await self.bulk_write(collection_name)
+        except Exception as e:
+            logger.error(f"mongodb 批量写入失败: {e}, collection: {collection_name}")
+
+    async def _flush_expired(self) -> None:
+        for collection_name in self.buffer.expired_keys():
+            await self._try_bulk_write(collection_name)
+
+    async def _close_spider(self) -> None:
+        try:
+            for collection_name in self.buffer.keys():
+                await self._try_bulk_write(collection_name)
+        finally:
+            self.client.close()
+
+    def close_spider(self, spider: AyuSpider) -> Deferred | None:
+        if self.flush_task is not None and self.flush_task.running:
+            self.flush_task.stop()
+        if self.buffer is None:
+            self.client.close()
+            return None
+        return deferred_from_coro(self._close_spider())
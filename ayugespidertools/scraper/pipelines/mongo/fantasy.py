@@ -2,8 +2,17 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, Any
 
-from ayugespidertools.common.mongodbpipe import Synchronize, mongodb_pipe
+from twisted.internet import task
+
+from ayugespidertools.common.buffer import BatchBuffer
+from ayugespidertools.common.mongodbpipe import (
+    Synchronize,
+    mongodb_bulk_write,
+    mongodb_pipe,
+    record_mongodb_bulk_stats,
+)
 from ayugespidertools.common.multiplexing import ReuseOperation
+from ayugespidertools.config import logger
 from ayugespidertools.mongoclient import MongoDbBase
 
 __all__ = ["AyuFtyMongoPipeline"]
@@ -11,6 +20,7 @@ __all__ = ["AyuFtyMongoPipeline"]
 if TYPE_CHECKING:
     import pymongo
     from pymongo import database
+    from scrapy.statscollectors import StatsCollector
 
     from ayugespidertools.spiders import AyuSpider
 
@@ -18,11 +28,29 @@ if TYPE_CHECKING:
 class AyuFtyMongoPipeline:
     conn: pymongo.MongoClient
     db: database.Database
+    stats: StatsCollector
+    buffer: BatchBuffer | None = None
+    flush_task: task.LoopingCall | None = None
 
     def open_spider(self, spider: AyuSpider) -> None:
         assert hasattr(spider, "mongodb_conf"), "未配置 MongoDB 连接信息！"
         mongodb_conf_dict = spider.mongodb_conf._asdict()
         self.conn, self.db = MongoDbBase.connects(**mongodb_conf_dict)
+        self.stats = spider.crawler.stats
+        self._open_batch(spider)
+
+    def _open_batch(self, spider: AyuSpider) -> None:
+        """根据 MONGODB_BATCH_SIZE 开启 bulk_write 批量写入模式"""
+        settings = spider.crawler.settings
+        if (batch_size := settings.getint("MONGODB_BATCH_SIZE")) <= 1:
+            return
+
+        self.buffer = BatchBuffer(
+            size=batch_size, interval=settings.getfloat("MONGODB_BATCH_INTERVAL", 5)
+        )
+        if self.buffer.interval > 0:
+            self.flush_task = task.LoopingCall(self._flush_expired)
+            self.flush_task.start(self.buffer.interval, now=False)
 
     def process_item(self, item: Any, spider: AyuSpider) -> Any:
         """mongoDB 存储的方法，item["mongo_update_rule"] 用于存储查询条件，如果查询数据存在的话就更新，不存在
@@ -35,9 +63,52 @@ class AyuFtyMongoPipeline:
         Returns:
             item: scrapy item
         """
-        item_dict = ReuseOperation.item_to_dict(item)
-        mongodb_pipe(Synchronize(), item_dict=item_dict, db=self.db)
+        item_dict = ReuseOperation.item_to_dict(item, spider.crawler.stats)
+        if self.buffer is None:
+            mongodb_pipe(Synchronize(), item_dict=item_dict, db=self.db)
+        elif collection_name := Synchronize().buffer_item_template(
+            item_dict, self.buffer
+        ):
+            self._try_bulk_write(collection_name)
         return item
 
+    def bulk_write(self, collection_name: str) -> None:
+        """批量写入集合对应的所有缓存操作
+
+        Args:
+            collection_name: 集合名称
+        """
+        if not (operations := self.buffer.pop(collection_name)):
+            return
+        details = mongodb_bulk_write(
+            Synchronize(),
+            db=self.db,
+            collection_name=collection_name,
+            operations=operations,
+        )
+        record_mongodb_bulk_stats(self.stats, collection_name, details)
+
+    def _try_bulk_write(self, collection_name: str) -> None:
+        """批量写入集合，异常只记录日志，不会抛出至触发写入的 item 或定时任务中"""
+        try:
+            self.bulk_write(collection_name)
+        except Exception as e:
+            logger.error(f"mongodb 批量写入失败: {e}, collection: {collection_name}")
+
+    def _flush_expired(self) -> None:
+        for collection_name in self.buffer.expired_keys():
+            self._try_bulk_write(collection_name)
+
+    def flush(self) -> None:
+        """将缓存中的所有操作批量写入"""
+        for collection_name in self.buffer.keys():
+            self._try_bulk_write(collection_name)
+
     def close_spider(self, spider: AyuSpider) -> None:
-        self.conn.close()
+        if self.flush_task is not None and self.flush_task.running:
+            self.flush_task.stop()
+        try:
+            if self.buffer is not None:
+                self.flush()
+        finally:
+            self.conn.close()
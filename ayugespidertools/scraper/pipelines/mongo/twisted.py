@@ -1,7 +1,16 @@
-from twisted.internet import defer, reactor
+import time
 
-from ayugespidertools.common.mongodbpipe import TwistedAsynchronous, mongodb_pipe
+from twisted.internet import defer, reactor, threads
+from twisted.python.threadpool import ThreadPool
+
+from ayugespidertools.common.mongodbpipe import (
+    TwistedAsynchronous,
+    mongodb_bulk_write,
+    mongodb_pipe,
+    record_mongodb_bulk_stats,
+)
 from ayugespidertools.common.multiplexing import ReuseOperation
+from ayugespidertools.config import logger
 from ayugespidertools.scraper.pipelines.mongo.fantasy import AyuFtyMongoPipeline
 
 __all__ = [
@@ -10,14 +19,124 @@ __all__ = [
 
 
 class AyuTwistedMongoPipeline(AyuFtyMongoPipeline):
+    """在专用的线程池中执行 mongodb 写入，不占用 reactor 的公共线程池（DNS 解析等也在使用）"""
+
+    def open_spider(self, spider):
+        super().open_spider(spider)
+        settings = spider.crawler.settings
+        self.threadpool = ThreadPool(
+            minthreads=1,
+            maxthreads=settings.getint("MONGODB_THREADPOOL_SIZE", 10),
+            name=self.__class__.__name__,
+        )
+        self.threadpool.start()
+        # 达到待写入数量上限后，process_item 会等待至有写入完成，避免 mongodb 较慢时内存无限增长
+        self.write_semaphore = defer.DeferredSemaphore(
+            settings.getint("MONGODB_MAX_PENDING_WRITES", 100)
+        )
+        # 已提交但未完成的写入，在 close_spider 中等待其全部完成
+        self.pending_writes = set()
+        self._write_latency_total = 0.0
+
     @defer.inlineCallbacks
     def process_item(self, item, spider):
-        out = defer.Deferred()
-        reactor.callInThread(self.db_insert, item, out)
-        yield out
-        defer.returnValue(item)
-
-    def db_insert(self, item, out):
-        item_dict = ReuseOperation.item_to_dict(item)
-        mongodb_pipe(TwistedAsynchronous(), item_dict=item_dict, db=self.db)
-        reactor.callFromThread(out.callback, item_dict)
+        item_dict = ReuseOperation.item_to_dict(item, spider.crawler.stats)
+        if self.buffer is None:
+            yield self.run_write(
+                mongodb_pipe, TwistedAsynchronous(), item_dict=item_dict, db=self.db
+            )
+        elif collection_name := TwistedAsynchronous().buffer_item_template(
+            item_dict, self.buffer
+        ):
+            yield self.bulk_write(collection_name)
+        return item
+
+    @defer.inlineCallbacks
+    def run_write(self, func, *args, on_success=None, **kwargs):
+        """在专用线程池中执行 mongodb 写入，只在待写入数量达到上限时等待，不等待写入完成
+
+        Args:
+            func: 写入方法
+            *args: 写入方法的参数
+            on_success: 写入成功后在 reactor 线程中调用的方法，参数为写入方法的返回值
+            **kwargs: 写入方法的关键字参数
+
+        Returns:
+            1). 写入已提交至线程池时触发的 Deferred
+        """
+        acquired = self.write_semaphore.acquire()
+        self._record_queue_depth()
+        yield acquired
+        d = self._timed_write(func, *args, **kwargs)
+        self.pending_writes.add(d)
+        self._record_queue_depth()
+        if on_success is not None:
+            d.addCallback(on_success)
+        d.addErrback(self._log_write_failure)
+        d.addBoth(self._on_write_done, d)
+
+    def _timed_write(self, func, *args, **kwargs):
+        start = time.monotonic()
+        d = threads.deferToThreadPool(reactor, self.threadpool, func, *args, **kwargs)
+        d.addBoth(self._record_write_latency, start)
+        return d
+
+    def _record_write_latency(self, result, start):
+        latency_ms = (time.monotonic() - start) * 1000
+        self.stats.inc_value("mongo/writes")
+        self._write_latency_total += latency_ms
+        self.stats.set_value(
+            "mongo/write_latency/avg_ms",
+            round(self._write_latency_total / self.stats.get_value("mongo/writes"), 2),
+        )
+        self.stats.max_value("mongo/write_latency/max_ms", round(latency_ms, 2))
+        return result
+
+    def _record_queue_depth(self):
+        semaphore = self.write_semaphore
+        depth = semaphore.limit - semaphore.tokens + len(semaphore.waiting)
+        self.stats.set_value("mongo/queue_depth", depth)
+        self.stats.max_value("mongo/queue_depth/max", depth)
+
+    def _on_write_done(self, result, d):
+        self.write_semaphore.release()
+        self.pending_writes.discard(d)
+        self._record_queue_depth()
+        return result
+
+    @staticmethod
+    def _log_write_failure(failure):
+        logger.error(f"mongodb 写入失败: {failure.getErrorMessage()}")
+
+    def bulk_write(self, collection_name):
+        """在专用线程池中批量写入集合对应的所有缓存操作，写入结果在 reactor 线程中记录"""
+        if not (operations := self.buffer.pop(collection_name)):
+            return defer.succeed(None)
+        return self.run_write(
+            mongodb_bulk_write,
+            TwistedAsynchronous(),
+            db=self.db,
+            collection_name=collection_name,
+            operations=operations,
+            on_success=lambda details: record_mongodb_bulk_stats(
+                self.stats, collection_name, details
+            ),
+        )
+
+    def _flush_expired(self):
+        return defer.DeferredList(
+            [self.bulk_write(c) for c in self.buffer.expired_keys()]
+        )
+
+    def flush(self):
+        return defer.DeferredList([self.bulk_write(c) for c in self.buffer.keys()])
+
+    @defer.inlineCallbacks
+    def close_spider(self, spider):
+        if self.flush_task is not None and self.flush_task.running:
+            self.flush_task.stop()
+        if self.buffer is not None:
+            yield self.flush()
+        yield defer.DeferredList(list(self.pending_writes))
+        self.threadpool.stop()
+        self.conn.close()
@@ -5,6 +5,7 @@ from typing import TYPE_CHECKING, Any
 
 from kafka import KafkaProducer
 from kafka.errors import KafkaError
+from twisted.internet import defer, reactor
 
 from ayugespidertools.common.multiplexing import ReuseOperation
 from ayugespidertools.config import logger
@@ -12,15 +13,21 @@ from ayugespidertools.config import logger
 __all__ = ["AyuKafkaPipeline"]
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from kafka.producer.future import FutureRecordMetadata
+    from scrapy.statscollectors import StatsCollector
+
     from ayugespidertools.spiders import AyuSpider
 
 
 class KafkaProducerClient:
-    def __init__(self, bootstrap_servers: list) -> None:
+    def __init__(self, bootstrap_servers: list, **configs: Any) -> None:
         self.producer = KafkaProducer(
             bootstrap_servers=bootstrap_servers,
             key_serializer=lambda k: json.dumps(k).encode(),
             value_serializer=lambda v: json.dumps(v).encode(),
+            **configs,
         )
 
     def sendmsg(
@@ -61,6 +68,36 @@ class KafkaProducerClient:
             # Decide what to do if produce request failed...
             logger.error(f"save error, topic: {topic}, value: {value}, key: {key}")
 
+    def sendmsg_nowait(
+        self,
+        topic: str,
+        value: dict,
+        key: str | None = None,
+        on_success: Callable | None = None,
+        on_error: Callable | None = None,
+    ) -> FutureRecordMetadata:
+        """发送数据但不等待 broker 确认，由 producer 根据 linger_ms 和 batch_size 批量发送
+
+        Args:
+            topic: kafka topic
+            value: message value
+            key: kafka key
+            on_success: 发送成功的回调，在 kafka producer 的 io 线程中执行
+            on_error: 发送失败的回调，在 kafka producer 的 io 线程中执行
+
+        Returns:
+            1). kafka-python 的 FutureRecordMetadata
+        """
+        future = self.producer.send(topic=topic, value=value, key=key)
+        if on_success is not None:
+            future.add_callback(on_success)
+        if on_error is not None:
+            future.add_errback(on_error)
+        return future
+
+    def flush(self, timeout: float | None = None) -> None:
+        self.producer.flush(timeout=timeout)
+
     def on_send_success(self, *args, **kwargs):
         """发送成功回调函数，暂不做任何处理或提示"""
         return
@@ -77,22 +114,77 @@ class KafkaProducerClient:
 
 class AyuKafkaPipeline:
     kp: KafkaProducerClient
+    stats: StatsCollector
+    sync_send: bool
+    semaphore: defer.DeferredSemaphore
 
     def open_spider(self, spider: AyuSpider) -> None:
         assert hasattr(spider, "kafka_conf"), "未配置 kafka 连接信息！"
+        settings = spider.crawler.settings
+        self.stats = spider.crawler.stats
+        # 开启后每条消息都会阻塞等待 broker 的确认，会严重影响性能
+        self.sync_send = settings.getbool("KAFKA_SYNC_SEND")
         # 如果有多个 kafka 服务地址，用逗号分隔，会在此处拆分为列表
         _bts = spider.kafka_conf.bootstrap_servers
         bts_lst = _bts.split(",")
-        self.kp = KafkaProducerClient(bootstrap_servers=bts_lst)
+        self.kp = KafkaProducerClient(
+            bootstrap_servers=bts_lst,
+            linger_ms=settings.getint("KAFKA_LINGER_MS", 5),
+            batch_size=settings.getint("KAFKA_BATCH_SIZE", 16384),
+        )
+        # 未确认的消息数量达到上限时，process_item 会等待至有消息被确认
+        self.semaphore = defer.DeferredSemaphore(
+            settings.getint("KAFKA_MAX_IN_FLIGHT", 1000)
+        )
 
     def process_item(self, item: Any, spider: AyuSpider) -> Any:
-        item_dict = ReuseOperation.item_to_dict(item)
-        self.kp.sendmsg(
-            topic=spider.kafka_conf.topic,
-            value=item_dict,
-            key=spider.kafka_conf.key,
+        item_dict = ReuseOperation.item_to_dict(item, spider.crawler.stats)
+        if self.sync_send:
+            self.kp.sendmsg(
+                topic=spider.kafka_conf.topic,
+                value=item_dict,
+                key=spider.kafka_conf.key,
+            )
+            return item
+
+        d = self.semaphore.acquire()
+        d.addCallback(lambda _: self._send(item_dict, spider))
+        d.addCallback(lambda _: item)
+        return d
+
+    def _send(self, item_dict: dict, spider: AyuSpider) -> None:
+        try:
+            self.kp.sendmsg_nowait(
+                topic=spider.kafka_conf.topic,
+                value=item_dict,
+                key=spider.kafka_conf.key,
+                on_success=self._on_send_success,
+                on_error=self._on_send_error,
+            )
+        except Exception:
+            self.semaphore.release()
+            self.stats.inc_value("kafka/send/failed")
+            raise
+        in_flight = self.semaphore.limit - self.semaphore.tokens
+        self.stats.max_value("kafka/in_flight/max", in_flight)
+
+    # 发送回调在 kafka producer 的 io 线程中执行，stats 和 semaphore 都需要在 reactor 线程中修改
+    def _on_send_success(self, *args: Any) -> None:
+        reactor.callFromThread(self._on_sent, "kafka/send/succeeded")
+
+    def _on_send_error(self, exc: Exception) -> None:
+        logger.error(f"kafka send error: {exc!r}")
+        reactor.callFromThread(
+            self._on_sent,
+            "kafka/send/failed",
+            f"kafka/send/failed/{type(exc).__name__}",
         )
-        return item
+
+    def _on_sent(self, *stats_keys: str) -> None:
+        for key in stats_keys:
+            self.stats.inc_value(key)
+        self.semaphore.release()
 
     def close_spider(self, spider: AyuSpider) -> None:
+        self.kp.flush()
         self.kp.close_producer()
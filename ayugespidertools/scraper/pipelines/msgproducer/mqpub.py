@@ -1,19 +1,30 @@
 from __future__ import annotations
 
+import itertools
 import json
 from typing import TYPE_CHECKING, Any
 
 import pika
+from pika.adapters.twisted_connection import TwistedProtocolConnection
+from pika.exceptions import NackError
+from twisted.internet import defer, protocol, reactor
 
 from ayugespidertools.common.multiplexing import ReuseOperation
+from ayugespidertools.config import logger
 from ayugespidertools.items import AyuItem
 
 __all__ = [
     "AyuMQPipeline",
+    "AyuTwistedMQPipeline",
 ]
 
 if TYPE_CHECKING:
+    from collections.abc import Iterator
+
     from pika.adapters.blocking_connection import BlockingChannel, BlockingConnection
+    from pika.adapters.twisted_connection import TwistedChannel
+    from scrapy.statscollectors import StatsCollector
+    from twisted.python.failure import Failure
 
     from ayugespidertools.common.typevars import MQConf
     from ayugespidertools.spiders import AyuSpider
@@ -62,3 +73,146 @@ class AyuMQPipeline:
             mandatory=True,
         )
         return item
+
+
+class AyuTwistedMQPipeline(AyuMQPipeline):
+    """基于 pika TwistedProtocolConnection 的非阻塞 RabbitMQ pipeline
+
+    发布消息后不等待 broker 的确认，未确认的消息数量达到 MQ_CONFIRM_WINDOW 时才会等待；
+    确认结果由 pika 按 delivery tag 匹配，被 nack 的消息会重新发布。
+    """
+
+    mq_conf: MQConf
+    conn: TwistedProtocolConnection
+    channels: list[TwistedChannel]
+    stats: StatsCollector
+    semaphore: defer.DeferredSemaphore
+    pending: set[defer.Deferred]
+
+    @defer.inlineCallbacks
+    def open_spider(self, spider: AyuSpider):
+        assert hasattr(spider, "rabbitmq_conf"), "未配置 RabbitMQ 连接信息！"
+        _mq_conf: MQConf = spider.rabbitmq_conf
+        settings = spider.crawler.settings
+        self.mq_conf = _mq_conf
+        self.stats = spider.crawler.stats
+        self.routing_by_table = settings.getbool("MQ_ROUTING_BY_TABLE")
+        self.retry_times = settings.getint("MQ_PUBLISH_RETRY_TIMES", 3)
+        self.semaphore = defer.DeferredSemaphore(
+            settings.getint("MQ_CONFIRM_WINDOW", 1000)
+        )
+        self.pending = set()
+
+        mq_conn_param = pika.URLParameters(
+            f"amqp://{_mq_conf.username}:{_mq_conf.password}"
+            f"@{_mq_conf.host}:{_mq_conf.port}/{_mq_conf.virtualhost}"
+            f"?heartbeat={_mq_conf.heartbeat}&socket_timeout={_mq_conf.socket_timeout}"
+        )
+        cc = protocol.ClientCreator(reactor, TwistedProtocolConnection, mq_conn_param)
+        self.conn = yield cc.connectTCP(_mq_conf.host, _mq_conf.port)
+        yield self.conn.ready
+
+        self.channels = []
+        for _ in range(max(settings.getint("MQ_CHANNEL_POOL_SIZE", 1), 1)):
+            channel = yield self.conn.channel()
+            yield channel.confirm_delivery()
+            self.channels.append(channel)
+        self._channel_cycle: Iterator[TwistedChannel] = itertools.cycle(self.channels)
+        yield self.channels[0].queue_declare(
+            queue=_mq_conf.queue,
+            durable=_mq_conf.durable,
+            exclusive=_mq_conf.exclusive,
+            auto_delete=_mq_conf.auto_delete,
+        )
+
+    def process_item(self, item: Any, spider: AyuSpider) -> Any:
+        item_dict = ReuseOperation.item_to_dict(item, spider.crawler.stats)
+        routing_key = self._get_routing_key(item_dict)
+        body = self._dict_to_bytes(item_dict)
+        d = self.semaphore.acquire()
+        d.addCallback(lambda _: self._publish(routing_key, body, self.retry_times))
+        d.addCallback(lambda _: item)
+        return d
+
+    def _get_routing_key(self, item_dict: dict) -> str | None:
+        """开启 MQ_ROUTING_BY_TABLE 时以 item 的 _table 作为 routing key"""
+        if not self.routing_by_table or not (table := item_dict.get("_table")):
+            return self.mq_conf.routing_key
+        if ReuseOperation.is_namedtuple_instance(table):
+            return table.key_value
+        return table
+
+    def _get_channel(self, routing_key: str | None) -> TwistedChannel:
+        # 按 _table 路由时，同一 routing key 的消息固定在同一 channel 上以保证其顺序
+        if self.routing_by_table:
+            return self.channels[hash(routing_key) % len(self.channels)]
+        return next(self._channel_cycle)
+
+    def _publish(self, routing_key: str | None, body: bytes, retry_times: int) -> None:
+        """发布消息，其确认结果在回调中处理，确认（或最终失败）后才释放窗口
+
+        Args:
+            routing_key: routing key
+            body: 消息内容
+            retry_times: 被 nack 时剩余的重试次数
+        """
+        try:
+            confirm = self._get_channel(routing_key).basic_publish(
+                exchange=self.mq_conf.exchange,
+                routing_key=routing_key,
+                body=body,
+                properties=pika.BasicProperties(
+                    content_type=self.mq_conf.content_type,
+                    delivery_mode=self.mq_conf.delivery_mode,
+                ),
+                mandatory=True,
+            )
+        except Exception:
+            self.semaphore.release()
+            self.stats.inc_value("rabbitmq/failed")
+            raise
+
+        self.stats.inc_value("rabbitmq/published")
+        self.stats.max_value(
+            "rabbitmq/unconfirmed/max", self.semaphore.limit - self.semaphore.tokens
+        )
+        self.pending.add(confirm)
+        confirm.addCallbacks(
+            self._on_ack,
+            self._on_nack,
+            errbackArgs=(routing_key, body, retry_times),
+        )
+        confirm.addBoth(self._untrack, confirm)
+
+    def _on_ack(self, _) -> None:
+        self.stats.inc_value("rabbitmq/acked")
+        self.semaphore.release()
+
+    def _on_nack(
+        self, failure: Failure, routing_key: str | None, body: bytes, retry_times: int
+    ) -> None:
+        if failure.check(NackError):
+            self.stats.inc_value("rabbitmq/nacked")
+            if retry_times > 0:
+                self.stats.inc_value("rabbitmq/retried")
+                # 重新发布时继续占用窗口中的位置
+                try:
+                    return self._publish(routing_key, body, retry_times - 1)
+                except Exception as e:
+                    logger.error(f"rabbitmq republish error: {e!r}")
+                    return None
+
+        self.stats.inc_value("rabbitmq/failed")
+        logger.error(f"rabbitmq publish error: {failure.getErrorMessage()}")
+        self.semaphore.release()
+
+    def _untrack(self, result: Any, confirm: defer.Deferred) -> Any:
+        self.pending.discard(confirm)
+        return result
+
+    @defer.inlineCallbacks
+    def close_spider(self, spider: AyuSpider):
+        # 等待所有消息（包括重试中的消息）被确认后再关闭连接
+        while self.pending:
+            yield defer.DeferredList(list(self.pending), consumeErrors=True)
+        yield self.conn.close()
@@ -4,10 +4,16 @@ import warnings
 from typing import TYPE_CHECKING, Any
 
 import pymysql
+from twisted.internet import task
 
+from ayugespidertools.common.buffer import BatchBuffer
 from ayugespidertools.common.expend import MysqlPipeEnhanceMixin
 from ayugespidertools.common.multiplexing import ReuseOperation
-from ayugespidertools.common.mysqlerrhandle import Synchronize, deal_mysql_err
+from ayugespidertools.common.mysqlerrhandle import (
+    Synchronize,
+    deal_mysql_err,
+    prepare_mysql_columns,
+)
 
 # 将 pymysql 中 Data truncated for column 警告类型置为 Error，其他警告忽略
 warnings.filterwarnings(
@@ -22,6 +28,7 @@ if TYPE_CHECKING:
     from pymysql.connections import Connection
     from pymysql.cursors import Cursor
 
+    from ayugespidertools.common.mysqlerrhandle import ColumnsCacheT
     from ayugespidertools.common.typevars import AlterItem, MysqlConf, slogT
     from ayugespidertools.spiders import AyuSpider
 
@@ -31,20 +38,54 @@ class AyuMysqlPipeline(MysqlPipeEnhanceMixin):
     conn: Connection[Cursor]
     slog: slogT
     cursor: Cursor
+    columns_cache: ColumnsCacheT
+    buffer: BatchBuffer | None = None
+    flush_task: task.LoopingCall | None = None
 
     def open_spider(self, spider: AyuSpider) -> None:
         assert hasattr(spider, "mysql_conf"), "未配置 Mysql 连接信息！"
+        self._open_sql_cache_stats()
         self.slog = spider.slog
         self.mysql_conf = spider.mysql_conf
+        self._create_tables(spider)
         self.conn = self._connect(self.mysql_conf)
         self.cursor = self.conn.cursor()
+        self.columns_cache = {}
+        self._open_batch(spider)
+
+    def _open_batch(self, spider: AyuSpider) -> None:
+        """根据 MYSQL_BATCH_SIZE 和 MYSQL_BATCH_INTERVAL 开启批量插入模式"""
+        settings = spider.crawler.settings
+        if (batch_size := settings.getint("MYSQL_BATCH_SIZE", 0)) <= 1:
+            return
+
+        batch_interval = settings.getfloat("MYSQL_BATCH_INTERVAL", 5)
+        self.buffer = BatchBuffer(size=batch_size, interval=batch_interval)
+        if batch_interval > 0:
+            self.flush_task = task.LoopingCall(self._flush_expired)
+            self.flush_task.start(batch_interval, now=False)
 
     def process_item(self, item: Any, spider: AyuSpider) -> Any:
-        item_dict = ReuseOperation.item_to_dict(item)
-        alter_item = ReuseOperation.reshape_item(item_dict)
-        self.insert_item(alter_item)
+        alter_item = ReuseOperation.get_alter_item(item, spider.crawler.stats)
+        if self.buffer is None:
+            self.insert_item(alter_item)
+        else:
+            self.buffer_item(alter_item)
         return item
 
+    def buffer_item(self, alter_item: AlterItem) -> None:
+        """将 item 按数据表及字段分组缓存，满足数量条件时批量插入
+
+        Args:
+            alter_item: 经过转变后的 item
+        """
+        if not (new_item := alter_item.new_item):
+            return
+
+        key = (alter_item.table.name, tuple(new_item.keys()))
+        if self.buffer.add(key, alter_item):
+            self.write_batch(key, self.buffer.pop(key))
+
     def insert_item(self, alter_item: AlterItem) -> None:
         """通用插入数据
 
@@ -57,6 +98,16 @@ class AyuMysqlPipeline(MysqlPipeEnhanceMixin):
         _table_name = alter_item.table.name
         _table_notes = alter_item.table.notes
         note_dic = alter_item.notes_dic
+        prepare_mysql_columns(
+            Synchronize(),
+            conn=self.conn,
+            cursor=self.cursor,
+            mysql_conf=self.mysql_conf,
+            table=_table_name,
+            table_notes=_table_notes,
+            note_dic=note_dic,
+            columns_cache=self.columns_cache,
+        )
         sql, args = self._get_sql_by_item(
             table=_table_name,
             item=new_item,
@@ -80,8 +131,109 @@ class AyuMysqlPipeline(MysqlPipeEnhanceMixin):
                 table=_table_name,
                 table_notes=_table_notes,
                 note_dic=note_dic,
+                columns_cache=self.columns_cache,
             )
             return self.insert_item(alter_item)
 
+    def insert_batch(
+        self, key: tuple[str, tuple[str, ...]], alter_items: list[AlterItem]
+    ) -> None:
+        """批量插入同一数据表且字段相同的数据
+
+        Args:
+            key: 数据表名及字段名组成的分组标识
+            alter_items: 经过转变后的 item 列表
+        """
+        if not alter_items:
+            return
+
+        _table_name, keys = key
+        _table_notes = alter_items[0].table.notes
+        note_dic = {}
+        for alter_item in alter_items:
+            note_dic.update(alter_item.notes_dic)
+        prepare_mysql_columns(
+            Synchronize(),
+            conn=self.conn,
+            cursor=self.cursor,
+            mysql_conf=self.mysql_conf,
+            table=_table_name,
+            table_notes=_table_notes,
+            note_dic=note_dic,
+            columns_cache=self.columns_cache,
+        )
+        sql = self._get_batch_sql_by_keys(
+            table=_table_name,
+            keys=keys,
+            odku_enable=self.mysql_conf.odku_enable,
+        )
+        args = [tuple(x.new_item.values()) for x in alter_items]
+
+        try:
+            self.cursor.executemany(sql, args)
+            self.conn.commit()
+        except Exception as e:
+            self.slog.warning(
+                f"Pipe Warn: {e} & Table: {_table_name} & Rows: {len(args)}"
+            )
+            self.conn.rollback()
+            deal_mysql_err(
+                Synchronize(),
+                err_msg=str(e),
+                conn=self.conn,
+                cursor=self.cursor,
+                mysql_conf=self.mysql_conf,
+                table=_table_name,
+                table_notes=_table_notes,
+                note_dic=note_dic,
+                columns_cache=self.columns_cache,
+            )
+            return self.insert_batch(key, alter_items)
+
+    def write_batch(
+        self, key: tuple[str, tuple[str, ...]], alter_items: list[AlterItem]
+    ) -> None:
+        """批量插入数据，失败时改为逐条插入，只丢弃插入失败的数据
+
+        批量插入由任意 item 或定时任务触发，异常不能抛出至无关 item 的 process_item 中。
+
+        Args:
+            key: 数据表名及字段名组成的分组标识
+            alter_items: 经过转变后的 item 列表
+        """
+        try:
+            self.insert_batch(key, alter_items)
+        except Exception as e:
+            self.slog.error(
+                f"批量插入数据失败，改为逐条插入: {e}, table: {key[0]}, "
+                f"rows: {len(alter_items)}"
+            )
+            for alter_item in alter_items:
+                try:
+                    self.insert_item(alter_item)
+                except Exception as e:
+                    self.slog.error(
+                        f"插入数据失败: {e}, table: {key[0]}, "
+                        f"item: {alter_item.new_item}"
+                    )
+
+    def _flush_expired(self) -> None:
+        for key in self.buffer.expired_keys():
+            self.write_batch(key, self.buffer.pop(key))
+
+    def flush(self) -> None:
+        """将缓存中的所有数据批量插入"""
+        if self.buffer is None:
+            return
+
+        for key in self.buffer.keys():
+            self.write_batch(key, self.buffer.pop(key))
+
     def close_spider(self, spider: AyuSpider) -> None:
-        self.conn.close()
+        if self.flush_task is not None and self.flush_task.running:
+            self.flush_task.stop()
+        try:
+            self.flush()
+            self._record_sql_cache_stats(spider)
+        finally:
+            self.conn.close()
@@ -8,15 +8,17 @@ from scrapy.utils.defer import deferred_from_coro
 
 from ayugespidertools.common.expend import MysqlPipeEnhanceMixin
 from ayugespidertools.common.multiplexing import ReuseOperation
+from ayugespidertools.common.mysqlerrhandle import AsyncioAsynchronous, deal_mysql_err
 
 __all__ = [
     "AyuAsyncMysqlPipeline",
 ]
 
 if TYPE_CHECKING:
+    from scrapy.statscollectors import StatsCollector
     from twisted.internet.defer import Deferred
 
-    from ayugespidertools.common.typevars import MysqlConf
+    from ayugespidertools.common.typevars import AlterItem, MysqlConf, slogT
     from ayugespidertools.spiders import AyuSpider
 
 
@@ -24,14 +26,24 @@ class AyuAsyncMysqlPipeline(MysqlPipeEnhanceMixin):
     mysql_conf: MysqlConf
     pool: aiomysql.Pool
     running_tasks: set
+    slog: slogT
+    stats: StatsCollector
+    semaphore: asyncio.Semaphore | None = None
 
     def open_spider(self, spider: AyuSpider) -> Deferred:
         assert hasattr(spider, "mysql_conf"), "未配置 Mysql 连接信息！"
+        self._open_sql_cache_stats()
         self.running_tasks = set()
         self.mysql_conf = spider.mysql_conf
+        self.slog = spider.slog
+        self.stats = spider.crawler.stats
+        self._create_tables(spider)
         return deferred_from_coro(self._open_spider(spider))
 
     async def _open_spider(self, spider: AyuSpider) -> None:
+        # 大于 0 时 process_item 不再等待插入完成，最多同时存在此数量的插入任务
+        if concurrency := spider.crawler.settings.getint("MYSQL_ASYNC_CONCURRENCY"):
+            self.semaphore = asyncio.Semaphore(concurrency)
         self.pool = await aiomysql.create_pool(
             host=self.mysql_conf.host,
             port=self.mysql_conf.port,
@@ -43,29 +55,73 @@ class AyuAsyncMysqlPipeline(MysqlPipeEnhanceMixin):
             autocommit=True,
         )
 
-    async def insert_item(self, item_dict: dict) -> None:
+    async def insert_item(self, alter_item: AlterItem) -> None:
+        if alter_item.new_item:
+            await self._insert_alter_item(alter_item)
+
+    async def _insert_alter_item(self, alter_item: AlterItem) -> None:
+        new_item = alter_item.new_item
+        _table_name = alter_item.table.name
+        sql, args = self._get_sql_by_item(
+            table=_table_name,
+            item=new_item,
+            odku_enable=self.mysql_conf.odku_enable,
+        )
         async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
-                alter_item = ReuseOperation.reshape_item(item_dict)
-                new_item = alter_item.new_item
-                sql, args = self._get_sql_by_item(
-                    table=alter_item.table.name,
-                    item=new_item,
-                    odku_enable=self.mysql_conf.odku_enable,
-                )
-                await cursor.execute(sql, args)
+                try:
+                    await cursor.execute(sql, args)
+                    return
+                except Exception as e:
+                    self.slog.warning(
+                        f"Pipe Warn: {e} & Table: {_table_name} & Item: {new_item}"
+                    )
+                    await deal_mysql_err(
+                        AsyncioAsynchronous(),
+                        err_msg=str(e),
+                        conn=conn,
+                        cursor=cursor,
+                        mysql_conf=self.mysql_conf,
+                        table=_table_name,
+                        table_notes=alter_item.table.notes,
+                        note_dic=alter_item.notes_dic,
+                    )
+        return await self._insert_alter_item(alter_item)
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        self.running_tasks.discard(task)
+        self.semaphore.release()
+        if task.cancelled():
+            self.stats.inc_value("mysql/async/cancelled")
+        elif e := task.exception():
+            self.stats.inc_value("mysql/async/failed")
+            self.stats.inc_value(f"mysql/async/failed/{type(e).__name__}")
+            self.slog.error(f"Pipe Error: {e!r}")
+        else:
+            self.stats.inc_value("mysql/async/succeeded")
 
     async def process_item(self, item: Any, spider: AyuSpider) -> Any:
-        item_dict = ReuseOperation.item_to_dict(item)
-        task = asyncio.create_task(self.insert_item(item_dict))
+        alter_item = ReuseOperation.get_alter_item(item, self.stats)
+        if self.semaphore is None:
+            await self.insert_item(alter_item)
+            return item
+
+        # 并发窗口已满时在此等待，以此对上游形成背压
+        await self.semaphore.acquire()
+        task = asyncio.create_task(self.insert_item(alter_item))
         self.running_tasks.add(task)
-        await task
-        task.add_done_callback(lambda t: self.running_tasks.discard(t))
+        task.add_done_callback(self._on_task_done)
+        self.stats.max_value("mysql/async/max_in_flight", len(self.running_tasks))
         return item
 
-    async def _close_spider(self) -> None:
+    async def _close_spider(self, spider: AyuSpider) -> None:
+        if self.running_tasks:
+            self.slog.info(f"等待 {len(self.running_tasks)} 个 mysql 插入任务完成")
+            await asyncio.gather(*self.running_tasks, return_exceptions=True)
+        # 在插入任务完成后记录，才包含其中的缓存命中情况
+        self._record_sql_cache_stats(spider)
+        self.pool.close()
         await self.pool.wait_closed()
 
     def close_spider(self, spider: AyuSpider) -> Deferred:
-        self.pool.close()
-        return deferred_from_coro(self._close_spider())
+        return deferred_from_coro(self._close_spider(spider))
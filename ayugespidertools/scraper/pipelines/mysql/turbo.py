@@ -40,6 +40,7 @@ class AyuTurboMysqlPipeline(AyuMysqlPipeline):
 
     def open_spider(self, spider: AyuSpider) -> None:
         assert hasattr(spider, "mysql_conf"), "未配置 Mysql 连接信息！"
+        self._open_sql_cache_stats()
         self.slog = spider.slog
         if not self.pool_db_conf:
             spider.slog.warning("未配置 POOL_DB_CONFIG 参数，将使用其默认参数")
@@ -51,6 +52,7 @@ class AyuTurboMysqlPipeline(AyuMysqlPipeline):
             }
         self.mysql_conf = spider.mysql_conf
         self._connect(spider.mysql_conf).close()
+        self._create_tables(spider)
 
         # 添加 PooledDB 的配置
         self.conn = PooledDB(
@@ -64,3 +66,5 @@ class AyuTurboMysqlPipeline(AyuMysqlPipeline):
             **self.pool_db_conf,
         ).connection()
         self.cursor = self.conn.cursor()
+        self.columns_cache = {}
+        self._open_batch(spider)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import threading
 from typing import TYPE_CHECKING, Any
 
 from pymysql import cursors
@@ -7,7 +8,11 @@ from twisted.enterprise import adbapi
 
 from ayugespidertools.common.expend import MysqlPipeEnhanceMixin
 from ayugespidertools.common.multiplexing import ReuseOperation
-from ayugespidertools.common.mysqlerrhandle import TwistedAsynchronous, deal_mysql_err
+from ayugespidertools.common.mysqlerrhandle import (
+    TwistedAsynchronous,
+    deal_mysql_err,
+    prepare_mysql_columns,
+)
 
 __all__ = [
     "AyuTwistedMysqlPipeline",
@@ -16,7 +21,8 @@ __all__ = [
 if TYPE_CHECKING:
     from twisted.python.failure import Failure
 
-    from ayugespidertools.common.typevars import MysqlConf, slogT
+    from ayugespidertools.common.mysqlerrhandle import ColumnsCacheT
+    from ayugespidertools.common.typevars import AlterItem, MysqlConf, slogT
     from ayugespidertools.spiders import AyuSpider
 
 
@@ -24,12 +30,19 @@ class AyuTwistedMysqlPipeline(MysqlPipeEnhanceMixin):
     mysql_conf: MysqlConf
     slog: slogT
     dbpool: adbapi.ConnectionPool
+    columns_cache: ColumnsCacheT
+    # db_insert 在 adbapi 的线程池中执行，修改表结构时按数据表加锁
+    columns_locks: dict[str, threading.Lock]
 
     def open_spider(self, spider: AyuSpider) -> None:
         assert hasattr(spider, "mysql_conf"), "未配置 Mysql 连接信息！"
+        self._open_sql_cache_stats()
         self.slog = spider.slog
         self.mysql_conf = spider.mysql_conf
+        self.columns_cache = {}
+        self.columns_locks = {}
         self._connect(self.mysql_conf).close()
+        self._create_tables(spider)
 
         _mysql_conf = {
             "user": self.mysql_conf.user,
@@ -50,19 +63,28 @@ class AyuTwistedMysqlPipeline(MysqlPipeEnhanceMixin):
         self.slog.error(f"创建数据表失败: {failure}")
 
     def process_item(self, item: Any, spider: AyuSpider) -> Any:
-        item_dict = ReuseOperation.item_to_dict(item)
-        query = self.dbpool.runInteraction(self.db_insert, item_dict)
+        alter_item = ReuseOperation.get_alter_item(item, spider.crawler.stats)
+        query = self.dbpool.runInteraction(self.db_insert, alter_item)
         query.addErrback(self.handle_error, item)
         return item
 
-    def db_insert(self, cursor: Any, item: Any) -> Any:
-        alter_item = ReuseOperation.reshape_item(item)
+    def db_insert(self, cursor: Any, alter_item: AlterItem) -> Any:
         if not (new_item := alter_item.new_item):
             return
 
         _table_name = alter_item.table.name
         _table_notes = alter_item.table.notes
         note_dic = alter_item.notes_dic
+        prepare_mysql_columns(
+            TwistedAsynchronous(),
+            cursor=cursor,
+            mysql_conf=self.mysql_conf,
+            table=_table_name,
+            table_notes=_table_notes,
+            note_dic=note_dic,
+            columns_cache=self.columns_cache,
+            columns_locks=self.columns_locks,
+        )
         sql, args = self._get_sql_by_item(
             table=_table_name,
             item=new_item,
@@ -83,9 +105,13 @@ class AyuTwistedMysqlPipeline(MysqlPipeEnhanceMixin):
                 table=_table_name,
                 table_notes=_table_notes,
                 note_dic=note_dic,
+                columns_cache=self.columns_cache,
             )
-            return self.db_insert(cursor, item)
-        return item
+            return self.db_insert(cursor, alter_item)
+        return alter_item
 
     def handle_error(self, failure: Failure, item: Any) -> None:
         self.slog.error(f"插入数据失败:{failure}, item: {item}")
+
+    def close_spider(self, spider: AyuSpider) -> None:
+        self._record_sql_cache_stats(spider)
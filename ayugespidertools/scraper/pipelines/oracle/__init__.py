@@ -21,12 +21,13 @@ class AyuOraclePipeline(OraclePipeEnhanceMixin):
 
     def open_spider(self, spider: AyuSpider) -> None:
         assert hasattr(spider, "oracle_conf"), "未配置 Oracle 连接信息！"
+        self._open_sql_cache_stats()
+        self._create_tables(spider)
         self.conn = self._connect(spider.oracle_conf)
         self.cursor = self.conn.cursor()
 
     def process_item(self, item: Any, spider: AyuSpider) -> Any:
-        item_dict = ReuseOperation.item_to_dict(item)
-        alter_item = ReuseOperation.reshape_item(item_dict)
+        alter_item = ReuseOperation.get_alter_item(item, spider.crawler.stats)
         self.insert_item(alter_item)
         return item
 
@@ -44,4 +45,5 @@ class AyuOraclePipeline(OraclePipeEnhanceMixin):
         self.conn.commit()
 
     def close_spider(self, spider: AyuSpider) -> None:
+        self._record_sql_cache_stats(spider)
         self.conn.close()
@@ -15,7 +15,7 @@ if TYPE_CHECKING:
     from oracledb.connection import Connection
     from twisted.python.failure import Failure
 
-    from ayugespidertools.common.typevars import OracleConf, slogT
+    from ayugespidertools.common.typevars import AlterItem, OracleConf, slogT
     from ayugespidertools.spiders import AyuSpider
 
 
@@ -27,8 +27,10 @@ class AyuTwistedOraclePipeline(OraclePipeEnhanceMixin):
 
     def open_spider(self, spider: AyuSpider) -> None:
         assert hasattr(spider, "oracle_conf"), "未配置 Oracle 连接信息！"
+        self._open_sql_cache_stats()
         self.slog = spider.slog
         self.oracle_conf = spider.oracle_conf
+        self._create_tables(spider)
 
         _oracle_conf = {
             "user": self.oracle_conf.user,
@@ -51,19 +53,21 @@ class AyuTwistedOraclePipeline(OraclePipeEnhanceMixin):
         self.slog.error(f"创建数据表失败: {failure}")
 
     def process_item(self, item: Any, spider: AyuSpider) -> Any:
-        item_dict = ReuseOperation.item_to_dict(item)
-        query = self.dbpool.runInteraction(self.db_insert, item_dict)
+        alter_item = ReuseOperation.get_alter_item(item, spider.crawler.stats)
+        query = self.dbpool.runInteraction(self.db_insert, alter_item)
         query.addErrback(self.handle_error, item)
         return item
 
-    def db_insert(self, cursor: Any, item: Any) -> Any:
-        alter_item = ReuseOperation.reshape_item(item)
+    def db_insert(self, cursor: Any, alter_item: AlterItem) -> Any:
         if not (new_item := alter_item.new_item):
             return
 
         sql = self._get_sql_by_item(table=alter_item.table.name, item=new_item)
         cursor.execute(sql, tuple(new_item.values()))
-        return item
+        return alter_item
 
     def handle_error(self, failure: Failure, item: Any) -> None:
         self.slog.error(f"插入数据失败:{failure}, item: {item}")
+
+    def close_spider(self, spider: AyuSpider) -> None:
+        self._record_sql_cache_stats(spider)
@@ -1,6 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
 from typing import TYPE_CHECKING, Any
 
 import scrapy
@@ -9,6 +14,7 @@ from scrapy.utils.defer import maybe_deferred_to_future
 from scrapy.utils.python import to_bytes
 
 from ayugespidertools.common.multiplexing import ReuseOperation
+from ayugespidertools.common.uploadindex import UploadIndex
 from ayugespidertools.common.utils import Tools
 from ayugespidertools.extras.oss import AliOssBase
 from ayugespidertools.items import DataItem
@@ -16,25 +22,47 @@ from ayugespidertools.items import DataItem
 __all__ = [
     "AyuAsyncOssPipeline",
     "files_download_by_scrapy",
+    "get_file_guid",
+    "get_filename",
 ]
 
 if TYPE_CHECKING:
     from scrapy.http.response import Response
+    from scrapy.statscollectors import StatsCollector
 
     from ayugespidertools.common.typevars import AlterItem, OssConf
     from ayugespidertools.spiders import AyuSpider
 
 
-async def files_download_by_scrapy(spider: AyuSpider, url: str) -> tuple[Response, str]:
-    request = scrapy.Request(url, callback=NO_CALLBACK)
+def get_file_guid(url: str) -> str:
+    """获取文件链接对应的文件名（不含后缀）"""
+    return hashlib.sha1(to_bytes(url)).hexdigest()
+
+
+def get_filename(url: str, content_type: str | None) -> str:
+    """根据文件链接及其 Content-Type 获取存储的文件名
+
+    Args:
+        url: 文件链接
+        content_type: 文件响应的 Content-Type，没有时按 application/octet-stream 处理
+
+    Returns:
+        1). 文件名，比如 sha1(url).jpg
+    """
+    content_type = content_type or "application/octet-stream"
+    file_format = content_type.split(";")[0].strip().split("/")[-1]
+    return f"{get_file_guid(url)}.{file_format.replace('jpeg', 'jpg')}"
+
+
+async def files_download_by_scrapy(
+    spider: AyuSpider, url: str, meta: dict | None = None
+) -> tuple[Response, str]:
+    request = scrapy.Request(url, callback=NO_CALLBACK, meta=meta)
     response = await maybe_deferred_to_future(spider.crawler.engine.download(request))
     headers_dict = Tools.get_dict_form_scrapy_req_headers(
         scrapy_headers=response.headers
     )
-    content_type = headers_dict.get("Content-Type")
-    file_format = content_type.split("/")[-1].replace("jpeg", "jpg")
-    file_guid = hashlib.sha1(to_bytes(url)).hexdigest()
-    filename = f"{file_guid}.{file_format}"
+    filename = get_filename(url, headers_dict.get("Content-Type"))
     return response, filename
 
 
@@ -42,6 +70,12 @@ class AyuAsyncOssPipeline:
     oss_bucket: AliOssBase
     oss_conf: OssConf
     full_link_enable: bool
+    stats: StatsCollector
+    executor: ThreadPoolExecutor
+    semaphore: asyncio.Semaphore
+    item_concurrency: int
+    upload_index: UploadIndex | None = None
+    head_check: bool = False
 
     def open_spider(self, spider: AyuSpider) -> None:
         assert hasattr(spider, "oss_conf"), "未配置 oss 参数！"
@@ -50,13 +84,126 @@ class AyuAsyncOssPipeline:
         self.oss_bucket = AliOssBase(**oss_conf_dict)
         self.full_link_enable = self.oss_conf.full_link_enable
 
-    async def _upload_process(self, url: str, spider: AyuSpider) -> str:
-        r, filename = await files_download_by_scrapy(spider, url)
-        self.oss_bucket.put_oss(put_bytes=r.body, file=filename)
+        settings = spider.crawler.settings
+        self.stats = spider.crawler.stats
+        # put_oss 及其 retrying 的重试等待都是阻塞的，需要放在线程池中执行
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.getint("OSS_UPLOAD_THREADS", 8),
+            thread_name_prefix=self.__class__.__name__,
+        )
+        self.semaphore = asyncio.Semaphore(
+            settings.getint("OSS_CONCURRENT_UPLOADS", 16)
+        )
+        self.item_concurrency = settings.getint("OSS_CONCURRENT_UPLOADS_PER_ITEM", 4)
+        self._upload_latency_total = 0.0
+
+        if settings.getbool("OSS_UPLOAD_INDEX_ENABLED"):
+            index_path = settings.get("OSS_UPLOAD_INDEX_PATH") or (
+                Path(settings.get("VIT_DIR")) / "oss_upload_index.db"
+            )
+            self.upload_index = UploadIndex(index_path)
+            self.head_check = settings.getbool("OSS_UPLOAD_INDEX_HEAD_CHECK")
+
+    async def _upload_process(
+        self,
+        url: str,
+        spider: AyuSpider,
+        item_semaphore: asyncio.Semaphore | None = None,
+    ) -> str | None:
+        """下载文件并在线程池中上传至 oss，同时受全局及当前 item 的并发数量限制
+
+        Args:
+            url: 文件链接
+            spider: scrapy spider
+            item_semaphore: 当前 item 的并发限制
+
+        Returns:
+            1). 上传后的 oss 文件名或完整链接，响应状态码不为 2xx 时为 None
+        """
+        # 先获取 item 的并发位置，避免等待时占用全局的并发位置
+        async with item_semaphore or asyncio.Semaphore(1):
+            async with self.semaphore:
+                if not (filename := await self._get_uploaded_filename(url)):
+                    r, filename = await files_download_by_scrapy(spider, url)
+                    if not 200 <= r.status < 300:
+                        self.stats.inc_value("oss/upload/failed")
+                        spider.slog.warning(
+                            f"文件下载失败，不上传至 oss，状态码: {r.status}, url: {url}"
+                        )
+                        return None
+
+                    await self._put_oss(r.body, filename)
+                    if self.upload_index is not None:
+                        self.upload_index.set(
+                            get_file_guid(url),
+                            self.oss_bucket.get_object_key(filename),
+                            len(r.body),
+                        )
         if self.full_link_enable:
             filename = self.oss_bucket.get_full_link(filename)
         return filename
 
+    async def _get_uploaded_filename(self, url: str) -> str | None:
+        """从上传索引（及可选的 bucket 查询）中获取已上传的文件名，未上传时返回 None
+
+        Args:
+            url: 文件链接
+
+        Returns:
+            1). 已上传文件的文件名
+        """
+        if self.upload_index is None:
+            return None
+
+        file_guid = get_file_guid(url)
+        object_key_prefix = self.oss_bucket.get_object_key("")
+        if (cached := self.upload_index.get(file_guid)) and cached[0].startswith(
+            object_key_prefix
+        ):
+            self.stats.inc_value("oss/upload_index/hit")
+            return cached[0][len(object_key_prefix) :]
+
+        if self.head_check:
+            loop = asyncio.get_running_loop()
+            found = await loop.run_in_executor(
+                self.executor, self.oss_bucket.find_object, file_guid
+            )
+            if found:
+                self.stats.inc_value("oss/upload_index/bucket_hit")
+                self.upload_index.set(file_guid, *found)
+                return found[0][len(object_key_prefix) :]
+
+        self.stats.inc_value("oss/upload_index/miss")
+        return None
+
+    async def _put_oss(self, put_bytes: bytes, filename: str) -> None:
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self.executor,
+            partial(self.oss_bucket.put_oss, put_bytes=put_bytes, file=filename),
+        )
+        latency_ms = (time.monotonic() - start) * 1000
+        self._upload_latency_total += latency_ms
+        self.stats.inc_value("oss/upload/count")
+        self.stats.inc_value("oss/upload/bytes", len(put_bytes))
+        self.stats.set_value(
+            "oss/upload/latency/avg_ms",
+            round(
+                self._upload_latency_total / self.stats.get_value("oss/upload/count"),
+                2,
+            ),
+        )
+        self.stats.max_value("oss/upload/latency/max_ms", round(latency_ms, 2))
+
+    async def _upload_field(
+        self, value: Any, spider: AyuSpider, item_semaphore: asyncio.Semaphore
+    ) -> str | list | None:
+        """上传单个文件字段，返回为 None 时不添加对应的 oss 字段"""
+        if all([isinstance(value, str), value]):
+            return await self._upload_process(value, spider, item_semaphore)
+        return None
+
     def _add_oss_field(
         self, is_namedtuple: bool, item: Any, key: str, filename: str | list
     ) -> None:
@@ -79,13 +226,23 @@ class AyuAsyncOssPipeline:
             if key.endswith(self.oss_conf.upload_fields_suffix)
         }
         _is_namedtuple = alter_item.is_namedtuple
-        for key, url in file_url_keys.items():
-            if all([isinstance(url, str), url]):
-                filename = await self._upload_process(url, spider)
+        item_semaphore = asyncio.Semaphore(self.item_concurrency)
+        filenames = await asyncio.gather(
+            *(
+                self._upload_field(url, spider, item_semaphore)
+                for url in file_url_keys.values()
+            )
+        )
+        for key, filename in zip(file_url_keys, filenames):
+            if filename:
                 self._add_oss_field(_is_namedtuple, item, key, filename)
 
     async def process_item(self, item: Any, spider: AyuSpider) -> Any:
-        item_dict = ReuseOperation.item_to_dict(item)
-        alter_item = ReuseOperation.reshape_item(item_dict)
+        alter_item = ReuseOperation.get_alter_item(item, spider.crawler.stats)
         await self._upload_file(alter_item, item, spider)
         return item
+
+    def close_spider(self, spider: AyuSpider) -> None:
+        self.executor.shutdown(wait=True)
+        if self.upload_index is not None:
+            self.upload_index.close()
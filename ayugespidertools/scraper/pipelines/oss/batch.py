@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from typing import TYPE_CHECKING, Any
 
 from ayugespidertools.extras.oss import AliOssBase
@@ -10,7 +11,7 @@ __all__ = [
 ]
 
 if TYPE_CHECKING:
-    from ayugespidertools.common.typevars import AlterItem, OssConf
+    from ayugespidertools.common.typevars import OssConf
     from ayugespidertools.spiders import AyuSpider
 
 
@@ -21,26 +22,17 @@ class AyuAsyncOssBatchPipeline(AyuAsyncOssPipeline):
     oss_conf: OssConf
     full_link_enable: bool
 
-    async def _upload_file(self, alter_item: AlterItem, item: Any, spider: AyuSpider):
-        if not (new_item := alter_item.new_item):
-            return
-
-        file_url_keys = {
-            key: value
-            for key, value in new_item.items()
-            if key.endswith(self.oss_conf.upload_fields_suffix)
-        }
-        _is_namedtuple = alter_item.is_namedtuple
-        for key, value in file_url_keys.items():
-            if all([isinstance(value, str), value]):
-                filename = await self._upload_process(value, spider)
-                self._add_oss_field(_is_namedtuple, item, key, filename)
-
-            elif isinstance(value, list):
-                filename_lst = []
-                for curr_val in value:
-                    if all([isinstance(curr_val, str), curr_val]):
-                        filename = await self._upload_process(curr_val, spider)
-                        filename_lst.append(filename)
-                if filename_lst:
-                    self._add_oss_field(_is_namedtuple, item, key, filename_lst)
+    async def _upload_field(
+        self, value: Any, spider: AyuSpider, item_semaphore: asyncio.Semaphore
+    ) -> str | list | None:
+        if isinstance(value, list):
+            filename_lst = await asyncio.gather(
+                *(
+                    self._upload_process(curr_val, spider, item_semaphore)
+                    for curr_val in value
+                    if all([isinstance(curr_val, str), curr_val])
+                )
+            )
+            # 下载失败的文件不会上传，也不记录在列表中
+            return [filename for filename in filename_lst if filename] or None
+        return await super()._upload_field(value, spider, item_semaphore)
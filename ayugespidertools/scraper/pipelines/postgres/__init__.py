@@ -23,13 +23,14 @@ class AyuPostgresPipeline(PostgreSQLPipeEnhanceMixin):
 
     def open_spider(self, spider: AyuSpider) -> None:
         assert hasattr(spider, "postgres_conf"), "未配置 PostgreSQL 连接信息！"
+        self._open_sql_cache_stats()
         self.slog = spider.slog
+        self._create_tables(spider)
         self.conn = self._connect(spider.postgres_conf)
         self.cursor = self.conn.cursor()
 
     def process_item(self, item: Any, spider: AyuSpider) -> Any:
-        item_dict = ReuseOperation.item_to_dict(item)
-        alter_item = ReuseOperation.reshape_item(item_dict)
+        alter_item = ReuseOperation.get_alter_item(item, spider.crawler.stats)
         self.insert_item(alter_item)
         return item
 
@@ -63,5 +64,6 @@ class AyuPostgresPipeline(PostgreSQLPipeEnhanceMixin):
             return self.insert_item(alter_item)
 
     def close_spider(self, spider: AyuSpider) -> None:
+        self._record_sql_cache_stats(spider)
         self.cursor.close()
         self.conn.close()
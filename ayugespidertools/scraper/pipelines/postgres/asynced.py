@@ -6,6 +6,10 @@ from scrapy.utils.defer import deferred_from_coro
 
 from ayugespidertools.common.expend import PostgreSQLPipeEnhanceMixin
 from ayugespidertools.common.multiplexing import ReuseOperation
+from ayugespidertools.common.postgreserrhandle import (
+    AsyncioAsynchronous,
+    deal_postgres_err,
+)
 
 try:
     from psycopg_pool import AsyncConnectionPool
@@ -20,17 +24,21 @@ __all__ = [
 if TYPE_CHECKING:
     from twisted.internet.defer import Deferred
 
-    from ayugespidertools.common.typevars import PostgreSQLConf
+    from ayugespidertools.common.typevars import AlterItem, PostgreSQLConf, slogT
     from ayugespidertools.spiders import AyuSpider
 
 
 class AyuAsyncPostgresPipeline(PostgreSQLPipeEnhanceMixin):
     postgres_conf: PostgreSQLConf
     pool: AsyncConnectionPool
+    slog: slogT
 
     def open_spider(self, spider: AyuSpider) -> Deferred:
         assert hasattr(spider, "postgres_conf"), "未配置 PostgreSQL 连接信息！"
+        self._open_sql_cache_stats()
         self.postgres_conf = spider.postgres_conf
+        self.slog = spider.slog
+        self._create_tables(spider)
         return deferred_from_coro(self._open_spider(spider))
 
     async def _open_spider(self, spider: AyuSpider) -> None:
@@ -45,16 +53,41 @@ class AyuAsyncPostgresPipeline(PostgreSQLPipeEnhanceMixin):
         await self.pool.open()
 
     async def process_item(self, item: Any, spider: AyuSpider) -> Any:
-        async with self.pool.connection() as conn:
-            item_dict = ReuseOperation.item_to_dict(item)
-            alter_item = ReuseOperation.reshape_item(item_dict)
-            new_item = alter_item.new_item
-            sql = self._get_sql_by_item(table=alter_item.table.name, item=new_item)
-            await conn.execute(sql, tuple(new_item.values()))
+        alter_item = ReuseOperation.get_alter_item(item, spider.crawler.stats)
+        await self.insert_item(alter_item)
         return item
 
-    async def _close_spider(self) -> None:
+    async def insert_item(self, alter_item: AlterItem) -> None:
+        if not (new_item := alter_item.new_item):
+            return
+
+        _table_name = alter_item.table.name
+        sql = self._get_sql_by_item(table=_table_name, item=new_item)
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                try:
+                    await cursor.execute(sql, tuple(new_item.values()))
+                    await conn.commit()
+                    return
+                except Exception as e:
+                    self.slog.warning(
+                        f"Pipe Warn: {e} & Table: {_table_name} & Item: {new_item}"
+                    )
+                    await conn.rollback()
+                    await deal_postgres_err(
+                        AsyncioAsynchronous(),
+                        err_msg=str(e),
+                        conn=conn,
+                        cursor=cursor,
+                        table=_table_name,
+                        table_notes=alter_item.table.notes,
+                        note_dic=alter_item.notes_dic,
+                    )
+        return await self.insert_item(alter_item)
+
+    async def _close_spider(self, spider: AyuSpider) -> None:
+        self._record_sql_cache_stats(spider)
         await self.pool.close()
 
     def close_spider(self, spider: AyuSpider) -> Deferred:
-        return deferred_from_coro(self._close_spider())
+        return deferred_from_coro(self._close_spider(spider))
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Any
+
+from twisted.internet import task
+from twisted.internet.defer import Deferred
+
+from ayugespidertools.common.buffer import BatchBuffer
+from ayugespidertools.common.multiplexing import ReuseOperation
+from ayugespidertools.common.postgreserrhandle import (
+    AsyncioAsynchronous,
+    Synchronize,
+    deal_postgres_err,
+)
+from ayugespidertools.scraper.pipelines.postgres import AyuPostgresPipeline
+from ayugespidertools.scraper.pipelines.postgres.asynced import (
+    AyuAsyncPostgresPipeline,
+)
+
+__all__ = [
+    "AyuPostgresBulkPipeline",
+    "AyuAsyncPostgresBulkPipeline",
+]
+
+if TYPE_CHECKING:
+    from ayugespidertools.common.typevars import AlterItem, slogT
+    from ayugespidertools.spiders import AyuSpider
+
+    BulkKeyT = tuple[str, tuple[str, ...]]
+
+
+def _get_buffer(spider: AyuSpider) -> BatchBuffer:
+    settings = spider.crawler.settings
+    return BatchBuffer(
+        size=max(settings.getint("POSTGRES_BATCH_SIZE", 1000), 1),
+        interval=settings.getfloat("POSTGRES_BATCH_INTERVAL", 5),
+    )
+
+
+def _get_key(alter_item: AlterItem) -> BulkKeyT:
+    return alter_item.table.name, tuple(alter_item.new_item.keys())
+
+
+class AyuPostgresBulkPipeline(AyuPostgresPipeline):
+    """按数据表及字段缓存 item，通过 COPY ... FROM STDIN 批量写入 postgresql"""
+
+    buffer: BatchBuffer
+    flush_task: task.LoopingCall | None = None
+
+    def open_spider(self, spider: AyuSpider) -> None:
+        super().open_spider(spider)
+        self.buffer = _get_buffer(spider)
+        if self.buffer.interval > 0:
+            self.flush_task = task.LoopingCall(self._flush_expired)
+            self.flush_task.start(self.buffer.interval, now=False)
+
+    def process_item(self, item: Any, spider: AyuSpider) -> Any:
+        alter_item = ReuseOperation.get_alter_item(item, spider.crawler.stats)
+        if not alter_item.new_item:
+            return item
+
+        key = _get_key(alter_item)
+        if self.buffer.add(key, alter_item):
+            self.write_batch(key, self.buffer.pop(key))
+        return item
+
+    def write_batch(self, key: BulkKeyT, alter_items: list[AlterItem]) -> None:
+        """批量写入数据，异常只记录日志，不会抛出至触发写入的 item 或定时任务中"""
+        try:
+            self.copy_batch(key, alter_items)
+        except Exception as e:
+            _log_batch_failure(self.slog, e, key, alter_items)
+
+    def copy_batch(self, key: BulkKeyT, alter_items: list[AlterItem]) -> None:
+        """通过 COPY 批量写入同一数据表且字段相同的数据
+
+        Args:
+            key: 数据表名及字段名组成的分组标识
+            alter_items: 经过转变后的 item 列表
+        """
+        if not alter_items:
+            return
+
+        _table_name, keys = key
+        sql = self._get_copy_sql_by_keys(table=_table_name, keys=keys)
+        try:
+            with self.cursor.copy(sql) as copy:
+                for alter_item in alter_items:
+                    copy.write_row(tuple(alter_item.new_item.values()))
+            self.conn.commit()
+        except Exception as e:
+            self.slog.warning(
+                f"Pipe Warn: {e} & Table: {_table_name} & Rows: {len(alter_items)}"
+            )
+            self.conn.rollback()
+            note_dic = {}
+            for alter_item in alter_items:
+                note_dic.update(alter_item.notes_dic)
+            try:
+                deal_postgres_err(
+                    Synchronize(),
+                    err_msg=str(e),
+                    conn=self.conn,
+                    cursor=self.cursor,
+                    table=_table_name,
+                    table_notes=alter_items[0].table.notes,
+                    note_dic=note_dic,
+                )
+            except Exception:
+                # 不是数据表或字段缺失的问题，则逐条插入，避免整批数据丢失
+                return _insert_one_by_one(self.slog, self.insert_item, alter_items)
+            return self.copy_batch(key, alter_items)
+
+    def _flush_expired(self) -> None:
+        for key in self.buffer.expired_keys():
+            self.write_batch(key, self.buffer.pop(key))
+
+    def flush(self) -> None:
+        """将缓存中的所有数据批量写入"""
+        for key in self.buffer.keys():
+            self.write_batch(key, self.buffer.pop(key))
+
+    def close_spider(self, spider: AyuSpider) -> None:
+        if self.flush_task is not None and self.flush_task.running:
+            self.flush_task.stop()
+        try:
+            self.flush()
+        finally:
+            super().close_spider(spider)
+
+
+def _log_batch_failure(
+    slog: slogT, e: Exception, key: BulkKeyT, alter_items: list[AlterItem]
+) -> None:
+    slog.error(f"批量写入数据失败: {e}, table: {key[0]}, rows: {len(alter_items)}")
+
+
+def _insert_one_by_one(slog: slogT, insert_item, alter_items: list[AlterItem]):
+    for alter_item in alter_items:
+        try:
+            insert_item(alter_item)
+        except Exception as e:
+            slog.error(f"插入数据失败: {e}, item: {alter_item.new_item}")
+
+
+class AyuAsyncPostgresBulkPipeline(AyuAsyncPostgresPipeline):
+    """AyuPostgresBulkPipeline 的 asyncio 版本，使用 AsyncConnectionPool 执行 COPY"""
+
+    buffer: BatchBuffer
+    flush_task: task.LoopingCall | None = None
+    # 定时任务中正在执行的写入，关闭时需要等待其完成后再关闭连接池
+    flush_future: asyncio.Future | None = None
+
+    def open_spider(self, spider: AyuSpider) -> Deferred:
+        self.buffer = _get_buffer(spider)
+        return super().open_spider(spider)
+
+    async def _open_spider(self, spider: AyuSpider) -> None:
+        await super()._open_spider(spider)
+        if self.buffer.interval > 0:
+            self.flush_task = task.LoopingCall(self._start_flush_expired)
+            self.flush_task.start(self.buffer.interval, now=False)
+
+    def _start_flush_expired(self) -> Deferred:
+        self.flush_future = asyncio.ensure_future(self._flush_expired())
+        return Deferred.fromFuture(self.flush_future)
+
+    async def process_item(self, item: Any, spider: AyuSpider) -> Any:
+        alter_item = ReuseOperation.get_alter_item(item, spider.crawler.stats)
+        if not alter_item.new_item:
+            return item
+
+        key = _get_key(alter_item)
+        if self.buffer.add(key, alter_item):
+            await self.write_batch(key, self.buffer.pop(key))
+        return item
+
+    async def write_batch(self, key: BulkKeyT, alter_items: list[AlterItem]) -> None:
+        """批量写入数据，异常只记录日志，不会抛出至触发写入的 item 或定时任务中"""
+        try:
+            await self.copy_batch(key, alter_items)
+        except Exception as e:
+            _log_batch_failure(self.slog, e, key, alter_items)
+
+    async def copy_batch(self, key: BulkKeyT, alter_items: list[AlterItem]) -> None:
+        """通过 COPY 批量写入同一数据表且字段相同的数据
+
+        Args:
+            key: 数据表名及字段名组成的分组标识
+            alter_items: 经过转变后的 item 列表
+        """
+        if not alter_items:
+            return
+
+        _table_name, keys = key
+        sql = self._get_copy_sql_by_keys(table=_table_name, keys=keys)
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                try:
+                    async with cursor.copy(sql) as copy:
+                        for alter_item in alter_items:
+                            await copy.write_row(tuple(alter_item.new_item.values()))
+                    await conn.commit()
+                    return
+                except Exception as e:
+                    self.slog.warning(
+                        f"Pipe Warn: {e} & Table: {_table_name} & Rows: {len(alter_items)}"
+                    )
+                    await conn.rollback()
+                    note_dic = {}
+                    for alter_item in alter_items:
+                        note_dic.update(alter_item.notes_dic)
+                    try:
+                        await deal_postgres_err(
+                            AsyncioAsynchronous(),
+                            err_msg=str(e),
+                            conn=conn,
+                            cursor=cursor,
+                            table=_table_name,
+                            table_notes=alter_items[0].table.notes,
+                            note_dic=note_dic,
+                        )
+                    except Exception:
+                        repaired = False
+                    else:
+                        repaired = True
+
+        if repaired:
+            return await self.copy_batch(key, alter_items)
+        # 不是数据表或字段缺失的问题，则逐条插入，避免整批数据丢失
+        for alter_item in alter_items:
+            try:
+                await self.insert_item(alter_item)
+            except Exception as e:
+                self.slog.error(f"插入数据失败: {e}, item: {alter_item.new_item}")
+
+    async def _flush_expired(self) -> None:
+        for key in self.buffer.expired_keys():
+            await self.write_batch(key, self.buffer.pop(key))
+
+    async def flush(self) -> None:
+        """将缓存中的所有数据批量写入"""
+        for key in self.buffer.keys():
+            await self.write_batch(key, self.buffer.pop(key))
+
+    async def _close_spider(self, spider: AyuSpider) -> None:
+        try:
+            if self.flush_future is not None:
+                await self.flush_future
+            await self.flush()
+        finally:
+            await super()._close_spider(spider)
+
+    def close_spider(self, spider: AyuSpider) -> Deferred:
+        if self.flush_task is not None and self.flush_task.running:
+            self.flush_task.stop()
+        return super().close_spider(spider)
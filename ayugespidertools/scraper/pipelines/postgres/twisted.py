@@ -16,7 +16,7 @@ __all__ = ["AyuTwistedPostgresPipeline"]
 if TYPE_CHECKING:
     from twisted.python.failure import Failure
 
-    from ayugespidertools.common.typevars import PostgreSQLConf, slogT
+    from ayugespidertools.common.typevars import AlterItem, PostgreSQLConf, slogT
     from ayugespidertools.spiders import AyuSpider
 
 
@@ -27,9 +27,11 @@ class AyuTwistedPostgresPipeline(PostgreSQLPipeEnhanceMixin):
 
     def open_spider(self, spider: AyuSpider) -> None:
         assert hasattr(spider, "postgres_conf"), "未配置 PostgreSQL 连接信息"
+        self._open_sql_cache_stats()
         self.slog = spider.slog
         self.postgres_conf = spider.postgres_conf
         self._connect(self.postgres_conf).close()
+        self._create_tables(spider)
 
         _postgres_conf = {
             "user": self.postgres_conf.user,
@@ -50,13 +52,12 @@ class AyuTwistedPostgresPipeline(PostgreSQLPipeEnhanceMixin):
         self.slog.error(f"创建数据表失败: {failure}")
 
     def process_item(self, item: Any, spider: AyuSpider) -> Any:
-        item_dict = ReuseOperation.item_to_dict(item)
-        query = self.dbpool.runInteraction(self.db_insert, item_dict)
+        alter_item = ReuseOperation.get_alter_item(item, spider.crawler.stats)
+        query = self.dbpool.runInteraction(self.db_insert, alter_item)
         query.addErrback(self.handle_error, item)
         return item
 
-    def db_insert(self, cursor: Any, item: Any) -> Any:
-        alter_item = ReuseOperation.reshape_item(item)
+    def db_insert(self, cursor: Any, alter_item: AlterItem) -> Any:
         if not (new_item := alter_item.new_item):
             return
 
@@ -81,8 +82,11 @@ class AyuTwistedPostgresPipeline(PostgreSQLPipeEnhanceMixin):
                 table_notes=_table_notes,
                 note_dic=note_dic,
             )
-            return self.db_insert(cursor, item)
-        return item
+            return self.db_insert(cursor, alter_item)
+        return alter_item
 
     def handle_error(self, failure: Failure, item: Any) -> None:
         self.slog.error(f"插入数据失败:{failure}, item: {item}")
+
+    def close_spider(self, spider: AyuSpider) -> None:
+        self._record_sql_cache_stats(spider)
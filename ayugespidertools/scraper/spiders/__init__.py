@@ -28,6 +28,8 @@ __all__ = [
 ]
 
 if TYPE_CHECKING:
+    from collections.abc import Sequence
+
     from elasticsearch import Elasticsearch
     from scrapy.crawler import Crawler
     from scrapy.settings import BaseSettings
@@ -46,6 +48,7 @@ if TYPE_CHECKING:
         OracleConf,
         OssConf,
         PostgreSQLConf,
+        TableSchema,
         slogT,
     )
 
@@ -71,6 +74,9 @@ class AyuSpider(Spider):
     exclusiveproxy_conf: ExclusiveProxyConf
     oss_conf: OssConf
 
+    # mysql, postgresql, oracle pipelines 会在 open_spider 时根据此数据表结构一次性创建或迁移数据表
+    table_schemas: Sequence[TableSchema] = ()
+
     SPIDER_TIME: str = time.strftime("%Y-%m-%d", time.localtime())
 
     @property
@@ -0,0 +1,106 @@
+"""AyuItem 的内存占用及操作速度基准测试，与之前基于 dataclass 实例属性的实现对比
+
+Usage:
+    在仓库根目录下运行: python -m benchmarks.bench_items [-n 100000] [--fields 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import timeit
+import tracemalloc
+from collections.abc import Iterator, MutableMapping
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from ayugespidertools.items import AyuItem
+
+
+@dataclass
+class LegacyAyuItem(MutableMapping):
+    """之前的 AyuItem 实现：字段存储在实例 __dict__ 中，并额外用 set 记录字段名"""
+
+    def __init__(self, _table, _mongo_update_rule=None, **kwargs) -> None:
+        self.__fields = set()
+        if _table:
+            self.__fields.add("_table")
+            setattr(self, "_table", _table)
+        if _mongo_update_rule:
+            self.__fields.add("_mongo_update_rule")
+            setattr(self, "_mongo_update_rule", _mongo_update_rule)
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+            self.__fields.add(key)
+
+    def __getitem__(self, key: str) -> Any:
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        setattr(self, key, value)
+        self.__fields.add(key)
+
+    def __delitem__(self, key: str) -> None:
+        delattr(self, key)
+        self.__fields.discard(key)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        self.__fields.add(name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__fields)
+
+    def __len__(self) -> int:
+        return len(self.__fields)
+
+    def asdict(self) -> dict[str, Any]:
+        self.__fields.discard("_LegacyAyuItem__fields")
+        return {key: getattr(self, key) for key in self.__fields}
+
+
+def _make_kwargs(fields: int) -> dict[str, Any]:
+    return {f"field_{i}": f"value_{i}" for i in range(fields)}
+
+
+def measure_memory(cls: type, n: int, fields: int) -> float:
+    """创建 n 个 item 所占用的内存，单位为字节/个"""
+    kwargs = _make_kwargs(fields)
+    gc.collect()
+    tracemalloc.start()
+    items = [cls(_table="demo", **kwargs) for _ in range(n)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return current / n
+
+
+def measure_ops(func: Callable[[], Any], n: int) -> float:
+    """重复执行 func，返回每秒的执行次数"""
+    return n / min(timeit.repeat(func, number=n, repeat=3))
+
+
+def run(n: int, fields: int) -> None:
+    kwargs = _make_kwargs(fields)
+    print(f"{n} items, {fields + 1} fields each")
+    print(
+        f"{'':<14}{'bytes/item':>12}{'create/s':>14}{'getitem/s':>14}{'asdict/s':>14}"
+    )
+    for cls in (LegacyAyuItem, AyuItem):
+        item = cls(_table="demo", **kwargs)
+        memory = measure_memory(cls, n, fields)
+        create = measure_ops(lambda: cls(_table="demo", **kwargs), n)
+        getitem = measure_ops(lambda: item["field_0"], n)
+        asdict = measure_ops(item.asdict, n)
+        print(
+            f"{cls.__name__:<14}{memory:>12.0f}{create:>14.0f}{getitem:>14.0f}"
+            f"{asdict:>14.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=100000, help="item 数量")
+    parser.add_argument("--fields", type=int, default=10, help="每个 item 的字段数")
+    args = parser.parse_args()
+    run(args.n, args.fields)
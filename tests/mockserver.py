@@ -242,6 +242,13 @@ class ArbitraryLengthPayloadResource(LeafResource):
         return request.content.read()
 
 
+class Bytes(LeafResource):
+    def render_GET(self, request):
+        n = getarg(request, b"n", 1024, type=int)
+        request.setHeader(b"Content-Type", b"application/octet-stream")
+        return bytes(i % 256 for i in range(n))
+
+
 class Root(resource.Resource):
     def __init__(self):
         resource.Resource.__init__(self)
@@ -258,6 +265,7 @@ class Root(resource.Resource):
             resource.EncodingResourceWrapper(PayloadResource(), [GzipEncoderFactory()]),
         )
         self.putChild(b"alpayload", ArbitraryLengthPayloadResource())
+        self.putChild(b"bytes", Bytes())
         try:
             from tests import tests_datadir
 
@@ -1,8 +1,10 @@
 import json
 
+from scrapy import Request
 from scrapy.http.response.text import TextResponse
 
 from ayugespidertools import AiohttpRequest
+from ayugespidertools.items import AyuItem
 from ayugespidertools.spiders import AyuSpider
 from tests.conftest import article_list_table
 
@@ -52,6 +54,101 @@ class RecordLogToMysqlSpider(SimpleSpider):
         self.logger.info(f"Got response {response.status}")
 
 
+class FilesDownloadSpider(SimpleSpider):
+    name = "files_download"
+    custom_settings = {
+        "ITEM_PIPELINES": {
+            "ayugespidertools.pipelines.FilesDownloadPipeline": 300,
+        },
+        "FILES_STREAM_THRESHOLD": 4096,
+    }
+
+    def parse(self, response):
+        yield AyuItem(
+            small_file_url=self.mockserver.url("/bytes?n=1000"),
+            large_file_url=self.mockserver.url("/bytes?n=100000"),
+            missing_file_url=self.mockserver.url("/status?n=404"),
+            _table="files",
+        )
+
+
+class AiohttpMockSpider(SimpleSpider):
+    custom_settings = {
+        "DOWNLOADER_MIDDLEWARES": {
+            "ayugespidertools.middlewares.AiohttpDownloaderMiddleware": 543,
+        },
+        "AIOHTTP_CONFIG": {"retry_backoff_base": 0.01},
+    }
+
+
+class AiohttpResponseSpider(AiohttpMockSpider):
+    name = "aiohttp_response"
+
+    def start_requests(self):
+        yield AiohttpRequest(self.mockserver.url("/bytes?n=300"))
+        yield AiohttpRequest(self.mockserver.url("/echo"), headers={"X-Test": "1"})
+
+    def parse(self, response):
+        yield {
+            "url": response.url,
+            "cls": type(response).__name__,
+            "content_type": response.headers.get("Content-Type"),
+            "body": response.body,
+        }
+
+
+class AiohttpRetrySpider(AiohttpMockSpider):
+    name = "aiohttp_retry"
+    custom_settings = {
+        **AiohttpMockSpider.custom_settings,
+        "AIOHTTP_CONFIG": {"retry_times": 2, "retry_backoff_base": 0.01},
+    }
+
+    def start_requests(self):
+        yield AiohttpRequest(self.mockserver.url("/status?n=503"))
+
+
+class AiohttpHandlerSpider(AiohttpResponseSpider):
+    name = "aiohttp_handler"
+    custom_settings = {
+        "DOWNLOAD_HANDLERS": {
+            "http": "ayugespidertools.handlers.AiohttpDownloadHandler",
+        },
+    }
+
+    def start_requests(self):
+        yield Request(self.mockserver.url("/redirect-to?goto=/bytes?n=300"))
+        yield Request(
+            self.mockserver.url("/echo"),
+            method="POST",
+            headers={"X-Test": "1"},
+            body=b"payload",
+        )
+
+
+class AiohttpStreamSpider(AiohttpMockSpider):
+    name = "aiohttp_stream"
+
+    def start_requests(self):
+        yield AiohttpRequest(self.mockserver.url("/bytes?n=200000"), stream_to=True)
+        yield AiohttpRequest(
+            self.mockserver.url("/bytes?n=5000"),
+            stream_to=True,
+            stream_max_size=1000,
+            errback=self.errback,
+        )
+
+    def parse(self, response):
+        yield {
+            "stream": response.meta["aiohttp_stream"],
+            "flags": response.flags,
+            "body": response.body,
+        }
+
+    def errback(self, failure):
+        yield {"error": failure.type.__name__}
+
+
 class Operations:
     """项目依赖方法"""
 
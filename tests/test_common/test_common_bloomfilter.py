@@ -0,0 +1,75 @@
+import pytest
+from scrapy import Spider, signals
+from scrapy.exceptions import DropItem
+from scrapy.utils.test import get_crawler
+
+from ayugespidertools.common.bloomfilter import (
+    BloomFilter,
+    ScalableBloomFilter,
+    get_bloom_hash,
+)
+from ayugespidertools.items import AyuItem
+from ayugespidertools.pipelines import AyuBloomDedupPipeline
+
+
+def test_bloom_filter_persist(tmp_path):
+    path = tmp_path / "0.bloom"
+    bf = BloomFilter(path, capacity=1000, error_rate=0.01)
+    h = get_bloom_hash("a")
+    assert not bf.contains(*h)
+    bf.add(*h)
+    assert bf.contains(*h)
+    bf.close()
+
+    # 重新打开时使用文件中记录的参数，忽略传入的参数
+    bf = BloomFilter(path, capacity=0, error_rate=0)
+    assert (bf.capacity, bf.error_rate, bf.count) == (1000, 0.01, 1)
+    assert bf.contains(*h)
+    bf.close()
+
+
+def test_scalable_bloom_filter(tmp_path):
+    bf = ScalableBloomFilter(tmp_path, capacity=1000, error_rate=0.01)
+    # 添加时也可能误判为已存在，此时不会重复添加
+    seen = sum(bf.add(f"k{i}") for i in range(5000))
+    assert seen / 5000 < 0.01
+    assert all(bf.add(f"k{i}") for i in range(5000))
+    assert len(bf) == 5000 - seen
+    assert len(bf.filters) == 3
+
+    misses = sum(f"x{i}" in bf for i in range(10000))
+    assert misses / 10000 < 0.01
+    assert 0 < bf.fp_rate < 0.01
+    bf.close()
+
+
+def test_bloom_dedup_pipeline(tmp_path):
+    crawler = get_crawler(
+        Spider, {"DEDUP_KEYS": {"demo": "url"}, "DEDUP_BLOOM_DIR": str(tmp_path)}
+    )
+    spider = crawler._create_spider("test")
+    crawler.stats.open_spider(spider)
+    pipe = AyuBloomDedupPipeline.from_crawler(crawler)
+    pipe.open_spider(spider)
+
+    def send(signal, item):
+        crawler.signals.send_catch_log(signal, item=item, spider=spider)
+
+    first = AyuItem(url="a", _table="demo")
+    assert pipe.process_item(first, spider) is first
+    # 处理中的重复 item 同样会被丢弃
+    with pytest.raises(DropItem):
+        pipe.process_item(AyuItem(url="a", _table="demo"), spider)
+
+    # 存储出错的 item 不会被记录
+    send(signals.item_error, first)
+    second = AyuItem(url="a", _table="demo")
+    assert pipe.process_item(second, spider) is second
+    send(signals.item_scraped, second)
+    with pytest.raises(DropItem):
+        pipe.process_item(AyuItem(url="a", _table="demo"), spider)
+
+    pipe.close_spider(spider)
+    assert pipe.pending == {}
+    assert crawler.stats.get_value("dedup/dropped/demo") == 2
+    assert crawler.stats.get_value("dedup/count/demo") == 1
@@ -0,0 +1,32 @@
+import time
+
+from ayugespidertools.common.buffer import BatchBuffer
+
+
+def test_batch_buffer_size():
+    buffer = BatchBuffer(size=2)
+    assert buffer.add(("t", ("a",)), 1) is False
+    assert buffer.add(("t", ("b",)), 2) is False
+    assert buffer.add(("t", ("a",)), 3) is True
+    assert len(buffer) == 3
+    assert buffer.pop(("t", ("a",))) == [1, 3]
+    assert buffer.keys() == [("t", ("b",))]
+    assert buffer.pop("no_this_key") == []
+
+
+def test_batch_buffer_interval():
+    buffer = BatchBuffer(size=10, interval=0.01)
+    buffer.add("t", 1)
+    assert buffer.expired_keys() == []
+    time.sleep(0.02)
+    assert buffer.expired_keys() == ["t"]
+
+    assert BatchBuffer(size=10).expired_keys() == []
+
+
+def test_batch_buffer_max_bytes():
+    buffer = BatchBuffer(size=10, max_bytes=100)
+    assert buffer.add("t", 1, nbytes=60) is False
+    assert buffer.add("t", 2, nbytes=60) is True
+    buffer.pop("t")
+    assert buffer.add("t", 3, nbytes=60) is False
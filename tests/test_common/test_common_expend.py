@@ -1,3 +1,7 @@
+from types import SimpleNamespace
+
+from scrapy.utils.test import get_crawler
+
 from ayugespidertools.common.expend import (
     MysqlPipeEnhanceMixin,
     OraclePipeEnhanceMixin,
@@ -32,10 +36,42 @@ class TestDatabasePipeEnhanceMixin:
         )
         assert no_odku_sql == expect_no_odku_sql, args == ("zhangsan", 18)
 
+    def test_mysql_get_batch_sql_by_keys(self):
+        odku_sql = self.mpem._get_batch_sql_by_keys(self._table, self._item.keys())
+        assert odku_sql == (
+            "INSERT INTO `demo_one` (`nick_name`, `age`) values (%s, %s) ON DUPLICATE"
+            " KEY UPDATE  `nick_name` = VALUES(`nick_name`), `age` = VALUES(`age`)"
+        )
+        no_odku_sql = self.mpem._get_batch_sql_by_keys(
+            self._table, self._item.keys(), False
+        )
+        assert no_odku_sql == (
+            "INSERT INTO `demo_one` (`nick_name`, `age`) values (%s, %s)"
+        )
+
+    def test_sql_cache_stats(self):
+        crawler = get_crawler()
+        spider = SimpleNamespace(crawler=crawler)
+        self.mpem._get_sql_by_item("demo_cache", self._item)
+        # 只记录 open_spider 之后的缓存命中情况
+        self.mpem._open_sql_cache_stats()
+        sql, args = self.mpem._get_sql_by_item("demo_cache", self._item, False)
+        assert args == ("zhangsan", 18)
+        sql, args = self.mpem._get_sql_by_item("demo_cache", self._item)
+        assert args == ("zhangsan", 18, "zhangsan", 18)
+        self.mpem._record_sql_cache_stats(spider)
+        assert crawler.stats.get_value("sql_cache/hits") == 1
+        assert crawler.stats.get_value("sql_cache/misses") == 1
+        assert crawler.stats.get_value("sql_cache/currsize") >= 2
+
     def test_postgresql_get_sql_by_item(self):
         sql = self.ppem._get_sql_by_item(self._table, self._item)
         assert sql == "INSERT INTO demo_one (nick_name, age) values (%s, %s);"
 
+    def test_postgresql_get_copy_sql_by_keys(self):
+        sql = self.ppem._get_copy_sql_by_keys(self._table, self._item.keys())
+        assert sql == "COPY demo_one (nick_name, age) FROM STDIN"
+
     def test_oracle_get_sql_by_item(self):
         sql = self.opem._get_sql_by_item(self._table, self._item)
         assert (
@@ -0,0 +1,77 @@
+from collections import Counter
+
+from scrapy import Request, Spider
+from scrapy.downloadermiddlewares.defaultheaders import DefaultHeadersMiddleware
+from scrapy.utils.test import get_crawler
+
+from ayugespidertools.common.headerprofile import (
+    AliasTable,
+    HeaderProfiles,
+    build_header_profile,
+    load_header_profiles,
+)
+from ayugespidertools.middlewares import RandomRequestUaMiddleware
+
+_edge_ua = (
+    "Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/121.0.0.0 Mobile Safari/537.36 Edg/121.0.0.0"
+)
+
+
+def test_alias_table():
+    table = AliasTable([1, 3])
+    counter = Counter(table.sample() for _ in range(20000))
+    assert 0.7 < counter[1] / 20000 < 0.8
+
+
+def test_build_header_profile():
+    headers = dict(build_header_profile("edge", _edge_ua))
+    assert headers["User-Agent"] == _edge_ua
+    assert '"Microsoft Edge";v="121"' in headers["sec-ch-ua"]
+    assert headers["sec-ch-ua-mobile"] == "?1"
+    assert headers["sec-ch-ua-platform"] == '"Android"'
+
+    safari_ua = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) Safari/604.1"
+    headers = dict(build_header_profile("safari", safari_ua))
+    assert set(headers) == {"User-Agent", "Accept", "Accept-Language"}
+
+
+def test_header_profiles():
+    profiles = HeaderProfiles(
+        {"chrome": ["Chrome/1", "Chrome/1"], "firefox": ["Firefox/1"], "edge": []},
+        {"chrome": 1, "firefox": 0, "edge": 1},
+    )
+    assert len(profiles) == 1
+    assert dict(profiles.sample())["User-Agent"] == "Chrome/1"
+
+    weights = (("chrome", 1), ("safari", 1))
+    assert load_header_profiles(weights) is load_header_profiles(weights)
+
+
+def test_random_request_ua_middleware():
+    crawler = get_crawler(
+        Spider,
+        {"HEADER_PROFILE_WEIGHTS": {"safari": 1}, "HEADER_PROFILE_STICKY_REQUESTS": 2},
+    )
+    spider = crawler._create_spider("test")
+    default_mw = DefaultHeadersMiddleware.from_crawler(crawler)
+    mw = RandomRequestUaMiddleware.from_crawler(crawler)
+
+    def send(request):
+        # 与 scrapy 内置的 DefaultHeadersMiddleware 一起使用，其先于本中间件执行
+        default_mw.process_request(request, spider)
+        mw.process_request(request, spider)
+        return request
+
+    first = send(Request("http://example.com/1"))
+    profile = dict(mw.sticky["example.com"][0])
+    # DEFAULT_REQUEST_HEADERS 的默认值被替换为请求头配置中的值
+    for name in ("User-Agent", "Accept", "Accept-Language"):
+        assert first.headers[name] == profile[name].encode()
+
+    # 手动设置的请求头不会被替换
+    second = send(Request("http://example.com/2", headers={"Accept-Language": "zh"}))
+    assert second.headers["Accept-Language"] == b"zh"
+    assert second.headers["User-Agent"] == profile["User-Agent"].encode()
+    # 使用次数用完后删除此分组的记录
+    assert "example.com" not in mw.sticky
@@ -1,8 +1,24 @@
+import threading
+from unittest import mock
+
 import pytest
+from pymongo import InsertOne, UpdateOne
+from scrapy import Spider
+from scrapy.utils.test import get_crawler
+from twisted.internet import defer
+from twisted.trial.unittest import TestCase
 
-from ayugespidertools.common.mongodbpipe import Synchronize, mongodb_pipe
+from ayugespidertools.common.buffer import BatchBuffer
+from ayugespidertools.common.mongodbpipe import (
+    Synchronize,
+    mongodb_pipe,
+    record_mongodb_bulk_stats,
+)
 from ayugespidertools.common.multiplexing import ReuseOperation
+from ayugespidertools.common.typevars import MongoDBConf
 from ayugespidertools.items import AyuItem, DataItem
+from ayugespidertools.mongoclient import MongoDbBase
+from ayugespidertools.pipelines import AyuFtyMongoPipeline, AyuTwistedMongoPipeline
 from tests.conftest import mongodb_database, test_table
 
 
@@ -110,3 +126,72 @@ class TestMongoDBPipe:
             {"article_detail_url": "_article_detail_url"}
         )
         assert num >= 2
+
+
+def test_buffer_item_template():
+    buffer = BatchBuffer(size=2)
+    sync = Synchronize()
+    assert sync.buffer_item_template({"_table": "t", "a": 1}, buffer) is None
+    item_dict = {"_table": "t", "a": 2, "_mongo_update_rule": {"a": 2}}
+    assert sync.buffer_item_template(item_dict, buffer) == "t"
+    assert buffer.pop("t") == [
+        InsertOne({"a": 1}),
+        UpdateOne({"a": 2}, {"$set": {"a": 2}}, upsert=True),
+    ]
+
+
+def test_record_mongodb_bulk_stats():
+    stats = get_crawler().stats
+    details = {"nInserted": 3, "nUpserted": 1, "writeErrors": [{"errmsg": "dup"}]}
+    record_mongodb_bulk_stats(stats, "t", details)
+    assert stats.get_value("mongo/bulk/batches") == 1
+    assert stats.get_value("mongo/bulk/inserted") == 3
+    assert stats.get_value("mongo/bulk/upserted") == 1
+    assert stats.get_value("mongo/bulk/errors") == 1
+
+
+def test_fty_mongo_flush_failure():
+    pipe = AyuFtyMongoPipeline()
+    pipe.conn = mock.Mock()
+    pipe.buffer = BatchBuffer(size=10)
+    pipe.buffer.add("a", InsertOne({"a": 1}))
+    pipe.buffer.add("b", InsertOne({"b": 1}))
+    # 某个集合写入失败时不影响其它集合，链接仍会关闭
+    with mock.patch.object(
+        pipe, "bulk_write", side_effect=[Exception("a"), None]
+    ) as bulk_write:
+        pipe.close_spider(None)
+    assert [x.args[0] for x in bulk_write.call_args_list] == ["a", "b"]
+    pipe.conn.close.assert_called_once()
+
+
+class TestTwistedMongoPipeline(TestCase):
+    timeout = 10
+
+    @defer.inlineCallbacks
+    def test_write_window(self):
+        crawler = get_crawler(Spider, {"MONGODB_MAX_PENDING_WRITES": 2})
+        spider = crawler._create_spider("test")
+        spider.mongodb_conf = MongoDBConf()
+        crawler.stats.open_spider(spider)
+        pipe = AyuTwistedMongoPipeline()
+        with mock.patch.object(
+            MongoDbBase, "connects", return_value=(mock.Mock(), mock.Mock())
+        ):
+            pipe.open_spider(spider)
+
+        event = threading.Event()
+        submitted = [pipe.run_write(event.wait, 5) for _ in range(3)]
+        # 只有前两个写入提交至线程池，第三个需要等待有写入完成
+        self.assertEqual([d.called for d in submitted], [True, True, False])
+        self.assertEqual(len(pipe.pending_writes), 2)
+        self.assertEqual(crawler.stats.get_value("mongo/queue_depth"), 3)
+
+        event.set()
+        yield submitted[2]
+        # close_spider 会等待所有已提交的写入完成
+        yield pipe.close_spider(spider)
+        self.assertEqual(pipe.pending_writes, set())
+        self.assertEqual(crawler.stats.get_value("mongo/writes"), 3)
+        self.assertEqual(crawler.stats.get_value("mongo/queue_depth"), 0)
+        self.assertEqual(crawler.stats.get_value("mongo/queue_depth/max"), 3)
@@ -2,6 +2,7 @@ import copy
 from typing import NamedTuple
 
 import scrapy
+from scrapy.utils.test import get_crawler
 
 from ayugespidertools.common.multiplexing import ReuseOperation
 from ayugespidertools.common.typevars import AlterItemTable
@@ -90,6 +91,29 @@ def test_reshape_item():
     )
 
 
+def test_get_alter_item():
+    stats = get_crawler().stats
+    item = AyuItem(_table="t", url="u")
+    alter_item = ReuseOperation.get_alter_item(item, stats)
+    assert alter_item.new_item == {"url": "u"}
+    assert ReuseOperation.get_alter_item(item, stats) is alter_item
+    assert ReuseOperation.item_to_dict(item, stats) is ReuseOperation.item_to_dict(item)
+    # 每次调用只记录一次，生成 alter_item 时内部的 dict 转换不计入
+    assert stats.get_value("item_view/hit") == 2
+    assert stats.get_value("item_view/miss") == 1
+
+    # 修改字段后重新生成，之前的结果不受影响
+    item["name"] = "n"
+    assert ReuseOperation.get_alter_item(item, stats).new_item == {
+        "url": "u",
+        "name": "n",
+    }
+    assert alter_item.new_item == {"url": "u"}
+
+    res = ReuseOperation.get_alter_item({"_table": "t", "url": "u"}, stats)
+    assert res.new_item == {"url": "u"}
+
+
 def test_is_namedtuple_instance():
     class Demo(NamedTuple):
         host: str
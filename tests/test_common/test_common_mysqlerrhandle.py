@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from ayugespidertools.common.buffer import BatchBuffer
+from ayugespidertools.common.mysqlerrhandle import (
+    AsyncioAsynchronous,
+    Synchronize,
+    TwistedAsynchronous,
+    deal_mysql_err,
+    prepare_mysql_columns,
+)
+from ayugespidertools.common.typevars import AlterItem, AlterItemTable, MysqlConf
+from ayugespidertools.pipelines import AyuFtyMysqlPipeline
+
+
+def test_get_add_columns_sql():
+    sql = Synchronize()._get_add_columns_sql(
+        table="demo_one",
+        columns=["nick_name", "age"],
+        note_dic={"nick_name": "昵称", "age": "年龄"},
+    )
+    assert sql == (
+        "ALTER TABLE `demo_one` ADD COLUMN `nick_name` VARCHAR(255) NULL DEFAULT ''"
+        " COMMENT '昵称', ADD COLUMN `age` VARCHAR(255) NULL DEFAULT '' COMMENT '年龄';"
+    )
+
+
+def test_deal_1054_error():
+    sql, _ = Synchronize().deal_1054_error(
+        err_msg="(1054, \"Unknown column 'age' in 'field list'\")",
+        table="demo_one",
+        note_dic={"nick_name": "昵称", "age": "年龄"},
+    )
+    assert sql == (
+        "ALTER TABLE `demo_one` ADD COLUMN `age` VARCHAR(255) NULL DEFAULT ''"
+        " COMMENT '年龄';"
+    )
+
+
+def test_asyncio_deal_1406_error():
+    class FakeCursor:
+        def __init__(self):
+            self.sqls = []
+
+        async def execute(self, sql):
+            self.sqls.append(sql)
+
+        async def fetchall(self):
+            return [{"COLUMN_TYPE": "text"}]
+
+    cursor = FakeCursor()
+    # asyncio.run 会重置当前的事件循环，影响之后使用 asyncio reactor 的测试
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(
+        deal_mysql_err(
+            AsyncioAsynchronous(),
+            err_msg="(1406, \"Data too long for column 'age' at row 1\")",
+            cursor=cursor,
+            mysql_conf=SimpleNamespace(database="demo"),
+            table="demo_one",
+            table_notes="",
+            note_dic={"age": "年龄"},
+        )
+    )
+    loop.close()
+    assert cursor.sqls[-1] == (
+        "ALTER TABLE `demo_one` CHANGE COLUMN `age` `age` LONGTEXT NULL DEFAULT NULL"
+        " COMMENT '年龄';"
+    )
+
+
+def test_mysql_write_batch_fallback():
+    pipe = AyuFtyMysqlPipeline()
+    pipe.slog = mock.Mock()
+    pipe.buffer = BatchBuffer(size=2, interval=0)
+    alter_items = [
+        AlterItem({"age": i}, {}, AlterItemTable("demo_one")) for i in range(2)
+    ]
+    # 达到数量的批量插入失败时改为逐条插入，异常不会抛出至触发插入的 item 中
+    with mock.patch.object(
+        pipe, "insert_batch", side_effect=Exception("batch")
+    ), mock.patch.object(
+        pipe, "insert_item", side_effect=[None, Exception("row")]
+    ) as insert_item:
+        for alter_item in alter_items:
+            pipe.buffer_item(alter_item)
+    assert [x.args[0] for x in insert_item.call_args_list] == alter_items
+    assert pipe.slog.error.call_count == 2
+    assert not pipe.buffer
+
+
+def test_prepare_columns_threads():
+    class FakeCursor:
+        def __init__(self):
+            self.sqls = []
+
+        def execute(self, sql):
+            self.sqls.append(sql)
+            # 放大线程同时检查及执行 DDL 的时间窗口
+            time.sleep(0.01)
+
+        def fetchall(self):
+            return [{"column_name": "ID", "column_type": "int(32)"}]
+
+    cursor = FakeCursor()
+    columns_cache, columns_locks = {}, {}
+    mysql_conf = MysqlConf("localhost", 3306, "root", "", "test")
+
+    def prepare():
+        prepare_mysql_columns(
+            TwistedAsynchronous(),
+            cursor=cursor,
+            mysql_conf=mysql_conf,
+            table="demo",
+            table_notes="",
+            note_dic={"id": "", "Name": "名称"},
+            columns_cache=columns_cache,
+            columns_locks=columns_locks,
+        )
+
+    threads = [threading.Thread(target=prepare) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # 多个线程只查询一次字段信息，只添加一次缺失的字段，之后更新字段缓存
+    assert [sql.split()[0] for sql in cursor.sqls] == ["select", "ALTER"]
+    assert columns_cache["demo"] == {"id": "int(32)", "name": "varchar(255)"}
+    prepare()
+    assert len(cursor.sqls) == 2
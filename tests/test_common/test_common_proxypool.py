@@ -0,0 +1,159 @@
+import asyncio
+
+from scrapy import Request, Spider, signals
+from scrapy.core.downloader.middleware import DownloaderMiddlewareManager
+from scrapy.http import Response
+from scrapy.utils.defer import deferred_from_coro
+from scrapy.utils.test import get_crawler
+from twisted.internet import defer
+from twisted.trial.unittest import TestCase
+
+from ayugespidertools.common.proxypool import ProxyPool, get_basic_auth
+from ayugespidertools.scraper.middlewares.proxy.exclusive import (
+    ExclusiveProxyDownloaderMiddleware,
+)
+
+
+def test_get_basic_auth():
+    assert get_basic_auth("user", "pwd") == "Basic dXNlcjpwd2Q="
+
+
+def test_proxy_pool_update():
+    pool = ProxyPool()
+    assert pool.update(["a:1", "b:1", "a:1"]) == (2, 0)
+    state = pool.get()
+    assert state.urls["https"] == f"https://{state.proxy}"
+    # 已有代理保留其状态
+    assert pool.update(["a:1", "c:1"]) == (1, 1)
+    assert set(pool.proxies) == {"a:1", "c:1"}
+    if state.proxy == "a:1":
+        assert pool.proxies["a:1"] is state
+
+
+def test_proxy_pool_score_and_evict():
+    pool = ProxyPool(min_health=0.3)
+    pool.update(["fast:1", "slow:1"])
+    pool.release(pool.proxies["fast:1"], latency=0.1)
+    pool.release(pool.proxies["slow:1"], latency=2)
+    assert pool.get().proxy == "fast:1"
+
+    bad = pool.proxies["fast:1"]
+    evicted = [pool.release(bad, ok=False) for _ in range(4)]
+    assert evicted == [False, False, False, True]
+    assert set(pool.proxies) == {"slow:1"}
+    # 刷新后被淘汰的代理会重新加入
+    assert pool.update(["fast:1", "slow:1"]) == (1, 0)
+
+
+async def _acquire_wait():
+    pool = ProxyPool(max_concurrency=1)
+    pool.update(["a:1"])
+    first = await pool.acquire()
+    waiting = asyncio.ensure_future(pool.acquire())
+    await asyncio.sleep(0)
+    assert not waiting.done()
+    pool.release(first, latency=0.1)
+    assert (await waiting) is first
+    assert first.active == 1
+
+    pool.release(first, ok=False)
+    empty = ProxyPool()
+    assert await empty.acquire() is None
+
+
+class TestExclusiveProxyPool(TestCase):
+    """重试及重定向返回新请求时，本中间件的 process_response 不会被调用，代理也需要归还"""
+
+    timeout = 5
+
+    def setUp(self):
+        self.crawler = get_crawler(
+            Spider,
+            {
+                "DOWNLOADER_MIDDLEWARES_BASE": {
+                    "scrapy.downloadermiddlewares.retry.RetryMiddleware": 550,
+                    "scrapy.downloadermiddlewares.redirect.RedirectMiddleware": 600,
+                    "scrapy.downloadermiddlewares.httpproxy.HttpProxyMiddleware": 750,
+                },
+                "DOWNLOADER_MIDDLEWARES": {
+                    "ayugespidertools.middlewares.ExclusiveProxyDownloaderMiddleware": 125,
+                },
+                "PROXY_POOL_MAX_CONCURRENCY": 1,
+                "RETRY_TIMES": 2,
+            },
+        )
+        self.spider = self.crawler._create_spider("test")
+        self.crawler.stats.open_spider(self.spider)
+        self.manager = DownloaderMiddlewareManager.from_crawler(self.crawler)
+        self.mw = next(
+            mw
+            for mw in self.manager.middlewares
+            if isinstance(mw, ExclusiveProxyDownloaderMiddleware)
+        )
+        self.mw.pool.update(["a:1"])
+        self.mw.next_refresh = float("inf")
+        self.mw.proxy_auth = get_basic_auth("user", "pwd")
+        self.sent = []
+
+    @defer.inlineCallbacks
+    def _fetch(self, request, results):
+        """模拟 engine 及 Downloader：下载时发送 response_downloaded，返回新请求时重新下载"""
+
+        def download_func(request, spider):
+            self.sent.append(
+                (request.meta.get("proxy"), request.headers.get("Proxy-Authorization"))
+            )
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                return defer.fail(result)
+            response = Response(request.url, request=request, **result)
+            self.crawler.signals.send_catch_log(
+                signal=signals.response_downloaded,
+                response=response,
+                request=request,
+                spider=spider,
+            )
+            return defer.succeed(response)
+
+        while True:
+            result = yield self.manager.download(download_func, request, self.spider)
+            if not isinstance(result, Request):
+                return result
+            request = result
+
+    def test_proxy_pool_acquire_wait(self):
+        # asyncio.run 会重置当前的事件循环，需要在 reactor 中运行
+        return deferred_from_coro(_acquire_wait())
+
+    @defer.inlineCallbacks
+    def test_retry_and_redirect(self):
+        state = self.mw.pool.proxies["a:1"]
+        response = yield self._fetch(
+            Request("http://example.com/"),
+            [
+                {"status": 429},
+                TimeoutError(),
+                {"status": 302, "headers": {"Location": "/next"}},
+                {"status": 200},
+            ],
+        )
+        self.assertEqual(response.url, "http://example.com/next")
+        self.assertEqual(state.active, 0)
+        self.assertEqual(self.crawler.stats.get_value("proxy_pool/banned"), 1)
+        self.assertEqual(self.crawler.stats.get_value("proxy_pool/error"), 1)
+        # 被封禁及异常的请求会降低代理评分
+        self.assertLess(state.health, 1)
+
+    @defer.inlineCallbacks
+    def test_retry_with_other_proxy(self):
+        self.mw.pool.update(["a:1", "b:1"])
+        response = yield self._fetch(
+            Request("http://example.com/"), [{"status": 429}, {"status": 200}]
+        )
+        self.assertEqual(response.status, 200)
+        (first, first_auth), (second, second_auth) = self.sent
+        self.assertNotEqual(first, second)
+        # 换用其它代理重试时，HttpProxyMiddleware 不会删除 Proxy-Authorization
+        auth = get_basic_auth("user", "pwd").encode()
+        self.assertEqual(first_auth, auth)
+        self.assertEqual(second_auth, auth)
@@ -0,0 +1,42 @@
+from scrapy.utils.test import get_crawler
+
+from ayugespidertools.common.ratelimit import (
+    RateLimiter,
+    TokenBucket,
+    record_ratelimit_wait,
+)
+
+
+def test_token_bucket_reserve():
+    bucket = TokenBucket(rate=10, burst=1)
+    assert bucket.reserve() == 0
+    # 令牌不足时预支，之后的请求依次错开等待
+    first = bucket.reserve()
+    second = bucket.reserve()
+    assert 0 < first <= 0.1
+    assert first < second <= 0.2
+
+
+def test_rate_limiter_overrides():
+    limiter = RateLimiter(rate=1, burst=2, overrides={"a.com": 5, "b.com": [10, 3]})
+    assert limiter.get_rate("www.a.com") == (5, 2)
+    assert limiter.get_rate("b.com") == (10, 3)
+    assert limiter.get_rate("c.com") == (1, 2)
+    assert limiter.reserve("c.com") == 0
+    assert limiter.reserve("c.com") == 0
+    assert limiter.reserve("c.com") > 0
+
+    limiter = RateLimiter(rate=0, overrides={"a.com": 1})
+    assert all(limiter.reserve("c.com") == 0 for _ in range(10))
+    assert limiter.reserve("a.com") == 0
+    assert limiter.reserve("a.com") > 0
+
+
+def test_record_ratelimit_wait():
+    stats = get_crawler().stats
+    record_ratelimit_wait(stats, 0.1)
+    record_ratelimit_wait(stats, 0.3)
+    assert stats.get_value("ratelimit/delayed") == 2
+    assert stats.get_value("ratelimit/wait/avg_ms") == 200
+    assert stats.get_value("ratelimit/wait/max_ms") == 300
+    assert stats.get_value("ratelimit/wait/last_ms") == 300
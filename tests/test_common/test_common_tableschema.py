@@ -0,0 +1,157 @@
+from unittest import mock
+
+from ayugespidertools.common.tableschema import (
+    apply_mysql_schema,
+    apply_table_schemas,
+    get_mysql_schema_sql,
+    get_oracle_schema_sql,
+    get_postgres_schema_sql,
+)
+from ayugespidertools.common.typevars import MysqlConf
+from ayugespidertools.items import Column, TableSchema
+
+schema = TableSchema(
+    "demo_one",
+    {
+        "title": Column("varchar", 512, "标题"),
+        "content": "longtext",
+        "url": Column(unique=True, notes="链接"),
+    },
+    notes="示例表",
+    indexes=(("title", "url"),),
+)
+
+
+def test_get_mysql_create_sql():
+    sql = get_mysql_schema_sql(schema, columns={}, indexes=set())
+    assert sql == [
+        "CREATE TABLE IF NOT EXISTS `demo_one` ("
+        "`id` int(32) NOT NULL AUTO_INCREMENT COMMENT 'id', "
+        "`title` VARCHAR(512) NULL DEFAULT NULL COMMENT '标题', "
+        "`content` LONGTEXT NULL DEFAULT NULL COMMENT '', "
+        "`url` VARCHAR(255) NULL DEFAULT NULL COMMENT '链接', "
+        "PRIMARY KEY (`id`), "
+        "UNIQUE INDEX `uk_demo_one_url` (`url`), "
+        "INDEX `idx_demo_one_title_url` (`title`, `url`)) "
+        "ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci "
+        "COMMENT='示例表';"
+    ]
+
+
+def test_get_mysql_alter_sql():
+    # 已有的字段类型一致时不修改，所有变动合并到一条 ALTER TABLE 中
+    sql = get_mysql_schema_sql(
+        schema,
+        columns={"id": "int(32)", "title": "varchar(255)", "url": "varchar(255)"},
+        indexes={"PRIMARY", "uk_demo_one_url"},
+    )
+    assert sql == [
+        "ALTER TABLE `demo_one` "
+        "MODIFY COLUMN `title` VARCHAR(512) NULL DEFAULT NULL COMMENT '标题', "
+        "ADD COLUMN `content` LONGTEXT NULL DEFAULT NULL COMMENT '', "
+        "ADD INDEX `idx_demo_one_title_url` (`title`, `url`);"
+    ]
+
+
+def test_get_schema_sql_only_widen():
+    # 声明的类型更窄或类别不同时不修改，只记录警告日志
+    columns = {"title": "text", "content": "longtext", "url": "varchar(255)"}
+    narrow = TableSchema(
+        "demo_one",
+        {"title": Column(length=64), "content": "text", "url": "int"},
+    )
+    with mock.patch("ayugespidertools.common.tableschema.logger") as log:
+        assert get_mysql_schema_sql(narrow, columns, {"PRIMARY"}) == []
+        assert log.warning.call_count == 3
+
+    pg_columns = {"title": "text", "content": "bigint", "url": "integer"}
+    with mock.patch("ayugespidertools.common.tableschema.logger") as log:
+        sql = get_postgres_schema_sql(
+            TableSchema(
+                "demo_one", {"title": "varchar", "content": "int", "url": "bigint"}
+            ),
+            pg_columns,
+        )
+        assert sql == [
+            "ALTER TABLE demo_one ALTER COLUMN url TYPE bigint USING url::bigint;"
+        ]
+        assert log.warning.call_count == 2
+
+
+def test_get_postgres_schema_sql():
+    sql = get_postgres_schema_sql(schema, columns={})
+    assert sql[:2] == [
+        "CREATE TABLE IF NOT EXISTS demo_one (id SERIAL NOT NULL PRIMARY KEY, "
+        "title character varying(512), content text, url character varying(255));",
+        "COMMENT ON TABLE demo_one IS '示例表';",
+    ]
+    assert "CREATE UNIQUE INDEX IF NOT EXISTS uk_demo_one_url ON demo_one (url);" in sql
+
+    sql = get_postgres_schema_sql(
+        schema,
+        columns={
+            "id": "integer",
+            "title": "character varying(512)",
+            "content": "character varying(255)",
+        },
+    )
+    assert sql[:2] == [
+        "ALTER TABLE demo_one ALTER COLUMN content TYPE text USING content::text, "
+        "ADD COLUMN IF NOT EXISTS url character varying(255);",
+        "COMMENT ON COLUMN demo_one.url IS '链接';",
+    ]
+
+
+def test_get_oracle_schema_sql():
+    sql = get_oracle_schema_sql(schema, columns={}, indexes=set())
+    assert sql[0] == (
+        'CREATE TABLE "demo_one" ("id" NUMBER GENERATED BY DEFAULT AS IDENTITY'
+        ' PRIMARY KEY, "title" VARCHAR2(512 CHAR), "content" CLOB,'
+        ' "url" VARCHAR2(255 CHAR))'
+    )
+    assert sql[-1] == (
+        'CREATE INDEX "idx_demo_one_title_url" ON "demo_one" ("title", "url")'
+    )
+
+
+def test_apply_mysql_schema():
+    class FakeCursor:
+        def __init__(self):
+            self.sqls = []
+            self.lines = []
+
+        def execute(self, sql, args=None):
+            self.sqls.append(sql)
+            if "information_schema.columns" in sql:
+                self.lines = [{"COLUMN_NAME": "ID", "COLUMN_TYPE": "int(32)"}]
+            elif "information_schema.statistics" in sql:
+                self.lines = [("PRIMARY",)]
+
+        def fetchall(self):
+            return self.lines
+
+        def close(self):
+            pass
+
+    class FakeConn:
+        def __init__(self):
+            self.cursor_ = FakeCursor()
+            self.commits = 0
+
+        def cursor(self):
+            return self.cursor_
+
+        def commit(self):
+            self.commits += 1
+
+    conn = FakeConn()
+    mysql_conf = MysqlConf("localhost", 3306, "root", "", "test")
+    apply_table_schemas(
+        conn,
+        [schema],
+        lambda cursor, x: apply_mysql_schema(cursor, mysql_conf, x),
+    )
+    assert conn.commits == 1
+    assert conn.cursor_.sqls[-1].startswith(
+        "ALTER TABLE `demo_one` ADD COLUMN `title` VARCHAR(512)"
+    )
@@ -0,0 +1,15 @@
+from ayugespidertools.common.uploadindex import UploadIndex
+
+
+def test_upload_index_persistence(tmp_path):
+    path = tmp_path / "oss_upload_index.db"
+    index = UploadIndex(path)
+    assert index.get("abc") is None
+    index.set("abc", "img/abc.jpg", 1024)
+    index.set("abc", "img/abc.png", 2048)
+    index.close()
+
+    index = UploadIndex(path)
+    assert index.get("abc") == ("img/abc.png", 2048)
+    assert len(index) == 1
+    index.close()
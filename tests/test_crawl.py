@@ -1,3 +1,8 @@
+import hashlib
+import json
+from pathlib import Path
+from urllib.parse import urlparse
+
 from scrapy import signals
 from scrapy.spiders import Spider
 from scrapy.utils.test import get_crawler
@@ -9,7 +14,15 @@ from ayugespidertools.scraper.spiders import AyuSpider
 from tests import tests_vitdir
 from tests.conftest import script_coll_table, table_coll_table
 from tests.mockserver import MockServer
-from tests.spiders import DemoAiohttpSpider, RecordLogToMysqlSpider
+from tests.spiders import (
+    AiohttpHandlerSpider,
+    AiohttpResponseSpider,
+    AiohttpRetrySpider,
+    AiohttpStreamSpider,
+    DemoAiohttpSpider,
+    FilesDownloadSpider,
+    RecordLogToMysqlSpider,
+)
 
 
 class TestCrawl(TestCase):
@@ -24,7 +37,7 @@ class TestCrawl(TestCase):
         self.mockserver.__exit__(None, None, None)
 
     @defer.inlineCallbacks
-    def _run_spider(self, spider_cls):
+    def _run_spider(self, spider_cls, settings=None):
         items = []
 
         def _on_item_scraped(item):
@@ -34,6 +47,7 @@ class TestCrawl(TestCase):
             "VIT_DIR": tests_vitdir,
             "TWISTED_REACTOR": "twisted.internet.asyncioreactor.AsyncioSelectorReactor",
             "FEED_EXPORT_ENCODING": "utf-8",
+            **(settings or {}),
         }
         crawler = get_crawler(spider_cls, project_settings)
         crawler.signals.connect(_on_item_scraped, signals.item_scraped)
@@ -57,6 +71,84 @@ class TestCrawl(TestCase):
         self.assertIn("get meta_data: ", str(log))
         self.assertIn("post first meta_data: ", str(log))
 
+    @defer.inlineCallbacks
+    def test_files_download(self):
+        """测试 FilesDownloadPipeline 的文件下载，流式写入及非 2xx 响应的处理"""
+        files_store = Path(self.mktemp())
+        _, items, stats = yield self._run_spider(
+            FilesDownloadSpider, {"FILES_STORE": str(files_store)}
+        )
+        item = items[0]
+        small = files_store / item["small_file_url_local"]
+        large = files_store / item["large_file_url_local"]
+        self.assertEqual(small.read_bytes(), bytes(i % 256 for i in range(1000)))
+        self.assertEqual(
+            hashlib.md5(large.read_bytes()).hexdigest(),
+            hashlib.md5(bytes(i % 256 for i in range(100000))).hexdigest(),
+        )
+        self.assertEqual(small.suffix, ".octet-stream")
+        # 非 2xx 的响应不会写入文件，也不会添加对应的字段
+        self.assertNotIn("missing_file_url_local", item)
+        self.assertEqual(stats.get_value("files/downloaded"), 2)
+        self.assertEqual(stats.get_value("files/streamed"), 1)
+        self.assertEqual(stats.get_value("files/failed"), 1)
+        self.assertEqual(stats.get_value("files/bytes"), 101000)
+
+    @defer.inlineCallbacks
+    def test_aiohttp_response(self):
+        """测试 AiohttpDownloaderMiddleware 使用原始 bytes 及响应头构建 scrapy Response"""
+        _, items, _ = yield self._run_spider(AiohttpResponseSpider)
+        items = {urlparse(item["url"]).path: item for item in items}
+        binary = items["/bytes"]
+        # 非文本的响应内容原样保留，并根据 Content-Type 选择 Response 类型
+        self.assertEqual(binary["cls"], "Response")
+        self.assertEqual(binary["content_type"], b"application/octet-stream")
+        self.assertEqual(binary["body"], bytes(i % 256 for i in range(300)))
+        echo = json.loads(items["/echo"]["body"])
+        self.assertEqual(echo["headers"]["X-Test"], ["1"])
+
+    @defer.inlineCallbacks
+    def test_aiohttp_retry(self):
+        """测试 AiohttpDownloaderMiddleware 在当前协程中原地重试，不再由 RetryMiddleware 重试"""
+        _, _, stats = yield self._run_spider(AiohttpRetrySpider)
+        self.assertEqual(stats.get_value("retry/count"), 2)
+        self.assertEqual(
+            stats.get_value("retry/reason_count/503 Service Unavailable"), 2
+        )
+        self.assertEqual(stats.get_value("retry/max_reached"), 1)
+        # 只有最后一次的响应交给 scrapy 处理
+        self.assertEqual(stats.get_value("downloader/response_status_count/503"), 1)
+
+    @defer.inlineCallbacks
+    def test_aiohttp_download_handler(self):
+        """测试 AiohttpDownloadHandler 下载的请求仍经过 scrapy 的中间件（比如重定向）"""
+        _, items, stats = yield self._run_spider(AiohttpHandlerSpider)
+        items = {urlparse(item["url"]).path: item for item in items}
+        binary = items["/bytes"]
+        self.assertEqual(binary["cls"], "Response")
+        self.assertEqual(binary["body"], bytes(i % 256 for i in range(300)))
+        self.assertEqual(stats.get_value("downloader/response_status_count/302"), 1)
+        echo = json.loads(items["/echo"]["body"])
+        self.assertEqual(echo["headers"]["X-Test"], ["1"])
+        self.assertEqual(echo["body"], "payload")
+
+    @defer.inlineCallbacks
+    def test_aiohttp_stream(self):
+        """测试 AiohttpRequest 流式下载的文件大小，hash 及 stream_max_size 限制"""
+        _, items, _ = yield self._run_spider(AiohttpStreamSpider)
+        streamed, ignored = sorted(items, key=lambda x: "error" in x)
+        stream = streamed["stream"]
+        path = Path(stream.path)
+        self.addCleanup(path.unlink)
+        content = bytes(i % 256 for i in range(200000))
+        self.assertEqual(path.read_bytes(), content)
+        self.assertEqual(stream.size, 200000)
+        self.assertEqual(stream.hash, hashlib.sha256(content).hexdigest())
+        self.assertEqual(streamed["flags"], ["streamed"])
+        self.assertEqual(streamed["body"], b"")
+        # 超过 stream_max_size 时放弃此请求
+        self.assertEqual(ignored["error"], "IgnoreRequest")
+
 
 def test_table_exists(mysql_db_cursor):
     """检测目标数据表是否已存在，这是 test_from_crawler_record_log_to_mysql 测试的结果判断。
@@ -1,5 +1,8 @@
 # NOTE: 虽然目前 AyuItem 支持 item["field"], item.field 两种方式来操作 field，
 # 但还是推荐使用 item["field"] 的方式，更明了。
+import copy
+import pickle
+
 import pytest
 from itemadapter import ItemAdapter
 from itemloaders.processors import TakeFirst
@@ -174,3 +177,21 @@ def test_empty_key_error():
 def test_field_already_exists_error():
     with pytest.raises(FieldAlreadyExistsError):
         cur_item.add_field("title", "title")
+
+
+def test_items_pickle_and_copy():
+    item = AyuItem(title=DataItem("t", "标题"), tags=["a"], _table="table")
+    view, _ = item.get_view("dict", AyuItem.asdict)
+    restored = pickle.loads(pickle.dumps(item))
+    assert type(restored) is AyuItem
+    assert restored.asdict() == item.asdict()
+    # 缓存的视图不会被序列化，重建后重新生成
+    assert restored.get_view("dict", AyuItem.asdict) == (view, False)
+    assert not hasattr(restored, "__dict__")
+
+    copied = copy.deepcopy(item)
+    copied["tags"].append("b")
+    copied.add_field("url", "u")
+    assert item["tags"] == ["a"]
+    assert "url" not in item
+    assert copy.copy(item).asdict() == item.asdict()
@@ -0,0 +1,422 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+import aiohttp
+from pika.exceptions import NackError
+from scrapy import Request, Spider
+from scrapy.http import Response
+from scrapy.utils.defer import deferred_from_coro
+from scrapy.utils.test import get_crawler
+from twisted.internet import defer
+from twisted.trial.unittest import TestCase
+
+from ayugespidertools.common.buffer import BatchBuffer
+from ayugespidertools.common.multiplexing import ReuseOperation
+from ayugespidertools.common.typevars import KafkaConf, MQConf, MysqlConf, OssConf
+from ayugespidertools.items import AyuItem
+from ayugespidertools.pipelines import (
+    AyuAsyncMysqlPipeline,
+    AyuAsyncOssBatchPipeline,
+    AyuAsyncOssPipeline,
+    AyuAsyncPostgresBulkPipeline,
+    AyuKafkaPipeline,
+    AyuPostgresBulkPipeline,
+    AyuTwistedMQPipeline,
+    FilesDownloadPipeline,
+)
+from ayugespidertools.scraper.pipelines.oss.ali import get_filename
+
+
+def _get_spider(settings=None):
+    crawler = get_crawler(Spider, settings)
+    spider = crawler._create_spider("test")
+    crawler.stats.open_spider(spider)
+    return spider
+
+
+def test_twisted_mq_confirm_window():
+    spider = _get_spider({"MQ_CONFIRM_WINDOW": 1, "MQ_PUBLISH_RETRY_TIMES": 1})
+    spider.rabbitmq_conf = MQConf("localhost", 5672, "guest", "guest", queue="q")
+    confirms = []
+
+    def basic_publish(**kwargs):
+        confirms.append(defer.Deferred())
+        return confirms[-1]
+
+    channel = mock.Mock(basic_publish=basic_publish)
+    channel.confirm_delivery.return_value = defer.succeed(None)
+    channel.queue_declare.return_value = defer.succeed(None)
+    conn = mock.Mock(ready=defer.succeed(None))
+    conn.channel.return_value = defer.succeed(channel)
+    pipe = AyuTwistedMQPipeline()
+    with mock.patch(
+        "ayugespidertools.scraper.pipelines.msgproducer.mqpub.protocol.ClientCreator"
+    ) as client_creator:
+        client_creator.return_value.connectTCP.return_value = defer.succeed(conn)
+        pipe.open_spider(spider)
+
+    first = pipe.process_item(AyuItem(a=1, _table="t"), spider)
+    second = pipe.process_item(AyuItem(a=2, _table="t"), spider)
+    # 未确认的消息达到 MQ_CONFIRM_WINDOW 时，之后的 item 需要等待
+    assert first.called and not second.called
+
+    # 被 nack 的消息重新发布时继续占用窗口，确认后才释放
+    confirms[0].errback(NackError([]))
+    assert len(confirms) == 2 and not second.called
+    confirms[1].callback(None)
+    assert second.called
+
+    # 重试次数用完后释放窗口并记录失败
+    confirms[2].errback(NackError([]))
+    confirms[3].errback(NackError([]))
+    assert len(confirms) == 4
+    assert pipe.semaphore.tokens == 1
+    pipe.close_spider(spider)
+    conn.close.assert_called_once()
+
+    stats = spider.crawler.stats
+    assert stats.get_value("rabbitmq/published") == 4
+    assert stats.get_value("rabbitmq/acked") == 1
+    assert stats.get_value("rabbitmq/nacked") == 3
+    assert stats.get_value("rabbitmq/retried") == 2
+    assert stats.get_value("rabbitmq/failed") == 1
+    assert pipe.pending == set()
+
+
+def test_files_stream_failure(tmp_path):
+    spider = _get_spider({"FILES_STORE": str(tmp_path)})
+    spider.slog = mock.Mock()
+    pipe = FilesDownloadPipeline.from_crawler(spider.crawler)
+    pipe.open_spider(spider)
+    resp = mock.Mock(status=503)
+    resp.raise_for_status.side_effect = aiohttp.ClientResponseError(
+        mock.Mock(), (), status=503
+    )
+    pipe.session = mock.Mock()
+    pipe.session.get.return_value.__aenter__ = mock.AsyncMock(return_value=resp)
+    pipe.session.get.return_value.__aexit__ = mock.AsyncMock(return_value=False)
+
+    url = "http://localhost/large"
+    request = Request(
+        url,
+        headers={"Proxy-Authorization": "Basic dXNlcjpwd2Q=", "X-Test": "1"},
+        meta={"proxy": "http://127.0.0.1:8080"},
+    )
+    response = Response(url, request=request, flags=["download_stopped"])
+    loop = asyncio.new_event_loop()
+    try:
+        path = loop.run_until_complete(
+            pipe._stream_to_file(response, url, tmp_path / "ab", spider)
+        )
+    finally:
+        loop.close()
+
+    # 流式下载失败时只跳过此文件，不会使整个 item 失败
+    assert path is None
+    assert spider.crawler.stats.get_value("files/failed") == 1
+    # Proxy-Authorization 只发送给代理
+    kwargs = pipe.session.get.call_args.kwargs
+    assert "Proxy-Authorization" not in kwargs["headers"]
+    assert kwargs["headers"]["X-Test"] == "1"
+    assert kwargs["proxy_headers"] == {"Proxy-Authorization": "Basic dXNlcjpwd2Q="}
+
+
+def _bulk_items(n):
+    return [ReuseOperation.get_alter_item(AyuItem(a=i, _table="t")) for i in range(n)]
+
+
+def test_postgres_bulk_copy_batch():
+    pipe = AyuPostgresBulkPipeline()
+    pipe.slog, pipe.conn, pipe.cursor = mock.Mock(), mock.Mock(), mock.MagicMock()
+    copy = pipe.cursor.copy.return_value.__enter__.return_value
+    key, items = ("t", ("a",)), _bulk_items(3)
+
+    pipe.write_batch(key, items)
+    pipe.cursor.copy.assert_called_once_with("COPY t (a) FROM STDIN")
+    assert [c.args for c in copy.write_row.call_args_list] == [
+        ((0,),),
+        ((1,),),
+        ((2,),),
+    ]
+    pipe.conn.commit.assert_called_once()
+
+    # 数据表或字段缺失时修复后重新 COPY
+    copy.write_row.reset_mock()
+    copy.write_row.side_effect = [
+        Exception("column a does not exist"),
+        None,
+        None,
+        None,
+    ]
+    deal_path = "ayugespidertools.scraper.pipelines.postgres.bulk.deal_postgres_err"
+    with mock.patch(deal_path) as deal:
+        pipe.write_batch(key, items)
+    deal.assert_called_once()
+    assert copy.write_row.call_count == 4
+    assert pipe.conn.commit.call_count == 2
+    pipe.conn.rollback.assert_called_once()
+
+    # 无法修复时逐条插入，单条失败只记录日志
+    copy.write_row.side_effect = Exception("invalid input syntax")
+    pipe.insert_item = mock.Mock(side_effect=[None, ValueError("a"), None])
+    with mock.patch(deal_path, side_effect=Exception("unknown")):
+        pipe.write_batch(key, items)
+    assert pipe.insert_item.call_count == 3
+    pipe.slog.error.assert_called_once()
+
+
+class TestAsyncPostgresBulkPipeline(TestCase):
+    timeout = 10
+
+    def setUp(self):
+        self.spider = _get_spider()
+        self.calls = []
+        self.pipe = AyuAsyncPostgresBulkPipeline()
+        self.pipe.slog = mock.Mock()
+        self.pipe.pool = mock.MagicMock()
+        self.pipe.pool.close = mock.AsyncMock(
+            side_effect=lambda: self.calls.append("close")
+        )
+        self.conn = mock.MagicMock(commit=mock.AsyncMock(), rollback=mock.AsyncMock())
+        self.copy = mock.MagicMock(write_row=mock.AsyncMock(side_effect=self._write))
+        self._set_async_cm(self.pipe.pool.connection, self.conn)
+        cursor = mock.MagicMock()
+        self._set_async_cm(self.conn.cursor, cursor)
+        self._set_async_cm(cursor.copy, self.copy)
+
+    @staticmethod
+    def _set_async_cm(func, value):
+        func.return_value.__aenter__ = mock.AsyncMock(return_value=value)
+        func.return_value.__aexit__ = mock.AsyncMock(return_value=False)
+
+    async def _write(self, row):
+        await asyncio.sleep(0.01)
+        self.calls.append(row)
+
+    def _fail_once(self):
+        failed = False
+
+        async def write_row(row):
+            nonlocal failed
+            if not failed:
+                failed = True
+                raise Exception("column a does not exist")
+            await self._write(row)
+
+        return write_row
+
+    async def _test_copy_batch(self):
+        key, items = ("t", ("a",)), _bulk_items(2)
+        deal_path = "ayugespidertools.scraper.pipelines.postgres.bulk.deal_postgres_err"
+        # 第一次 COPY 时字段缺失，修复后重新 COPY
+        self.copy.write_row.side_effect = self._fail_once()
+        with mock.patch(deal_path, mock.AsyncMock()) as deal:
+            await self.pipe.write_batch(key, items)
+        deal.assert_awaited_once()
+        assert self.calls == [(0,), (1,)]
+        self.conn.rollback.assert_awaited_once()
+        self.conn.commit.assert_awaited_once()
+
+        # 无法修复时逐条插入
+        self.copy.write_row.side_effect = Exception("invalid input syntax")
+        self.pipe.insert_item = mock.AsyncMock(side_effect=[ValueError("a"), None])
+        with mock.patch(deal_path, mock.AsyncMock(side_effect=Exception("unknown"))):
+            await self.pipe.write_batch(key, items)
+        assert self.pipe.insert_item.await_count == 2
+        self.pipe.slog.error.assert_called_once()
+
+    def test_copy_batch(self):
+        return deferred_from_coro(self._test_copy_batch())
+
+    async def _test_close_waits_for_flush(self):
+        self.pipe.buffer = BatchBuffer(size=10, interval=0.01)
+        for alter_item in _bulk_items(2):
+            self.pipe.buffer.add(("t", ("a",)), alter_item)
+        await asyncio.sleep(0.02)
+        # 定时任务已开始写入，关闭时需要等待其完成后再关闭连接池
+        self.pipe._start_flush_expired()
+        await asyncio.sleep(0)
+        assert len(self.pipe.buffer) == 0
+        await self.pipe._close_spider(self.spider)
+        assert self.calls == [(0,), (1,), "close"]
+
+    def test_close_waits_for_flush(self):
+        return deferred_from_coro(self._test_close_waits_for_flush())
+
+
+class TestKafkaPipeline(TestCase):
+    timeout = 10
+
+    def setUp(self):
+        self.spider = _get_spider({"KAFKA_MAX_IN_FLIGHT": 1})
+        self.spider.kafka_conf = KafkaConf("localhost:9092", "topic", "key")
+        self.pipe = AyuKafkaPipeline()
+        with mock.patch(
+            "ayugespidertools.scraper.pipelines.msgproducer.kafkapub.KafkaProducerClient"
+        ):
+            self.pipe.open_spider(self.spider)
+        self.sendmsg = self.pipe.kp.sendmsg_nowait
+
+    def _run_in_io_thread(self, func, *args):
+        thread = threading.Thread(target=func, args=args)
+        thread.start()
+        thread.join()
+
+    @defer.inlineCallbacks
+    def test_in_flight_window(self):
+        stats = self.spider.crawler.stats
+        first = self.pipe.process_item(AyuItem(a=1, _table="t"), self.spider)
+        second = self.pipe.process_item(AyuItem(a=2, _table="t"), self.spider)
+        # 未确认的消息达到 KAFKA_MAX_IN_FLIGHT 时，之后的 item 需要等待
+        self.assertTrue(first.called)
+        self.assertFalse(second.called)
+
+        # 发送回调在 kafka producer 的 io 线程中执行，stats 只在 reactor 线程中修改
+        self._run_in_io_thread(self.sendmsg.call_args.kwargs["on_success"])
+        self.assertIsNone(stats.get_value("kafka/send/succeeded"))
+        yield second
+        self.assertEqual(stats.get_value("kafka/send/succeeded"), 1)
+
+        self._run_in_io_thread(
+            self.sendmsg.call_args.kwargs["on_error"], TimeoutError()
+        )
+        self.assertIsNone(stats.get_value("kafka/send/failed"))
+        yield self.pipe.semaphore.acquire()
+        self.assertEqual(stats.get_value("kafka/send/failed"), 1)
+        self.assertEqual(stats.get_value("kafka/send/failed/TimeoutError"), 1)
+        self.assertEqual(stats.get_value("kafka/in_flight/max"), 1)
+
+
+class TestAsyncMysqlPipeline(TestCase):
+    timeout = 10
+
+    def setUp(self):
+        self.spider = _get_spider({"MYSQL_ASYNC_CONCURRENCY": 2})
+        self.spider.slog = mock.Mock()
+        self.spider.mysql_conf = MysqlConf("localhost", 3306, "root", "", "test")
+        self.pipe = AyuAsyncMysqlPipeline()
+        self.pool = mock.Mock(wait_closed=mock.AsyncMock())
+
+    async def _test_in_flight_window(self):
+        with mock.patch("aiomysql.create_pool", mock.AsyncMock(return_value=self.pool)):
+            await self.pipe.open_spider(self.spider).asFuture(
+                asyncio.get_running_loop()
+            )
+
+        event = asyncio.Event()
+
+        async def insert_item(alter_item):
+            await event.wait()
+            self.pipe._get_sql_by_item("t", alter_item.new_item)
+            if alter_item.new_item["a"] == 2:
+                raise ValueError("a")
+
+        self.pipe.insert_item = insert_item
+        items = [AyuItem(a=i, _table="t") for i in range(3)]
+        for item in items[:2]:
+            assert await self.pipe.process_item(item, self.spider) is item
+
+        # 并发窗口已满，process_item 需要等待至有插入任务完成
+        third = asyncio.ensure_future(self.pipe.process_item(items[2], self.spider))
+        await asyncio.sleep(0.05)
+        assert not third.done()
+
+        event.set()
+        assert await third is items[2]
+        await self.pipe._close_spider(self.spider)
+        self.pool.close.assert_called_once()
+
+        stats = self.spider.crawler.stats
+        assert self.pipe.running_tasks == set()
+        assert stats.get_value("mysql/async/max_in_flight") == 2
+        assert stats.get_value("mysql/async/succeeded") == 2
+        assert stats.get_value("mysql/async/failed/ValueError") == 1
+        # 缓存命中情况在插入任务完成后记录
+        hits = stats.get_value("sql_cache/hits")
+        assert hits + stats.get_value("sql_cache/misses") == 3
+
+    def test_in_flight_window(self):
+        return deferred_from_coro(self._test_in_flight_window())
+
+
+class TestAsyncOssPipeline(TestCase):
+    timeout = 10
+    pipe_cls = AyuAsyncOssPipeline
+
+    def setUp(self):
+        self.spider = _get_spider(
+            {"OSS_CONCURRENT_UPLOADS_PER_ITEM": 2, "OSS_UPLOAD_THREADS": 4}
+        )
+        self.spider.slog = mock.Mock()
+        self.spider.oss_conf = OssConf("ak", "as", "endpoint", "bucket")
+        self.lock = threading.Lock()
+        self.active = self.max_active = 0
+        self.pipe = self.pipe_cls()
+        with mock.patch("ayugespidertools.scraper.pipelines.oss.ali.AliOssBase"):
+            self.pipe.open_spider(self.spider)
+        self.pipe.oss_bucket.put_oss.side_effect = self._put_oss
+
+    def _put_oss(self, put_bytes, file):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+
+    @staticmethod
+    async def _download(spider, url):
+        status = 404 if url.endswith("missing") else 200
+        return Response(url, status=status, body=b"x"), get_filename(url, "image/png")
+
+    async def _test_item_concurrency(self):
+        urls = {f"f{i}_file_url": f"http://localhost/{i}" for i in range(4)}
+        item = AyuItem(**urls, bad_file_url="http://localhost/missing", _table="t")
+        with mock.patch(
+            "ayugespidertools.scraper.pipelines.oss.ali.files_download_by_scrapy",
+            self._download,
+        ):
+            await self.pipe.process_item(item, self.spider)
+        self.pipe.close_spider(self.spider)
+
+        # 同一 item 中的文件并发上传，但不超过 OSS_CONCURRENT_UPLOADS_PER_ITEM
+        assert self.max_active == 2
+        for key, url in urls.items():
+            assert item[f"_{key}"] == get_filename(url, "image/png")
+        # 非 2xx 的响应不会上传，也不会添加 oss 字段
+        assert "_bad_file_url" not in item
+        stats = self.spider.crawler.stats
+        assert stats.get_value("oss/upload/count") == 4
+        assert stats.get_value("oss/upload/failed") == 1
+
+    def test_item_concurrency(self):
+        return deferred_from_coro(self._test_item_concurrency())
+
+
+class TestAsyncOssBatchPipeline(TestAsyncOssPipeline):
+    pipe_cls = AyuAsyncOssBatchPipeline
+
+    async def _test_list_field(self):
+        item = AyuItem(
+            a_file_url=["http://localhost/0", "http://localhost/missing"],
+            b_file_url=["http://localhost/missing", "http://localhost/missing"],
+            _table="t",
+        )
+        with mock.patch(
+            "ayugespidertools.scraper.pipelines.oss.ali.files_download_by_scrapy",
+            self._download,
+        ):
+            await self.pipe.process_item(item, self.spider)
+        self.pipe.close_spider(self.spider)
+
+        # 列表中只保留上传成功的文件，全部失败时不添加 oss 字段
+        assert item["_a_file_url"] == [get_filename("http://localhost/0", "image/png")]
+        assert "_b_file_url" not in item
+        stats = self.spider.crawler.stats
+        assert stats.get_value("oss/upload/count") == 1
+        assert stats.get_value("oss/upload/failed") == 3
+
+    def test_list_field(self):
+        return deferred_from_coro(self._test_list_field())